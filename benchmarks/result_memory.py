@@ -0,0 +1,114 @@
+"""
+Memory benchmark: bytes per scraped record held as a list of dicts versus a
+ResultTable, measured with tracemalloc.
+
+Rows are generated the way the scraper produces them: every row is a fresh
+dict decoded from the page's JSON, so each row has its own key and value
+strings, with realistic repetition in statuses, trainings and dates.
+
+Usage:
+    python benchmarks/result_memory.py --records 200000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_table import ResultTable  # noqa: E402
+
+STATUSES = ["Active", "Expired", "Suspended", ""]
+TRAININGS = ["RBS Training", "LEAD Training", ""]
+FIRST_NAMES = ["JOHN", "MARIA", "WEI", "AHMED", "OLGA", "CARLOS", "PRIYA", "KENJI"]
+LAST_NAMES = ["SMITH", "GARCIA", "NGUYEN", "KHAN", "IVANOVA", "LOPEZ", "PATEL", "SATO"]
+
+
+def scraped_rows(count, seed=7):
+    """
+    Yields rows shaped like scrape_record output, each decoded from its own
+    JSON document.
+    """
+    rng = random.Random(seed)
+    report_date = time.strftime("%Y-%m-%d")
+    for index in range(count):
+        found = rng.random() > 0.1
+        last_name = rng.choice(LAST_NAMES)
+        payload = {
+            "name": f"{rng.choice(FIRST_NAMES)} {last_name}" if found else "",
+            "service": str(1000000 + index),
+            "training": rng.choice(TRAININGS) if found else "",
+            "status": rng.choice(STATUSES) if found else "",
+            "expirationDate": f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(2024, 2027)}"
+            if found
+            else "",
+        }
+        row = json.loads(json.dumps(payload))
+        row["reportDate"] = report_date
+        row["lastName"] = last_name
+        row["record data"] = "success" if found else "No data found"
+        yield row
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    container = build(scraped_rows(count))
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return container, current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument(
+        "--dataframe", action="store_true", help="Also measure the pandas handoff"
+    )
+    args = parser.parse_args()
+    count = args.records
+
+    print(f"{count} records")
+    print(f"{'container':<14}{'bytes/record':>14}{'peak MB':>10}{'build s':>10}")
+    results = {}
+    for name, build in (("list of dicts", list), ("ResultTable", _build_table)):
+        container, current, peak, elapsed = measure(build, count)
+        results[name] = container
+        print(f"{name:<14}{current / count:>14.1f}{peak / 2**20:>10.1f}{elapsed:>10.2f}")
+        del container
+
+    if args.dataframe:
+        import pandas as pd
+
+        for name, convert in (
+            ("list of dicts", pd.DataFrame),
+            ("ResultTable", lambda table: table.to_dataframe()),
+        ):
+            gc.collect()
+            tracemalloc.start()
+            frame = convert(results[name])
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"DataFrame from {name}: {current / count:.1f} bytes/record, "
+                f"peak {peak / 2**20:.1f} MB"
+            )
+            del frame
+
+
+def _build_table(rows):
+    table = ResultTable()
+    table.extend(rows)
+    return table
+
+
+if __name__ == "__main__":
+    main()
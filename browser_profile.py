@@ -0,0 +1,371 @@
+"""
+Persistent Chrome profiles so the portal's bundles, fonts and scripts are served
+from the HTTP disk cache instead of being downloaded on every run.
+
+Profiles live in numbered slot folders under BROWSER_PROFILE_FOLDER. Each running
+instance (GUI, service, worker) locks one slot with a pid lock file, so two
+Chromes never share a userDataDir. The lock records both the locking process
+and its Chrome, and is only taken over once neither runs: a Chrome orphaned by
+a killed process keeps its slot until it exits. Locks are written to a
+temporary file and linked into place, so no process ever reads a half-written
+one. When every slot is busy the browser falls back to a throwaway profile.
+
+Cleanup policy: slots unused for BROWSER_PROFILE_MAX_AGE_DAYS are deleted, a
+cache that grew past twice its configured size is wiped, and stale Chrome
+singleton files are removed before launch.
+
+warm_up() loads the login page once after launch so the cache is primed while
+the operator is still typing, and records the load time and bytes transferred
+in load_history.json to compare cold and warm cache loads.
+"""
+
+import json
+import os
+import platform
+import shutil
+import socket
+import time
+
+from config import (
+    BROWSER_DISK_CACHE_MB,
+    BROWSER_PROFILE_FOLDER,
+    BROWSER_PROFILE_MAX_AGE_DAYS,
+    BROWSER_PROFILE_SLOTS,
+    LOGINURL,
+)
+from tracing import NetworkCapture
+from utils import create_directory
+
+LOCK_FILE = "abc_profile.lock"
+LAST_USED_FILE = "last_used"
+LOAD_HISTORY_FILE = "load_history.json"
+# Profile of the shared browser, which outlives the processes using it
+SHARED_PROFILE = "shared"
+# Chrome refuses to start, or waits, when these are left behind by a crash
+SINGLETON_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie")
+CACHE_FOLDERS = (
+    os.path.join("Default", "Cache"),
+    os.path.join("Default", "Code Cache"),
+)
+# A lock file that cannot be read may still be being written by its owner; it
+# is only treated as left behind by a crash once it is older than this
+STALE_LOCK_GRACE = 10
+
+
+def pid_alive(pid):
+    if pid <= 0:
+        # os.kill(0 or -1, 0) signals a whole process group and always succeeds
+        return False
+    if platform.system() == "Windows":
+        # os.kill(pid, 0) would send CTRL_C_EVENT on Windows
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def lock_age(path):
+    """
+    Returns:
+        float: Seconds since the lock file was written, infinite if it is gone.
+    """
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return float("inf")
+
+
+def _create_lock(lock_path, owner):
+    # Raises FileExistsError if the lock is held
+    temp_path = f"{lock_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(owner, file)
+    try:
+        os.link(temp_path, lock_path)
+    except FileExistsError:
+        raise
+    except OSError:
+        # No hard links on this file system (e.g. FAT); the lock may then be
+        # seen empty for a moment, which readers allow for
+        descriptor = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            json.dump(owner, file)
+    finally:
+        os.remove(temp_path)
+
+
+def _folder_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+
+class BrowserProfile:
+    """
+    Manages the persistent userDataDir used by one browser.
+
+    Attributes:
+        user_data_dir (str or None): The locked slot, or None when not acquired
+            or when every slot was busy.
+        cold_cache (bool): True if the slot had no cache when it was acquired.
+    """
+
+    def __init__(
+        self,
+        root=BROWSER_PROFILE_FOLDER,
+        slots=BROWSER_PROFILE_SLOTS,
+        cache_mb=BROWSER_DISK_CACHE_MB,
+        max_age_days=BROWSER_PROFILE_MAX_AGE_DAYS,
+    ):
+        self.root = root
+        self.slots = slots
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self.max_age_days = max_age_days
+        self.user_data_dir = None
+        self.cold_cache = True
+        self.shared = False
+
+    def launch_args(self):
+        """
+        Returns:
+            list: Extra Chrome arguments for the profile's disk cache.
+        """
+        if self.user_data_dir is None:
+            return []
+        return [f"--disk-cache-size={self.cache_bytes}"]
+
+    def _try_lock(self, slot_dir):
+        lock_path = os.path.join(slot_dir, LOCK_FILE)
+        hostname = socket.gethostname()
+        for _ in range(2):
+            try:
+                _create_lock(
+                    lock_path, {"pid": os.getpid(), "host": hostname, "since": time.time()}
+                )
+                return True
+            except FileExistsError:
+                try:
+                    with open(lock_path, encoding="utf-8") as file:
+                        owner = json.load(file)
+                except (OSError, ValueError):
+                    if lock_age(lock_path) < STALE_LOCK_GRACE:
+                        # Still being written by its owner
+                        return False
+                    # Left unreadable by a process that died while locking
+                    owner = {}
+                if owner.get("host", hostname) != hostname:
+                    # Profile folder on a share, locked from another machine
+                    return False
+                if owner.get("pid") == os.getpid() or any(
+                    pid_alive(owner[key]) for key in ("pid", "browser_pid") if owner.get(key)
+                ):
+                    return False
+                print(f"Removing stale browser profile lock of pid {owner.get('pid')}")
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    return False
+        return False
+
+    def record_browser_pid(self, pid):
+        """
+        Adds the pid of the Chrome launched on the slot to its lock.
+        """
+        if self.user_data_dir is None or self.shared:
+            return
+        lock_path = os.path.join(self.user_data_dir, LOCK_FILE)
+        try:
+            with open(lock_path, encoding="utf-8") as file:
+                owner = json.load(file)
+            owner["browser_pid"] = pid
+            # Replaced in one step, so other processes never read it truncated
+            temp_path = f"{lock_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(owner, file)
+            os.replace(temp_path, lock_path)
+        except (OSError, ValueError) as e:
+            print(f"Could not record the browser pid in the profile lock: {e}")
+
+    def acquire(self):
+        """
+        Locks a free profile slot and tidies it for launch.
+
+        Returns:
+            str or None: The userDataDir to launch Chrome with, or None to let
+            Chrome use a temporary profile because every slot is in use.
+        """
+        if self.user_data_dir is not None:
+            return self.user_data_dir
+        create_directory(self.root)
+        self.cleanup()
+        for slot in range(self.slots):
+            slot_dir = os.path.join(self.root, f"slot-{slot}")
+            create_directory(slot_dir)
+            if self._try_lock(slot_dir):
+                self.user_data_dir = slot_dir
+                self._prepare(slot_dir)
+                print(
+                    f"Using browser profile {slot_dir} "
+                    f"({'cold' if self.cold_cache else 'warm'} cache)"
+                )
+                return slot_dir
+        print(f"All {self.slots} browser profiles are in use, using a temporary profile")
+        return None
+
+    def acquire_shared(self):
+        """
+        Selects the profile of the shared browser (see shared_browser.py).
+
+        It is not locked: the shared Chrome outlives the process that starts
+        it, and callers serialize its launch themselves.
+
+        Returns:
+            str: The userDataDir to launch the shared Chrome with.
+        """
+        self.shared = True
+        self.user_data_dir = os.path.join(self.root, SHARED_PROFILE)
+        create_directory(self.user_data_dir)
+        self._prepare(self.user_data_dir)
+        return self.user_data_dir
+
+    def _prepare(self, slot_dir):
+        for name in SINGLETON_FILES:
+            path = os.path.join(slot_dir, name)
+            if os.path.lexists(path):
+                os.remove(path)
+        cache_size = sum(
+            _folder_size(os.path.join(slot_dir, folder)) for folder in CACHE_FOLDERS
+        )
+        if cache_size > 2 * self.cache_bytes:
+            print(f"Browser cache is {cache_size // 1024 // 1024} MB, clearing it")
+            for folder in CACHE_FOLDERS:
+                shutil.rmtree(os.path.join(slot_dir, folder), ignore_errors=True)
+            cache_size = 0
+        self.cold_cache = cache_size == 0
+        with open(os.path.join(slot_dir, LAST_USED_FILE), "w", encoding="utf-8") as file:
+            file.write(str(time.time()))
+
+    def cleanup(self):
+        """
+        Deletes unlocked slots that have not been used for max_age_days.
+        """
+        if not os.path.isdir(self.root):
+            return
+        cutoff = time.time() - self.max_age_days * 24 * 3600
+        for name in os.listdir(self.root):
+            slot_dir = os.path.join(self.root, name)
+            if not name.startswith("slot-") or not os.path.isdir(slot_dir):
+                continue
+            if os.path.exists(os.path.join(slot_dir, LOCK_FILE)):
+                continue
+            marker = os.path.join(slot_dir, LAST_USED_FILE)
+            last_used = os.path.getmtime(marker if os.path.exists(marker) else slot_dir)
+            if last_used < cutoff:
+                print(f"Removing browser profile {slot_dir}, unused since {time.ctime(last_used)}")
+                shutil.rmtree(slot_dir, ignore_errors=True)
+
+    def release(self):
+        """
+        Unlocks the slot once the browser has been closed.
+        """
+        if self.user_data_dir is None:
+            return
+        if self.shared:
+            self.user_data_dir = None
+            self.shared = False
+            return
+        try:
+            os.remove(os.path.join(self.user_data_dir, LOCK_FILE))
+        except OSError as e:
+            print(f"Could not release the browser profile lock: {e}")
+        self.user_data_dir = None
+
+    def record_load(self, stats):
+        """
+        Appends a first-load measurement to the history and prints it next to
+        the latest measurement with the other cache state.
+
+        Args:
+            stats (dict): Result of warm_up().
+        """
+        path = os.path.join(self.root, LOAD_HISTORY_FILE)
+        try:
+            with open(path, encoding="utf-8") as file:
+                history = json.load(file)
+        except (OSError, ValueError):
+            history = []
+        other = next(
+            (entry for entry in reversed(history) if entry["cache"] != stats["cache"]),
+            None,
+        )
+        message = (
+            f"First load with {stats['cache']} cache: {stats['seconds']:.2f}s, "
+            f"{stats['bytes'] / 1024:.0f} KB transferred, "
+            f"{stats['cached_requests']}/{stats['requests']} requests from cache"
+        )
+        if other:
+            message += (
+                f" (last {other['cache']} cache load: {other['seconds']:.2f}s, "
+                f"{other['bytes'] / 1024:.0f} KB)"
+            )
+        print(message)
+        history = (history + [stats])[-50:]
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(history, file, indent=2)
+
+
+async def warm_up(browser, profile, url=LOGINURL):
+    """
+    Loads the portal once in a separate tab to prime the disk cache and
+    measures the first load.
+
+    Args:
+        browser: The freshly launched browser.
+        profile (BrowserProfile): The profile the browser was launched with.
+        url (str): Page to load.
+
+    Returns:
+        dict: seconds, bytes, requests, cached_requests and cache ("cold" or "warm").
+    """
+    page = await browser.newPage()
+    capture = NetworkCapture()
+    try:
+        await capture.start(page)
+        started = time.perf_counter()
+        await page.goto(url, waitUntil="networkidle2")
+        seconds = time.perf_counter() - started
+    finally:
+        await capture.stop()
+        await page.close()
+    finished = [entry for entry in capture.requests.values() if entry["endTime"]]
+    stats = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "cache": "cold" if profile.cold_cache else "warm",
+        "seconds": round(seconds, 3),
+        "bytes": sum(entry["bytes"] for entry in finished if not entry["fromCache"]),
+        "requests": len(finished),
+        "cached_requests": sum(1 for entry in finished if entry["fromCache"]),
+    }
+    if profile.user_data_dir is not None:
+        profile.record_load(stats)
+    # Only the first launch of an empty slot is a cold load
+    profile.cold_cache = False
+    return stats
@@ -0,0 +1,263 @@
+"""
+Circuit breaker that pauses scraping while the portal is down.
+
+Without it an outage burns through the workbook: every lookup times out or
+comes back empty and is reported as a failed or "No data found" record. The
+breaker watches the outcome of every lookup for outage signals:
+
+    - the portal's error page (trips the breaker at once),
+    - 403/404/5xx answers to page navigations and 5xx answers to its API
+      requests (a 404 from an API call is an ordinary "not found"),
+    - timeouts, crashes and other failed lookups.
+
+After PORTAL_FAILURE_THRESHOLD consecutive failed lookups the breaker opens:
+every RecordWatchdog sharing it waits before its next lookup, and a single
+probe loads the login page with exponential backoff between
+PORTAL_PROBE_BASE_DELAY and PORTAL_PROBE_MAX_DELAY seconds. Once the portal
+answers normally (and the session is logged in again) the breaker closes and
+the paused lookups resume. A lookup that produced a row still counts as failed
+when the portal answered it with one of those statuses: when the search API
+fails the app shows "no records", which must be retried rather than reported
+as "No data found". Before a record is given up for good the portal is probed
+once, so a record that failed because of an outage is retried rather than
+reported as failed.
+"""
+
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from config import (
+    LOGINURL,
+    PORTAL_FAILURE_THRESHOLD,
+    PORTAL_PROBE_BASE_DELAY,
+    PORTAL_PROBE_MAX_DELAY,
+)
+from scrapping import error_page_shown
+from utils import is_outage_status
+
+CLOSED = "closed"
+OPEN = "open"
+
+# Requests whose 5xx answers mean the portal itself is failing; for page
+# navigations 403 and 404 count as well
+WATCHED_RESOURCE_TYPES = ("document", "xhr", "fetch")
+
+
+class CircuitBreaker:
+    """
+    Shared outage state for every lookup running against the portal.
+
+    Attributes:
+        state (str): CLOSED while lookups run, OPEN while paused for an outage.
+        outages (int): Times the breaker opened.
+        paused_seconds (float): Total time spent paused.
+    """
+
+    def __init__(
+        self,
+        probe,
+        failure_threshold=PORTAL_FAILURE_THRESHOLD,
+        base_delay=PORTAL_PROBE_BASE_DELAY,
+        max_delay=PORTAL_PROBE_MAX_DELAY,
+    ):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CLOSED
+        self.outages = 0
+        self.paused_seconds = 0.0
+        self.consecutive_failures = 0
+        self._closed = asyncio.Event()
+        self._closed.set()
+        self._opened_at = None
+        self._probe_task = None
+        self._bad_responses = {}
+        # Response listener per attached page, so it is only added once
+        self._listeners = {}
+        self._portal_host = urlsplit(LOGINURL).hostname
+
+    def attach(self, page):
+        """
+        Starts watching a page's responses for outage statuses; a page that is
+        already watched is left alone.
+        """
+        if page in self._listeners:
+            return
+        self._bad_responses[page] = []
+        self._listeners[page] = page.on(
+            "response", lambda response, page=page: self._on_response(page, response)
+        )
+
+    def detach(self, page):
+        """
+        Stops watching a page and forgets its responses.
+        """
+        listener = self._listeners.pop(page, None)
+        if listener is not None:
+            page.remove_listener("response", listener)
+        self._bad_responses.pop(page, None)
+
+    def _on_response(self, page, response):
+        request = response.request
+        if request.resourceType == "document" or request.isNavigationRequest():
+            outage = is_outage_status(response.status)
+        else:
+            outage = (
+                request.resourceType in WATCHED_RESOURCE_TYPES and response.status >= 500
+            )
+        if outage and urlsplit(response.url).hostname == self._portal_host:
+            self._bad_responses.setdefault(page, []).append(
+                f"HTTP {response.status} {response.url}"
+            )
+
+    def begin(self, page):
+        """
+        Marks the start of a lookup on the page, forgetting earlier responses.
+        """
+        self._bad_responses[page] = []
+
+    async def outage_signal(self, page, failed):
+        """
+        Inspects a finished lookup for signs of an outage and updates the breaker.
+
+        Args:
+            page: The page the lookup ran on.
+            failed (bool): True if the lookup timed out, crashed or raised.
+
+        Returns:
+            str or None: Why the lookup's row cannot be trusted, or None if it
+            can. A failed lookup only gets a reason once the breaker is open.
+        """
+        error_page = False
+        try:
+            error_page = not page.isClosed() and await error_page_shown(page)
+        except Exception:
+            # The page is unusable; the watchdog replaces it
+            pass
+        bad_responses = self._bad_responses.get(page) or []
+        if not failed and not error_page:
+            if not bad_responses:
+                self.consecutive_failures = 0
+                return None
+            # The row was built from failed portal requests, e.g. an empty
+            # result because the search API answered 503
+            reason = bad_responses[-1]
+        elif error_page:
+            reason = "portal error page"
+            self.consecutive_failures = max(
+                self.consecutive_failures, self.failure_threshold - 1
+            )
+        else:
+            reason = bad_responses[-1] if bad_responses else "lookup failed"
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold and self.state == CLOSED:
+            self._open(reason)
+        if not failed:
+            return reason
+        # A failed lookup is only an outage miss once the breaker agrees
+        return reason if self.state == OPEN else None
+
+    def _open(self, reason):
+        self.state = OPEN
+        self.outages += 1
+        self._opened_at = time.time()
+        self._closed.clear()
+        print(
+            f"Portal looks down after {self.consecutive_failures} failed lookups "
+            f"({reason}), pausing lookups"
+        )
+        self._probe_task = asyncio.ensure_future(self._probe_until_up())
+
+    async def _probe_until_up(self):
+        delay = self.base_delay
+        while True:
+            print(f"Probing the portal in {delay:.0f} seconds")
+            await asyncio.sleep(delay)
+            try:
+                up = await self.probe()
+            except Exception as e:
+                print(f"Portal probe failed: {e}")
+                up = False
+            if up:
+                break
+            delay = min(delay * 2, self.max_delay)
+        paused = time.time() - self._opened_at
+        self.paused_seconds += paused
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self._closed.set()
+        print(f"Portal is back after {paused:.0f} seconds, resuming lookups")
+
+    async def check_portal(self):
+        """
+        Probes the portal once, opening the breaker if it is down.
+
+        Used before a record is given up, so a record whose attempts all ran
+        into an outage is retried even when the failure threshold has not
+        been reached yet.
+
+        Returns:
+            bool: True if the portal is up.
+        """
+        if self.state == OPEN:
+            return False
+        try:
+            up = await self.probe()
+        except Exception as e:
+            print(f"Portal probe failed: {e}")
+            up = False
+        if not up and self.state == CLOSED:
+            self._open("portal probe failed")
+        return up
+
+    async def wait_until_closed(self):
+        """
+        Returns immediately while the portal is up; otherwise waits for recovery.
+        """
+        await self._closed.wait()
+
+    def close(self):
+        """
+        Stops a running probe, e.g. when the run is cancelled, and stops
+        watching every page.
+        """
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+        for page in list(self._listeners):
+            self.detach(page)
+
+
+def portal_probe(session):
+    """
+    Builds the probe used by the breaker for a BrowserSession.
+
+    The probe loads the login page in a scratch tab; when it answers normally
+    the session is made ready again, logging in if the outage ended it.
+
+    Returns:
+        coroutine function: Resolves with True once the portal is usable.
+    """
+
+    async def probe():
+        if session.browser is None or session.disconnected:
+            await session.ensure_ready()
+            return True
+        page = await session.browser.newPage()
+        try:
+            response = await page.goto(LOGINURL, waitUntil="domcontentloaded", timeout=30000)
+            if response is None or is_outage_status(response.status):
+                print(f"Portal probe: HTTP {response.status if response else 'no response'}")
+                return False
+            # The app renders its error page a moment after the document loads
+            await asyncio.sleep(3)
+            if await error_page_shown(page):
+                print("Portal probe: error page")
+                return False
+        finally:
+            await page.close()
+        await session.ensure_ready()
+        return True
+
+    return probe
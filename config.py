@@ -1,9 +1,7 @@
-import asyncio
 from datetime import datetime
 import os
-from screeninfo import get_monitors
+from screeninfo import get_monitors, ScreenInfoError
 import time
-from threading import Event
 
 from utils import create_directory
 
@@ -20,13 +18,131 @@ LOG_TYPE = "log"
 LOG_FOLDER = "log"
 LOGINURL = "https://abcbiz.abc.ca.gov/login"
 HEADLESS = True
-monitor = get_monitors()[0]
-WIDTH = monitor.width
-HEIGHT = monitor.height
-THREAD_EVENT = Event()
-NEW_EVENT_LOOP = asyncio.new_event_loop()
+try:
+    monitor = get_monitors()[0]
+    WIDTH = monitor.width
+    HEIGHT = monitor.height
+except (ScreenInfoError, IndexError):
+    # Headless hosts (distributed workers) have no monitor to measure
+    WIDTH = 1920
+    HEIGHT = 1080
 START_TIME = time.time()
 
+# Column order of the generated report
+REPORT_COLUMNS = [
+    "name",
+    "lastName",
+    "service",
+    "training",
+    "status",
+    "expirationDate",
+    "reportDate",
+    "record data",
+]
+# Reports are streamed here while scraping and moved to the chosen folder after
+REPORT_SPOOL_FOLDER = os.path.join(LOG_FOLDER, "reports")
+# Live results table: rows handed to the view per fetch, rows kept decoded,
+# and the portal's expiry date format (for sorting and filtering by expiry)
+RESULTS_FETCH_ROWS = 500
+RESULTS_ROW_CACHE = 512
+EXPIRATION_DATE_FORMAT = "%m/%d/%Y"
+
+# Staged pipeline settings (read -> validate -> scrape -> write)
+PIPELINE_QUEUE_SIZE = 50
+PIPELINE_READ_CHUNK = 100
+PIPELINE_WRITE_BATCH = 20
+
+# Per-record watchdog: deadline for one lookup across all of its steps, and how
+# many times a record is retried on a fresh page after a timeout or crash
+RECORD_DEADLINE_SECONDS = 45
+RECORD_MAX_ATTEMPTS = 2
+
+# Portal outage circuit breaker: lookups pause after this many consecutive
+# failed lookups (or at once on the portal's error page) and the portal is
+# probed with exponential backoff between these delays until it answers again
+PORTAL_FAILURE_THRESHOLD = 3
+PORTAL_PROBE_BASE_DELAY = 15
+PORTAL_PROBE_MAX_DELAY = 600
+
+# Selector pre-flight after login: a record known to exist on the portal, looked
+# up once to check every result selector (only the search form is checked when
+# unset), and how long to wait for its result. SELECTORS_FILE optionally
+# overrides entries of the selector registry without a new release.
+PREFLIGHT_ENABLED = os.environ.get("ABC_PREFLIGHT", "1") != "0"
+PREFLIGHT_SERVICE_ID = os.environ.get("ABC_PREFLIGHT_SERVICE_ID", "")
+PREFLIGHT_LAST_NAME = os.environ.get("ABC_PREFLIGHT_LAST_NAME", "")
+PREFLIGHT_TIMEOUT = 15
+SELECTORS_FILE = "portal_selectors.json"
+
+# Lookup tracing: fraction of lookups recorded with a full DevTools trace, and
+# percentage of the slowest lookups whose request timings are kept. 0 disables.
+TRACE_SAMPLE_RATE = float(os.environ.get("ABC_TRACE_SAMPLE_RATE", 0))
+TRACE_SLOWEST_PERCENT = float(os.environ.get("ABC_TRACE_SLOWEST_PERCENT", 0))
+
+# Python profiling: "cprofile", "sampling" or empty to disable. The loop-lag
+# monitor ticks every LOOP_LAG_INTERVAL seconds and captures the loop thread's
+# stack when it is blocked for more than LOOP_LAG_THRESHOLD seconds.
+PROFILE_MODE = os.environ.get("ABC_PROFILE", "")
+LOOP_LAG_INTERVAL = 0.05
+LOOP_LAG_THRESHOLD = 0.25
+# Latest tick lags kept for the median and p99 (about 8 minutes of ticks), and
+# how many of the longest stalls keep their stack
+LOOP_LAG_SAMPLES = 10000
+LOOP_LAG_STALLS = 50
+
+# Persistent Chrome profiles with an HTTP disk cache, one locked slot per
+# running instance; slots unused for BROWSER_PROFILE_MAX_AGE_DAYS are deleted
+BROWSER_PROFILE_FOLDER = os.path.join(LOG_FOLDER, "chrome_profiles")
+BROWSER_PROFILE_SLOTS = 4
+BROWSER_PROFILE_MAX_AGE_DAYS = 30
+BROWSER_DISK_CACHE_MB = 200
+# Load the login page once after launch to prime the cache and measure it
+BROWSER_CACHE_WARMUP = True
+
+# Shared browser: connect to a Chrome already running with remote debugging on
+# BROWSER_DEBUG_PORT (or at the endpoint saved in BROWSER_ENDPOINT_FILE) instead
+# of launching one per process. If none is reachable one is started; it is left
+# running, with its logged-in tab, when a job ends.
+BROWSER_SHARED = os.environ.get("ABC_SHARED_BROWSER", "0") == "1"
+BROWSER_DEBUG_PORT = int(os.environ.get("ABC_DEBUG_PORT", 9222))
+BROWSER_ENDPOINT_FILE = os.path.join(BROWSER_PROFILE_FOLDER, "shared_browser.json")
+# Which process drives which tab of the shared browser, by DevTools target id
+BROWSER_TABS_FILE = os.path.join(BROWSER_PROFILE_FOLDER, "shared_tabs.json")
+BROWSER_START_TIMEOUT = 30
+
+# Engine process (the GUI talks to the scraping engine over a pipe)
+ENGINE_ROW_BATCH = 25
+ENGINE_FLUSH_SECONDS = 0.5
+ENGINE_POLL_MS = 50
+ENGINE_HEARTBEAT_INTERVAL = 5
+# The engine is restarted if its loop stops answering for this long while a
+# job runs, or if a Stop is not honoured within ENGINE_STOP_TIMEOUT seconds
+ENGINE_HANG_TIMEOUT = 90
+ENGINE_STOP_TIMEOUT = 20
+# Start Chrome as soon as the window opens, and start scraping as soon as the
+# login succeeded and a valid workbook was chosen (in either order)
+PRELAUNCH_BROWSER = True
+AUTO_START_SCRAPE = True
+
+# Service mode (folder watch / scheduled runs) settings
+SERVICE_INBOX = "inbox"
+SERVICE_OUTBOX = "outbox"
+SERVICE_POLL_INTERVAL = 10
+# Seconds between checks that the warm browser is still logged in
+SESSION_CHECK_INTERVAL = 300
+
+# Distributed coordinator/worker settings
+QUEUE_URL = os.path.join(LOG_FOLDER, "work_queue.sqlite3")
+QUEUE_BATCH_SIZE = 25
+QUEUE_LEASE_SECONDS = 900
+QUEUE_POLL_INTERVAL = 5
+# Leases a batch may lose before it is marked failed instead of re-queued
+QUEUE_MAX_ATTEMPTS = 3
+# Interface the coordinator serves the queue on unless --serve names one
+QUEUE_SERVE_HOST = "127.0.0.1"
+# Shared secret workers send to a served queue; generated when unset
+QUEUE_TOKEN = os.environ.get("ABC_QUEUE_TOKEN", "")
+
 
 create_directory(LOG_FOLDER)
 
@@ -0,0 +1,371 @@
+"""
+Coordinator/worker mode for spreading a large workbook over several machines.
+
+The coordinator reads the workbook with xlsx_to_json, publishes record batches
+to a work queue (see work_queue.py) and waits until every batch is done or has
+failed, re-queueing batches whose worker lease expired. Records of failed
+batches are reported as "Lookup failed". Workers keep one logged-in
+BrowserSession, claim batches, scrape them with scrapping_data and push the
+rows back.
+
+Usage:
+    python distributed.py coordinator workbook.xlsx --output report.csv --serve 0.0.0.0:8765
+    python distributed.py worker --queue http://coordinator-host:8765
+
+Credentials for workers are read from --username/--password or the
+ABC_USERNAME/ABC_PASSWORD environment variables. A served queue only answers
+workers with the same ABC_QUEUE_TOKEN as the coordinator.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import socket
+import time
+import uuid
+from datetime import datetime
+
+from config import (
+    LOOP_LAG_THRESHOLD,
+    PROFILE_MODE,
+    QUEUE_BATCH_SIZE,
+    QUEUE_LEASE_SECONDS,
+    QUEUE_POLL_INTERVAL,
+    QUEUE_SERVE_HOST,
+    QUEUE_TOKEN,
+    QUEUE_URL,
+    TRACE_SAMPLE_RATE,
+    TRACE_SLOWEST_PERCENT,
+)
+from profiling import PROFILE_MODES, maybe_profile
+from circuit_breaker import CircuitBreaker, portal_probe
+from record_watchdog import RecordWatchdog
+from result_table import ResultTable
+from scrapping import normalize_record, scrapping_data
+from session import BrowserSession, LoginError
+from tracing import LookupTracer
+from utils import ConsoleOutput, convert_into_csv_and_save, parse_json, xlsx_to_json
+from work_queue import DONE, FAILED, CoordinatorQueue, open_work_queue, serve_work_queue
+
+REQUIRED_HEADERS = ["Server_ID", "Last_Name"]
+
+
+def split_into_batches(records, batch_size):
+    """
+    Splits workbook records into consecutive batches.
+
+    Args:
+        records (list): Records parsed from the workbook.
+        batch_size (int): Maximum number of records per batch.
+
+    Returns:
+        list: List of record lists.
+    """
+    return [
+        records[index : index + batch_size]
+        for index in range(0, len(records), batch_size)
+    ]
+
+
+def run_coordinator(
+    xlsx_path,
+    output_csv,
+    queue_url=QUEUE_URL,
+    batch_size=QUEUE_BATCH_SIZE,
+    poll_interval=QUEUE_POLL_INTERVAL,
+    serve=None,
+):
+    """
+    Publishes a workbook to the queue and assembles the report once all batches are done.
+
+    Args:
+        xlsx_path (str): Workbook with Server_ID and Last_Name columns.
+        output_csv (str): Where the final report is written.
+        queue_url (str): Local queue location (file path or sqlite:/// URL).
+        batch_size (int): Records per batch.
+        poll_interval (float): Seconds between progress checks.
+        serve (str or None): "port" or "host:port" to expose the queue to
+            workers on other hosts; the host defaults to QUEUE_SERVE_HOST.
+
+    Returns:
+        bool: True when the report was written with every batch done; False
+        if the workbook is unusable or some batches failed.
+    """
+    header_columns, json_data, num_records = xlsx_to_json(xlsx_path)
+    missing_headers = [
+        header for header in REQUIRED_HEADERS if header not in header_columns
+    ]
+    if num_records == 0 or missing_headers:
+        print(f"Workbook {xlsx_path} is empty or missing headers {missing_headers}")
+        return False
+
+    queue = open_work_queue(queue_url)
+    if not isinstance(queue, CoordinatorQueue):
+        print("The coordinator needs a local queue; remote URLs are for workers")
+        return False
+
+    # Two coordinators started in the same second must not share batches
+    job_id = f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    batch_ids = queue.publish(
+        job_id, split_into_batches(parse_json(json_data), batch_size)
+    )
+    print(f"{job_id}: published {num_records} records in {len(batch_ids)} batches")
+
+    server = None
+    if serve:
+        host, _, port = serve.rpartition(":")
+        token = QUEUE_TOKEN
+        if not token:
+            token = secrets.token_urlsafe(24)
+            print(f"Set ABC_QUEUE_TOKEN={token} on the workers")
+        server = serve_work_queue(queue, host or QUEUE_SERVE_HOST, int(port), token)
+    try:
+        while True:
+            requeued, failed = queue.requeue_expired()
+            if requeued:
+                print(f"{job_id}: re-queued {requeued} batches with expired leases")
+            if failed:
+                print(f"{job_id}: gave up {failed} batches that kept losing their lease")
+            counts = queue.progress(job_id)
+            print(f"{job_id}: {counts}")
+            if counts[DONE] + counts[FAILED] == len(batch_ids):
+                break
+            time.sleep(poll_interval)
+    finally:
+        if server:
+            server.shutdown()
+
+    results = ResultTable()
+    for rows in queue.result_batches(job_id):
+        results.extend(rows)
+    failed_ids = []
+    for batch_id, records in queue.failed_batches(job_id):
+        failed_ids.append(batch_id)
+        for record in records:
+            service_number, last_name = normalize_record(record)
+            results.append(
+                {"lastName": last_name, "service": service_number, "record data": "Lookup failed"}
+            )
+    convert_into_csv_and_save(results, output_csv)
+    print(f"{job_id}: report saved to {output_csv}")
+    if failed_ids:
+        print(f"{job_id}: batches {failed_ids} failed, their records are reported as failed")
+        return False
+    return True
+
+
+async def _renew_lease(loop, queue, batch_id, worker_id, lease_seconds):
+    # Keep the lease alive while the batch is being scraped
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        renewed = await loop.run_in_executor(
+            None, queue.renew, batch_id, worker_id, lease_seconds
+        )
+        if not renewed:
+            print(f"Lost the lease on batch {batch_id}")
+            return
+
+
+async def worker_loop(
+    queue,
+    session,
+    worker_id,
+    lease_seconds,
+    poll_interval,
+    exit_when_idle,
+    trace_sample_rate=0,
+    trace_slowest_percent=0,
+):
+    """
+    Claims and scrapes batches until the queue is empty (or forever).
+
+    The session is checked before every batch and logs in again if the portal
+    session expired while the worker was idle. A batch that cannot be finished
+    is released back to the queue instead of being completed with partial rows.
+
+    Args:
+        queue (WorkerQueue): Queue to claim batches from.
+        session (BrowserSession): The worker's browser session.
+        worker_id (str): Name reported with each lease.
+        lease_seconds (float): Lease length requested for each batch.
+        poll_interval (float): Seconds to wait when nothing is pending.
+        exit_when_idle (bool): Stop at the first empty poll instead of waiting.
+        trace_sample_rate (float): Fraction of lookups traced with DevTools.
+        trace_slowest_percent (float): Percentage of slowest lookups whose
+            request timings are kept; a trace summary is written per batch.
+    """
+    loop = asyncio.get_running_loop()
+    output = ConsoleOutput()
+    # Kept across batches so an outage pauses the worker instead of failing records
+    breaker = CircuitBreaker(portal_probe(session))
+    # One watchdog for the whole session, so its page and browser listeners
+    # are registered once rather than per batch
+    watchdog = None
+    try:
+        while True:
+            claimed = await loop.run_in_executor(
+                None, queue.claim, worker_id, lease_seconds
+            )
+            if claimed is None:
+                if exit_when_idle:
+                    print(f"{worker_id}: queue is empty, stopping")
+                    return
+                await asyncio.sleep(poll_interval)
+                continue
+
+            batch_id, records = claimed
+            print(f"{worker_id}: claimed batch {batch_id} with {len(records)} records")
+            heartbeat = loop.create_task(
+                _renew_lease(loop, queue, batch_id, worker_id, lease_seconds)
+            )
+            tracer = LookupTracer.create(trace_sample_rate, trace_slowest_percent)
+            try:
+                await session.ensure_ready()
+                if watchdog is None:
+                    watchdog = RecordWatchdog(session.page, session, breaker=breaker)
+                else:
+                    watchdog.follow(session.page)
+                _, rows = await scrapping_data(
+                    session.browser,
+                    session.page,
+                    json.dumps(records),
+                    output,
+                    close_browser=False,
+                    watchdog=watchdog,
+                    tracer=tracer,
+                )
+            except Exception as e:
+                print(f"{worker_id}: batch {batch_id} failed, handing it back: {e}")
+                await loop.run_in_executor(None, queue.release, batch_id, worker_id)
+                if isinstance(e, LoginError):
+                    raise
+                continue
+            finally:
+                heartbeat.cancel()
+                if tracer is not None:
+                    await tracer.finish()
+            completed = await loop.run_in_executor(
+                None, queue.complete, batch_id, worker_id, rows.to_records()
+            )
+            if completed:
+                print(f"{worker_id}: batch {batch_id} done with {len(rows)} rows")
+            else:
+                print(f"{worker_id}: batch {batch_id} was re-queued, results dropped")
+    finally:
+        if watchdog is not None:
+            watchdog.close()
+        breaker.close()
+
+
+def run_worker(
+    username,
+    password,
+    queue_url=QUEUE_URL,
+    worker_id=None,
+    lease_seconds=QUEUE_LEASE_SECONDS,
+    poll_interval=QUEUE_POLL_INTERVAL,
+    exit_when_idle=False,
+    trace_sample_rate=TRACE_SAMPLE_RATE,
+    trace_slowest_percent=TRACE_SLOWEST_PERCENT,
+    profile_mode=PROFILE_MODE,
+    lag_threshold=LOOP_LAG_THRESHOLD,
+):
+    """
+    Logs in once and processes batches from the queue.
+
+    With profile_mode ("cprofile" or "sampling") the whole worker run is
+    profiled and event loop stalls longer than lag_threshold are reported when
+    it stops.
+
+    Returns:
+        bool: False if the browser could not be started or the login failed.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = open_work_queue(queue_url)
+
+    async def run():
+        session = BrowserSession(username, password)
+        try:
+            async with maybe_profile(profile_mode, lag_threshold):
+                # Logs in, unless a shared browser already holds a logged-in tab
+                await session.ensure_ready()
+                await worker_loop(
+                    queue,
+                    session,
+                    worker_id,
+                    lease_seconds,
+                    poll_interval,
+                    exit_when_idle,
+                    trace_sample_rate,
+                    trace_slowest_percent,
+                )
+            return True
+        except LoginError as e:
+            print(f"{worker_id}: login failed {e}")
+            return False
+        finally:
+            await session.close()
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed ABC portal scraping")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    coordinator = subparsers.add_parser("coordinator", help="Publish a workbook")
+    coordinator.add_argument("xlsx_path")
+    coordinator.add_argument("--output", required=True)
+    coordinator.add_argument("--queue", default=QUEUE_URL)
+    coordinator.add_argument("--batch-size", type=int, default=QUEUE_BATCH_SIZE)
+    coordinator.add_argument("--poll-interval", type=float, default=QUEUE_POLL_INTERVAL)
+    coordinator.add_argument(
+        "--serve", help=f"[host:]port to expose the queue on (host {QUEUE_SERVE_HOST})"
+    )
+
+    worker = subparsers.add_parser("worker", help="Scrape batches from a queue")
+    worker.add_argument("--queue", default=QUEUE_URL)
+    worker.add_argument("--username", default=os.environ.get("ABC_USERNAME"))
+    worker.add_argument("--password", default=os.environ.get("ABC_PASSWORD"))
+    worker.add_argument("--worker-id")
+    worker.add_argument("--lease-seconds", type=float, default=QUEUE_LEASE_SECONDS)
+    worker.add_argument("--poll-interval", type=float, default=QUEUE_POLL_INTERVAL)
+    worker.add_argument("--exit-when-idle", action="store_true")
+    worker.add_argument("--trace-sample", type=float, default=TRACE_SAMPLE_RATE)
+    worker.add_argument("--trace-slowest", type=float, default=TRACE_SLOWEST_PERCENT)
+    worker.add_argument("--profile", choices=PROFILE_MODES, default=PROFILE_MODE or None)
+    worker.add_argument("--lag-threshold", type=float, default=LOOP_LAG_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.mode == "coordinator":
+        succeeded = run_coordinator(
+            args.xlsx_path,
+            args.output,
+            args.queue,
+            args.batch_size,
+            args.poll_interval,
+            args.serve,
+        )
+    else:
+        if not args.username or not args.password:
+            parser.error("worker needs --username/--password or ABC_USERNAME/ABC_PASSWORD")
+        succeeded = run_worker(
+            args.username,
+            args.password,
+            args.queue,
+            args.worker_id,
+            args.lease_seconds,
+            args.poll_interval,
+            args.exit_when_idle,
+            args.trace_sample,
+            args.trace_slowest,
+            args.profile,
+            args.lag_threshold,
+        )
+    raise SystemExit(0 if succeeded else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Long-lived scraping engine that owns the asyncio loop and the browser session.
+
+All browser work runs on one event loop hosted by a dedicated thread. Jobs are
+submitted from any thread and come back as concurrent.futures.Future objects;
+they run one after another in submission order, so the next workbook can be
+queued while the current one is still being scraped and reuses the same
+logged-in page.
+"""
+
+import asyncio
+from threading import Thread
+
+from config import PROFILE_MODE
+from pipeline import ScrapePipeline
+from profiling import maybe_profile
+from scrapping import clear_search_form
+from session import BrowserSession, LoginError
+from tracing import LookupTracer
+
+
+class ScrapingEngine:
+    """
+    Runs login and scraping jobs on a single background event loop.
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): The loop every job runs on.
+        session (BrowserSession): The logged-in browser, once login succeeded.
+        on_browser_started (callable or None): Passed on to the session, called
+            with the pid of every Chrome it launches.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+        self.on_browser_started = None
+        self._tasks = set()
+        self._submitted = 0
+        self._cancelled_up_to = 0
+        self._job_lock = None
+        self._thread = Thread(target=self._run_loop, name="ScrapingEngine", daemon=True)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._job_lock = asyncio.Lock()
+        self.loop.run_forever()
+
+    def start(self):
+        """
+        Starts the engine thread.
+        """
+        self._thread.start()
+
+    def submit(self, job, *args):
+        """
+        Queues a coroutine function to run on the engine loop after earlier jobs.
+
+        Args:
+            job (coroutine function): The job to run, called as job(*args).
+
+        Returns:
+            concurrent.futures.Future: Resolves with the job's return value.
+        """
+        self._submitted += 1
+        return asyncio.run_coroutine_threadsafe(
+            self._run_job(self._submitted, job, *args), self.loop
+        )
+
+    async def _run_job(self, ticket, job, *args):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            async with self._job_lock:
+                # Jobs submitted before a cancel_jobs call may not have
+                # started yet when the cancellation was delivered.
+                if ticket <= self._cancelled_up_to:
+                    raise asyncio.CancelledError()
+                return await job(*args)
+        finally:
+            self._tasks.discard(task)
+
+    def submit_prelaunch(self, output_text):
+        """
+        Queues a job that starts Chrome before any credentials are known.
+
+        Returns:
+            concurrent.futures.Future: Resolves with True once the browser runs.
+        """
+        return self.submit(self._prelaunch, output_text)
+
+    def submit_login(self, username, password, output_text):
+        """
+        Queues a login job.
+
+        Returns:
+            concurrent.futures.Future: Resolves with (status, message).
+        """
+        return self.submit(self._login, username, password, output_text)
+
+    def submit_scrape(
+        self,
+        xlsx_path,
+        output_csv,
+        output_text,
+        progress_callback=None,
+        profile_mode=PROFILE_MODE,
+    ):
+        """
+        Queues a scraping job for one workbook on the logged-in page.
+
+        The workbook is streamed through a ScrapePipeline and the report rows are
+        appended to output_csv as they are scraped.
+
+        Args:
+            xlsx_path (str): Workbook with Server_ID and Last_Name columns.
+            output_csv (str): Report path.
+            output_text: Object with an append(message) method for progress messages.
+            progress_callback (callable or None): Called from the engine thread as
+                progress_callback(processed, read, row).
+            profile_mode (str): "cprofile" or "sampling" to profile the run and
+                monitor event loop lag; empty to disable.
+
+        Returns:
+            concurrent.futures.Future: Resolves with (status, output_csv, stopped);
+            after a stop the report holds the rows scraped before it.
+        """
+        return self.submit(
+            self._scrape,
+            xlsx_path,
+            output_csv,
+            output_text,
+            progress_callback,
+            profile_mode,
+        )
+
+    def cancel_jobs(self):
+        """
+        Stops the running job and drops every queued one.
+
+        The in-flight lookup is interrupted immediately; the browser stays logged
+        in so the next job can start without a new login.
+        """
+        self._cancelled_up_to = self._submitted
+        self.loop.call_soon_threadsafe(self._cancel_tasks)
+
+    def _cancel_tasks(self):
+        # Cancel the asyncio tasks rather than the returned futures so a
+        # stopped scrape still resolves with the rows collected so far.
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _prelaunch(self, output_text):
+        if self.session is None:
+            self.session = BrowserSession(None, None, output_text)
+            self.session.on_browser_started = self.on_browser_started
+        try:
+            await self.session.launch()
+            return True
+        except LoginError as e:
+            # The login will try to launch again
+            print(f"Browser pre-launch failed: {e}")
+            return False
+
+    async def _login(self, username, password, output_text):
+        if self.session is None:
+            self.session = BrowserSession(username, password, output_text)
+            self.session.on_browser_started = self.on_browser_started
+        else:
+            # Log in again on the already running browser
+            self.session.username = username
+            self.session.password = password
+        tracer = LookupTracer.create()
+        try:
+            return True, await self.session.start(tracer)
+        except LoginError as e:
+            print(f"Login failed: {e}")
+            return False, str(e)
+        finally:
+            if tracer is not None:
+                await tracer.finish()
+
+    async def _scrape(
+        self, xlsx_path, output_csv, output_text, progress_callback, profile_mode
+    ):
+        if self.session is None or self.session.logged_in_at is None:
+            return False, output_csv, False
+        pipeline = None
+        # A Stop can land at any await of a running job, including while the
+        # session is restored; it must still end in a stopped result so the
+        # GUI does not take it for a dropped queued job
+        try:
+            try:
+                await self.session.ensure_ready()
+            except LoginError as e:
+                print(f"Could not restore the session: {e}")
+                return False, output_csv, False
+            pipeline = ScrapePipeline(
+                xlsx_path,
+                output_csv,
+                [self.session.page],
+                output_text,
+                progress_callback,
+                session=self.session,
+                tracer=LookupTracer.create(),
+            )
+            async with maybe_profile(profile_mode) as profile_folder:
+                rows_written = await pipeline.run()
+            if profile_folder:
+                output_text.append(f"Profile saved to {profile_folder}")
+            print(f"{rows_written} rows written to {output_csv}")
+            return True, output_csv, False
+        except asyncio.CancelledError:
+            if pipeline is None:
+                print("Scraping stopped before it started")
+                return False, output_csv, True
+            # Leave the search form clean for the next job
+            print(f"Scraping stopped after {pipeline.records_done} records")
+            try:
+                await clear_search_form(self.session.page)
+            except Exception as e:
+                print(f"Could not reset the search form: {e}")
+            return False, output_csv, True
+
+    async def _close_browser(self):
+        if self.session is not None:
+            await self.session.close()
+        self.session = None
+
+    def shutdown(self):
+        """
+        Cancels all jobs, closes the browser and stops the engine thread.
+        """
+        self.cancel_jobs()
+        if self._thread.is_alive():
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self._close_browser(), self.loop
+                ).result(timeout=10)
+            except Exception as e:
+                print(f"Error closing browser: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=10)
@@ -0,0 +1,175 @@
+"""
+Hosts the ScrapingEngine in a child process.
+
+The GUI process only keeps the window; Chrome, the asyncio loop and every
+scraped row live in the engine process, so a hung browser cannot freeze the
+window, a large workbook does not grow the GUI's memory, and a dead engine can
+be replaced without restarting the application.
+
+The two processes talk over a multiprocessing Pipe with small tuples.
+
+Commands (GUI -> engine):
+    ("prelaunch",)                 start Chrome before the operator logs in
+    ("login", job_id, username, password)
+    ("scrape", job_id, xlsx_path, report_path, profile_mode)
+    ("cancel",)
+    ("shutdown",)
+
+Events (engine -> GUI):
+    ("log", message)
+    ("progress", job_id, processed, total)
+    ("rows", job_id, rows)         rows in REPORT_COLUMNS order, sent in batches
+    ("login_done", job_id, status, message)
+    ("scrape_done", job_id, status, report_path, stopped)
+    ("cancelled", job_id)          dropped by Stop before it started
+    ("browser_pid", pid)
+    ("heartbeat",)
+"""
+
+import asyncio
+import threading
+import time
+
+from config import (
+    ENGINE_FLUSH_SECONDS,
+    ENGINE_HEARTBEAT_INTERVAL,
+    ENGINE_ROW_BATCH,
+    REPORT_COLUMNS,
+)
+from engine import ScrapingEngine
+
+
+class EngineChannel:
+    """
+    Thread-safe sender for engine events; it also serves as the output object
+    handed to the scraping code, so messages are forwarded to the GUI.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def send(self, *event):
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self.conn.send(event)
+            except (BrokenPipeError, EOFError, OSError):
+                # The GUI went away; the command loop will shut down
+                self.closed = True
+
+    def append(self, message):
+        self.send("log", message)
+
+
+class RowBatcher:
+    """
+    Collects rows and progress of one scraping job and sends them in batches.
+
+    Called from the engine thread for every record; a batch is sent once it
+    holds ENGINE_ROW_BATCH rows or ENGINE_FLUSH_SECONDS have passed.
+    """
+
+    def __init__(self, channel, job_id):
+        self.channel = channel
+        self.job_id = job_id
+        self.rows = []
+        self.progress = (0, 0)
+        self._last_flush = time.monotonic()
+
+    def __call__(self, processed, total, row):
+        # Records rejected by validation are counted but have no report row
+        if row is not None:
+            self.rows.append([row.get(column, "") for column in REPORT_COLUMNS])
+        self.progress = (processed, total)
+        if (
+            len(self.rows) >= ENGINE_ROW_BATCH
+            or time.monotonic() - self._last_flush >= ENGINE_FLUSH_SECONDS
+        ):
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.channel.send("rows", self.job_id, self.rows)
+            self.rows = []
+        self.channel.send("progress", self.job_id, *self.progress)
+        self._last_flush = time.monotonic()
+
+
+async def _heartbeat(channel):
+    # Proves the engine loop is not blocked
+    while True:
+        channel.send("heartbeat")
+        await asyncio.sleep(ENGINE_HEARTBEAT_INTERVAL)
+
+
+def engine_main(conn):
+    """
+    Entry point of the engine process: runs commands until shutdown or until
+    the GUI end of the pipe is closed.
+
+    Args:
+        conn (multiprocessing.connection.Connection): The engine end of the pipe.
+    """
+    channel = EngineChannel(conn)
+    engine = ScrapingEngine()
+    # Sent for every launch, so the GUI can kill the current Chrome with a
+    # wedged engine however it was started
+    engine.on_browser_started = lambda pid: channel.send("browser_pid", pid)
+    engine.start()
+    heartbeat = asyncio.run_coroutine_threadsafe(_heartbeat(channel), engine.loop)
+
+    def on_login_done(job_id, future):
+        if future.cancelled():
+            channel.send("login_done", job_id, False, "Login cancelled")
+        elif future.exception():
+            channel.send(
+                "login_done", job_id, False, f"Login Process Failed: {future.exception()}"
+            )
+        else:
+            channel.send("login_done", job_id, *future.result())
+
+    def on_scrape_done(job_id, batcher, report_path, future):
+        batcher.flush()
+        if future.cancelled():
+            channel.send("cancelled", job_id)
+        elif future.exception():
+            print(f"Scraping failed: {future.exception()}")
+            channel.send("scrape_done", job_id, False, report_path, False)
+        else:
+            channel.send("scrape_done", job_id, *future.result())
+
+    while True:
+        try:
+            command = conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = command[0]
+        if kind == "prelaunch":
+            engine.submit_prelaunch(channel)
+        elif kind == "login":
+            _, job_id, username, password = command
+            future = engine.submit_login(username, password, channel)
+            future.add_done_callback(
+                lambda future, job_id=job_id: on_login_done(job_id, future)
+            )
+        elif kind == "scrape":
+            _, job_id, xlsx_path, report_path, profile_mode = command
+            batcher = RowBatcher(channel, job_id)
+            future = engine.submit_scrape(
+                xlsx_path, report_path, channel, batcher, profile_mode
+            )
+            future.add_done_callback(
+                lambda future, job_id=job_id, batcher=batcher, report_path=report_path: on_scrape_done(
+                    job_id, batcher, report_path, future
+                )
+            )
+        elif kind == "cancel":
+            engine.cancel_jobs()
+        elif kind == "shutdown":
+            break
+    heartbeat.cancel()
+    engine.shutdown()
+    channel.closed = True
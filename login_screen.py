@@ -1,15 +1,17 @@
-import sys
+import multiprocessing
 import os
-import asyncio
-from threading import Thread
-from PyQt5.QtCore import Qt, QCoreApplication, pyqtSignal, QObject
+import platform
+import signal
+import subprocess
+import sys
+from PyQt5.QtCore import Qt, QCoreApplication, QObject, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 from PyQt5.QtWidgets import *
 
 from config import *
-from scrapping import abiotic_login, scrapping_data
+from engine_process import engine_main
+from results_model import EXPIRY_FILTERS, ReportTableModel
 from utils import *
-from webdriver import pyppeteerBrowserInit
 
 bootstrap_style = """
 
@@ -74,10 +76,16 @@ QTextEdit {
 
 class Worker(QObject):
     """
-    Worker class for handling asynchronous tasks in a separate thread.
+    GUI-side client of the scraping engine process.
+
+    Login and scraping jobs are sent to the engine process (see
+    engine_process.py) over a pipe; a QTimer drains its events on the main
+    thread and turns them into Qt signals, so the widgets are only touched from
+    the GUI thread. Result rows arrive in batches and are only counted here; the
+    report itself is spooled to disk by the engine.
 
-    This class is responsible for managing login and scraping operations using asyncio.
-    It emits signals upon the completion of these operations to communicate results back to the main thread.
+    If the engine process dies, stops answering during a job, or ignores Stop,
+    it is killed together with its Chrome and a fresh one is started.
     """
 
     login_finished = pyqtSignal(bool, str)
@@ -89,76 +97,236 @@ class Worker(QObject):
         - LoginStatus (str): A status message or information about the login operation.
     """
 
-    scrapping_finished = pyqtSignal(bool, list)
+    scrapping_finished = pyqtSignal(bool, str)
     """
     Signal emitted when the scraping operation is finished.
     
     Parameters:
         - status (bool): Indicates whether the scraping was successful.
-        - scrapping_status (list): A list containing information or results from the scraping operation.
+        - report_path (str): The spooled CSV report holding the scraped rows.
+    """
+
+    scrapping_progress = pyqtSignal(int, int)
+    """
+    Signal emitted with each batch of rows.
+
+    Parameters:
+        - processed (int): Records handled so far in the current workbook.
+        - total (int): Records in the current workbook.
+    """
+
+    scrapping_rows = pyqtSignal(list)
+    """
+    Signal carrying a batch of scraped rows, as lists in REPORT_COLUMNS order.
+    """
+
+    scrapping_cancelled = pyqtSignal()
+    """
+    Signal emitted when a queued scraping job is dropped by Stop before it started.
+    """
+
+    output_message = pyqtSignal(str)
+    """
+    Signal carrying a message for the output widget.
+    """
+
+    engine_restarted = pyqtSignal(str)
+    """
+    Signal emitted after a dead or hung engine was replaced; the new engine is logged out.
+
+    Parameters:
+        - reason (str): Why the engine was restarted.
     """
 
     def __init__(self):
         """
-        Initializes the Worker instance.
+        Initializes the Worker instance; call start_engine() to launch the engine process.
         """
         super().__init__()
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.conn = None
+        self.browser_pid = None
+        self.jobs = {}
+        self.next_job_id = 0
+        self.last_heartbeat = 0
+        self.stop_requested_at = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._poll)
+
+    def start_engine(self):
+        """
+        Starts the engine process and begins polling it.
+        """
+        self.conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=engine_main, args=(child_conn,), name="ScrapingEngine", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.last_heartbeat = time.monotonic()
+        self.stop_requested_at = None
+        self.timer.start(ENGINE_POLL_MS)
+        if PRELAUNCH_BROWSER:
+            self._send("prelaunch")
+
+    def _send(self, *command):
+        try:
+            self.conn.send(command)
+        except (BrokenPipeError, OSError) as e:
+            print(f"Engine unreachable: {e}")
+
+    def _new_job(self, kind, report_path=""):
+        self.next_job_id += 1
+        self.jobs[self.next_job_id] = (kind, report_path)
+        return self.next_job_id
+
+    def append(self, message):
+        """
+        Forwards an output message to the output widget.
 
-    def run_login_thread(
-        self,
-        loop,
-        browser,
-        username,
-        password,
-        output_text,
-        scrape_thread_event,
-    ):
+        Args:
+            message (str): HTML message produced by print_the_output_statement.
         """
-        Runs the login operation in the given asyncio event loop.
+        self.output_message.emit(message)
 
-        This method sets the event loop, performs the login operation asynchronously,
-        and emits the login_finished signal with the result.
+    def run_login_thread(self, username, password):
+        """
+        Sends the login to the engine; login_finished is emitted when it completes.
 
         Parameters:
-            - loop (asyncio.BaseEventLoop): The asyncio event loop to run the login coroutine.
-            - browser: The browser instance to be used for the login operation.
-            - user_agent (str): The user agent string for the browser.
             - username (str): The username for login.
             - password (str): The password for login.
-            - output_text (str): Text output to be displayed or logged.
-            - scrape_thread_event (threading.Event): Event object to signal the completion of the login operation.
         """
-        asyncio.set_event_loop(loop)
-        global page
-        status, LoginStatus, browser, page = loop.run_until_complete(
-            abiotic_login(browser, username, password, output_text)
-        )
-        self.login_finished.emit(status, LoginStatus)
-        scrape_thread_event.set()
+        job_id = self._new_job("login")
+        self._send("login", job_id, username, password)
 
-    def run_scrapp_thread(
-        self, loop, browser, page, json_data_str, output_text, scrape_thread_event
-    ):
+    def run_scrapp_thread(self, xlsx_path, report_path, profile_mode=""):
         """
-        Runs the scraping operation in the given asyncio event loop.
+        Queues a workbook on the engine; scrapping_finished is emitted when it completes.
 
-        This method sets the event loop, performs the scraping operation asynchronously,
-        and emits the scrapping_finished signal with the result.
+        A job stopped by the operator still reports the rows collected before the stop.
 
         Parameters:
-            - loop (asyncio.BaseEventLoop): The asyncio event loop to run the scraping coroutine.
-            - browser: The browser instance to be used for the scraping operation.
-            - page: The page object or instance to be used for scraping.
-            - json_data_str (str): JSON data as a string to be used in the scraping operation.
-            - output_text (str): Text output to be displayed or logged.
-            - scrape_thread_event (threading.Event): Event object to signal the completion of the scraping operation.
-        """
-        asyncio.set_event_loop(loop)
-        status, scrapping_status = loop.run_until_complete(
-            scrapping_data(browser, page, json_data_str, output_text)
-        )
-        self.scrapping_finished.emit(status, scrapping_status)
-        scrape_thread_event.set()
+            - xlsx_path (str): The workbook to scrape.
+            - report_path (str): Where the report rows are spooled while scraping.
+            - profile_mode (str): "cprofile" or "sampling" to profile the run, empty to disable.
+        """
+        job_id = self._new_job("scrape", report_path)
+        self._send("scrape", job_id, xlsx_path, report_path, profile_mode)
+
+    def cancel_jobs(self):
+        """
+        Stops the running job and drops the queued ones; the engine is
+        restarted if it does not stop within ENGINE_STOP_TIMEOUT seconds.
+        """
+        self.stop_requested_at = time.monotonic()
+        self._send("cancel")
+
+    def _poll(self):
+        try:
+            while self.conn.poll():
+                self._handle(self.conn.recv())
+        except (EOFError, OSError):
+            pass
+        now = time.monotonic()
+        if not self.process.is_alive():
+            self._restart(f"the engine process exited with code {self.process.exitcode}")
+        elif self.jobs and now - self.last_heartbeat > ENGINE_HANG_TIMEOUT:
+            self._restart(f"the engine did not respond for {ENGINE_HANG_TIMEOUT} seconds")
+        elif (
+            self.jobs
+            and self.stop_requested_at
+            and now - self.stop_requested_at > ENGINE_STOP_TIMEOUT
+        ):
+            self._restart(f"the engine did not stop within {ENGINE_STOP_TIMEOUT} seconds")
+
+    def _handle(self, event):
+        kind = event[0]
+        if kind == "heartbeat":
+            self.last_heartbeat = time.monotonic()
+        elif kind == "log":
+            self.output_message.emit(event[1])
+        elif kind == "progress":
+            self.scrapping_progress.emit(event[2], event[3])
+        elif kind == "rows":
+            self.scrapping_rows.emit(event[2])
+        elif kind == "browser_pid":
+            self.browser_pid = event[1]
+        elif kind == "login_done":
+            self.jobs.pop(event[1], None)
+            self.login_finished.emit(event[2], event[3])
+        elif kind == "scrape_done":
+            _, job_id, status, report_path, stopped = event
+            self._job_finished(job_id)
+            if stopped:
+                # A run stopped before its first rows were flushed has no report
+                status = stopped and os.path.exists(report_path)
+                if status:
+                    print_the_output_statement(
+                        self, "Scraping stopped, the records collected so far are kept."
+                    )
+            self.scrapping_finished.emit(status, report_path)
+        elif kind == "cancelled":
+            self._job_finished(event[1])
+            self.scrapping_cancelled.emit()
+
+    def _job_finished(self, job_id):
+        self.jobs.pop(job_id, None)
+        if not any(kind == "scrape" for kind, _ in self.jobs.values()):
+            self.stop_requested_at = None
+
+    def _kill_browser(self):
+        # Chrome is not a multiprocessing child, so it survives a killed engine
+        if self.browser_pid is None:
+            return
+        try:
+            if platform.system() == "Windows":
+                subprocess.run(
+                    ["taskkill", "/PID", str(self.browser_pid), "/T", "/F"],
+                    capture_output=True,
+                )
+            else:
+                os.kill(self.browser_pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.browser_pid = None
+
+    def _stop_engine(self, timeout):
+        self.timer.stop()
+        if self.process.is_alive():
+            self._send("shutdown")
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(5)
+        self._kill_browser()
+        self.conn.close()
+
+    def _restart(self, reason):
+        print(f"Restarting the scraping engine: {reason}")
+        self._stop_engine(timeout=0)
+        jobs, self.jobs = self.jobs, {}
+        self.start_engine()
+        # The slots open modal dialogs, so the interrupted jobs are reported
+        # once the poll callback has returned rather than from inside it
+        QTimer.singleShot(0, lambda: self._report_interrupted(jobs, reason))
+
+    def _report_interrupted(self, jobs, reason):
+        for kind, report_path in jobs.values():
+            if kind == "login":
+                self.login_finished.emit(False, f"Login interrupted: {reason}")
+            else:
+                # Whatever was flushed to the spool before the failure is kept
+                self.scrapping_finished.emit(os.path.exists(report_path), report_path)
+        self.engine_restarted.emit(reason)
+
+    def shutdown(self):
+        """
+        Shuts the engine process down, closing its browser.
+        """
+        if self.process is not None:
+            self._stop_engine(timeout=15)
 
 
 class MainWindow(QMainWindow):
@@ -172,17 +340,38 @@ class MainWindow(QMainWindow):
         login_button (QPushButton): Button to initiate login.
         close_button (QPushButton): Button to close the browser.
         upload_csv_button (QPushButton): Button to upload an Excel file.
-        scrap_data_button (QPushButton): Button to start data scraping.
+        scrap_data_button (QPushButton): Button to start (or queue) data scraping.
+        stop_button (QPushButton): Button to stop the running and queued scraping jobs.
+        profile_checkbox (QCheckBox): Profiles the next scraping runs and monitors event loop lag.
         output_text (QTextEdit): Widget to display output and status messages.
+        results_table (QTableView): Live view of the rows of the report being scraped.
+        status_filter (QComboBox): Filters the results table by status.
+        expiry_filter (QComboBox): Filters the results table by expiry date.
     """
 
     def __init__(self):
         super().__init__()
+        self.pending_jobs = 0
+        self.processed_statuses = {}
+        self.file_path = None
+        self.logged_in = False
+        # Spooled reports of the running and queued jobs, in the engine's order
+        self.report_paths = []
+        self.results_model = ReportTableModel(self)
+        self.worker = Worker()
+        self.worker.start_engine()
+        self.worker.login_finished.connect(self.on_login_finished)
+        self.worker.scrapping_finished.connect(self.on_scrapping_finished)
+        self.worker.scrapping_progress.connect(self.on_scrapping_progress)
+        self.worker.scrapping_rows.connect(self.on_scrapping_rows)
+        self.worker.scrapping_cancelled.connect(self.on_scrapping_cancelled)
+        self.worker.engine_restarted.connect(self.on_engine_restarted)
         self.initUI()
+        self.worker.output_message.connect(self.output_text.append)
 
     def initUI(self):
         self.setWindowTitle(APP_TITLE)
-        self.setGeometry(500, 600, 800, 500)
+        self.setGeometry(500, 600, 900, 750)
         center_window(self)
 
         central_widget = QWidget()
@@ -246,21 +435,67 @@ class MainWindow(QMainWindow):
         self.scrap_data_button.setFont(font)
         bottom_button_layout.addWidget(self.scrap_data_button)
 
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_button_clicked)
+        self.stop_button.setFont(font)
+        bottom_button_layout.addWidget(self.stop_button)
+
+        self.profile_checkbox = QCheckBox("Profile run")
+        self.profile_checkbox.setChecked(bool(PROFILE_MODE))
+        self.profile_checkbox.setToolTip(
+            "Write Python profiling stats and an event loop lag report to the log folder"
+        )
+        bottom_button_layout.addWidget(self.profile_checkbox)
+
         layout.addWidget(QLabel("<b>Output:</b>"))
+        splitter = QSplitter(Qt.Vertical)
+        layout.addWidget(splitter)
         self.output_text = QTextEdit()
         self.output_text.setReadOnly(True)
         self.output_text.setFont(QFont("Arial", 12))
-        layout.addWidget(self.output_text)
+        splitter.addWidget(self.output_text)
+
+        results_panel = QWidget()
+        results_layout = QVBoxLayout()
+        results_layout.setContentsMargins(0, 0, 0, 0)
+        results_panel.setLayout(results_layout)
+        filter_layout = QHBoxLayout()
+        results_layout.addLayout(filter_layout)
+        filter_layout.addWidget(QLabel("<b>Results:</b>"))
+        self.status_filter = QComboBox()
+        self.status_filter.addItem("All statuses")
+        self.status_filter.currentIndexChanged.connect(self.apply_result_filters)
+        filter_layout.addWidget(self.status_filter)
+        self.expiry_filter = QComboBox()
+        self.expiry_filter.addItems(list(EXPIRY_FILTERS))
+        self.expiry_filter.currentIndexChanged.connect(self.apply_result_filters)
+        filter_layout.addWidget(self.expiry_filter)
+        filter_layout.addStretch()
+
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_table.setWordWrap(False)
+        # Fixed row heights keep scrolling cost independent of the row count
+        self.results_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.results_table.verticalHeader().setDefaultSectionSize(24)
+        self.results_table.horizontalHeader().setStretchLastSection(True)
+        self.results_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.results_table.setSortingEnabled(True)
+        results_layout.addWidget(self.results_table)
+        splitter.addWidget(results_panel)
 
     def login_function(self):
         """
-        Handles the login process by retrieving user input and starting a worker thread to perform the login.
+        Handles the login process by retrieving user input and queueing the login on the scraping engine.
+
+        The Excel file can be chosen while the login runs; scraping starts as soon as both are ready.
         """
         username = self.username_field.text()
         password = self.password_field.text()
 
         self.login_button.setEnabled(False)
-        self.upload_csv_button.setEnabled(False)
         self.scrap_data_button.setEnabled(False)
 
         if username == "" or password == "":
@@ -272,24 +507,12 @@ class MainWindow(QMainWindow):
             )
             self.login_button.setEnabled(True)
         else:
-            global browser
-            browser = pyppeteerBrowserInit(NEW_EVENT_LOOP)
-
-            self.worker = Worker()
-            self.worker.login_finished.connect(self.on_login_finished)
-
-            scrape_thread = Thread(
-                target=self.worker.run_login_thread,
-                args=(
-                    NEW_EVENT_LOOP,
-                    browser,
-                    username,
-                    password,
-                    self.output_text,
-                    THREAD_EVENT,
-                ),
+            self.logged_in = False
+            self.worker.run_login_thread(username, password)
+            self.upload_csv_button.setEnabled(True)
+            print_the_output_statement(
+                self.output_text, "Logging in, you can choose the Excel file meanwhile."
             )
-            scrape_thread.start()
 
     def on_login_finished(self, status, LoginStatus):
         """
@@ -299,30 +522,33 @@ class MainWindow(QMainWindow):
             status (bool): Indicates whether the login was successful.
             LoginStatus (str): Status message related to login.
         """
+        self.logged_in = status
         if status:
             print_the_output_statement(self.output_text, LoginStatus)
-            self.upload_csv_button.setEnabled(True)
+            self.start_scrape_when_ready()
         else:
             show_message_box(self, QMessageBox.Warning, "Browser Error", LoginStatus)
         self.login_button.setEnabled(True)
 
     def upload_excel(self):
         """
-        Opens a file dialog for the user to select an Excel file, then enables the scraping button.
+        Opens a file dialog for the user to select an Excel file and validates it right away.
+
+        A valid workbook is scraped as soon as the login has succeeded (or queued
+        after the workbook being scraped).
         """
         print_the_output_statement(self.output_text, f"Uploading Excel...")
         options = QFileDialog.Options()
-        global file_path
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Select File Name", "", "Excel Files (*.xlsx)", options=options
         )
         if file_path:
-            self.file_path = file_path
-            self.scrap_data_button.setEnabled(True)
-            self.upload_csv_button.setEnabled(False)
             print_the_output_statement(
                 self.output_text, f"excel  file selected {file_path}"
             )
+            if self.validate_workbook(file_path):
+                self.file_path = file_path
+                self.start_scrape_when_ready()
         else:
             show_message_box(
                 self,
@@ -331,14 +557,83 @@ class MainWindow(QMainWindow):
                 "Please Choose the Correct Excel  File",
             )
 
-    def on_scrapping_finished(self, status, scrapping_status):
+    def validate_workbook(self, file_path):
+        """
+        Checks that the workbook has records and the Server_ID and Last_Name headers.
+
+        Args:
+            file_path (str): The chosen workbook.
+
+        Returns:
+            bool: True if the workbook can be scraped; otherwise the operator is told why.
+        """
+        try:
+            csv_header, has_records = read_xlsx_header(file_path)
+        except Exception as e:
+            print(f"Cannot read {file_path}: {e}")
+            show_message_box(
+                self,
+                QMessageBox.Warning,
+                "File Error",
+                "the excel file cannot be read please choose another excel sheet",
+            )
+            return False
+        if not has_records:
+            print("json data is not Found")
+            show_message_box(
+                self,
+                QMessageBox.Warning,
+                "File Error",
+                "excel is empty please choose another excel sheet",
+            )
+            return False
+        missing_headers = [
+            header for header in ["Server_ID", "Last_Name"] if header not in csv_header
+        ]
+        if missing_headers:
+            print("missing the headers ")
+            show_message_box(
+                self,
+                QMessageBox.Warning,
+                "File Error",
+                "missing the header in the csv please choose the correct excel file",
+            )
+            return False
+        print_the_output_statement(self.output_text, "Excel file is valid.")
+        return True
+
+    def start_scrape_when_ready(self):
+        """
+        Starts (or queues) scraping once the login succeeded and a validated workbook is waiting.
+
+        With AUTO_START_SCRAPE disabled the "Scrap Data" button is enabled instead.
+        """
+        if not (self.logged_in and self.file_path):
+            if not self.logged_in and self.file_path:
+                print_the_output_statement(
+                    self.output_text, "Scraping will start as soon as the login is done."
+                )
+            return
+        if AUTO_START_SCRAPE:
+            self.queue_scrape()
+        else:
+            self.scrap_data_button.setEnabled(True)
+
+    def on_scrapping_finished(self, status, report_path):
         """
         Slot to handle the completion of the data scraping process.
 
         Args:
             status (bool): Indicates whether the scraping was successful.
-            scrapping_status (list): Status messages related to scraping.
+            report_path (str): The spooled CSV report, moved to the chosen folder.
         """
+        # The last rows may have been written after the last batch of rows
+        self.show_new_rows()
+        if self.report_paths:
+            self.report_paths.pop(0)
+        if status and not os.path.exists(report_path):
+            print(f"Report {report_path} is missing")
+            status = False
         if status:
             print_the_output_statement(self.output_text, f"Scraping completed.")
             options = QFileDialog.Options()
@@ -348,7 +643,10 @@ class MainWindow(QMainWindow):
             if folder_path:
                 outputfile = f"{folder_path}/{FILE_NAME}_generate_report_{CURRENT_DATE.strftime('%Y-%B-%d')}.{FILE_TYPE}"
                 print("outputfile", outputfile)
-                convert_into_csv_and_save(scrapping_status, outputfile)
+                # Windows cannot move the report while the table has it open
+                self.results_model.close_file()
+                shutil.move(report_path, outputfile)
+                self.results_model.path = outputfile
                 print_the_output_statement(
                     self.output_text, f"Data saved successfully to {outputfile}"
                 )
@@ -363,11 +661,8 @@ class MainWindow(QMainWindow):
                     self,
                     QMessageBox.Warning,
                     "error",
-                    "data successfully found succssfully but failed to the saved the data",
+                    f"data successfully found succssfully but failed to the saved the data, the report is kept at {report_path}",
                 )
-            self.upload_csv_button.setEnabled(False)
-            self.scrap_data_button.setEnabled(False)
-            self.login_button.setEnabled(True)
         else:
             show_message_box(
                 self,
@@ -375,7 +670,10 @@ class MainWindow(QMainWindow):
                 "Browser Error",
                 "Internal Error Occurred while running application. Please Try Again!!",
             )
-        self.login_button.setEnabled(True)
+        self.pending_jobs -= 1
+        self.processed_statuses = {}
+        self.stop_button.setEnabled(self.pending_jobs > 0)
+        self.login_button.setEnabled(self.pending_jobs == 0)
         end_time = time.time()
         total_time = end_time - START_TIME
         print_the_output_statement(
@@ -387,57 +685,9 @@ class MainWindow(QMainWindow):
         """
         Handles the process of starting data scraping after an Excel file has been uploaded.
         """
-        print_the_output_statement(
-            self.output_text, "Scrapping started, please wait for few minutes."
-        )
-        if file_path:
-            csv_header, json_data_str, num_records = xlsx_to_json(file_path)
-            if num_records > 0:
-                print("json data is found")
-                missing_headers = [
-                    header
-                    for header in ["Server_ID", "Last_Name"]
-                    if header not in csv_header
-                ]
-                if missing_headers:
-                    print("missing the headers ")
-                    self.upload_csv_button.setEnabled(True)
-                    self.scrap_data_button.setEnabled(False)
-                    show_message_box(
-                        self,
-                        QMessageBox.Warning,
-                        "File Error",
-                        "missing the header in the csv please choose the correct excel file",
-                    )
-                else:
-                    print("missing the headers ")
-                    self.worker = Worker()
-                    self.worker.scrapping_finished.connect(self.on_scrapping_finished)
-                    scrape_thread = Thread(
-                        target=self.worker.run_scrapp_thread,
-                        args=(
-                            NEW_EVENT_LOOP,
-                            browser,
-                            page,
-                            json_data_str,
-                            self.output_text,
-                            THREAD_EVENT,
-                        ),
-                    )
-                    scrape_thread.start()
-            else:
-                self.upload_csv_button.setEnabled(True)
-                self.scrap_data_button.setEnabled(False)
-                print("json data is not Found")
-                show_message_box(
-                    self,
-                    QMessageBox.Warning,
-                    "File Error",
-                    "excel is empty please choose another excel sheet",
-                )
-
+        if self.file_path:
+            self.queue_scrape()
         else:
-
             show_message_box(
                 self,
                 QMessageBox.Warning,
@@ -445,6 +695,145 @@ class MainWindow(QMainWindow):
                 "unable to scapp data",
             )
 
+    def queue_scrape(self):
+        """
+        Sends the validated workbook to the engine.
+
+        While a workbook is still being scraped the new one is queued on the engine
+        and starts as soon as the current job finishes, on the same logged-in page.
+        """
+        print_the_output_statement(
+            self.output_text, "Scrapping started, please wait for few minutes."
+            if self.pending_jobs == 0
+            else "Scrapping queued, it will start after the current workbook."
+        )
+        report_path = os.path.join(
+            REPORT_SPOOL_FOLDER,
+            f"{FILE_NAME}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')}.{FILE_TYPE}",
+        )
+        profile_mode = (
+            PROFILE_MODE or "sampling" if self.profile_checkbox.isChecked() else ""
+        )
+        self.worker.run_scrapp_thread(self.file_path, report_path, profile_mode)
+        self.report_paths.append(report_path)
+        self.pending_jobs += 1
+        self.file_path = None
+        self.scrap_data_button.setEnabled(False)
+        self.login_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+
+    def on_scrapping_progress(self, processed, total):
+        """
+        Slot showing the progress of the running scraping job.
+
+        Args:
+            processed (int): Records handled so far.
+            total (int): Records in the workbook.
+        """
+        statuses = ", ".join(
+            f"{count} {status}" for status, count in self.processed_statuses.items()
+        )
+        self.statusBar().showMessage(
+            f"Processed {processed} of {total} records" + (f" ({statuses})" if statuses else "")
+        )
+
+    def on_scrapping_rows(self, rows):
+        """
+        Slot counting the statuses of a batch of scraped rows; the rows themselves
+        stay in the spooled report, which the results table reads.
+
+        Args:
+            rows (list): Rows in REPORT_COLUMNS order.
+        """
+        status_index = REPORT_COLUMNS.index("status")
+        record_data_index = REPORT_COLUMNS.index("record data")
+        for row in rows:
+            # Rows without a portal status say why in "record data"
+            status = row[status_index] or row[record_data_index]
+            self.processed_statuses[status] = self.processed_statuses.get(status, 0) + 1
+        self.show_new_rows()
+
+    def show_new_rows(self):
+        """
+        Adds the rows appended to the running job's report to the results table.
+
+        The table switches to the report of the next job when it starts, and
+        keeps following new rows while it is scrolled to the bottom.
+        """
+        if not self.report_paths:
+            return
+        if self.results_model.path != self.report_paths[0]:
+            self.status_filter.blockSignals(True)
+            while self.status_filter.count() > 1:
+                self.status_filter.removeItem(1)
+            self.status_filter.blockSignals(False)
+            self.results_model.load(self.report_paths[0])
+        else:
+            self.results_model.refresh()
+        for status in self.results_model.statuses()[self.status_filter.count() - 1 :]:
+            self.status_filter.addItem(status)
+        scroll_bar = self.results_table.verticalScrollBar()
+        if scroll_bar.value() == scroll_bar.maximum() and self.results_model.canFetchMore():
+            self.results_model.fetchMore()
+
+    def apply_result_filters(self):
+        """
+        Filters the results table by the selected status and expiry range.
+        """
+        status = (
+            self.status_filter.currentText() if self.status_filter.currentIndex() > 0 else None
+        )
+        self.results_model.set_filter(
+            status, EXPIRY_FILTERS.get(self.expiry_filter.currentText())
+        )
+
+    def on_scrapping_cancelled(self):
+        """
+        Slot for a queued scraping job that was dropped before it started.
+        """
+        print_the_output_statement(self.output_text, "Queued scraping job cancelled.")
+        if self.report_paths:
+            # Queued jobs are dropped after the running one
+            self.report_paths.pop()
+        self.pending_jobs -= 1
+        self.stop_button.setEnabled(self.pending_jobs > 0)
+        self.login_button.setEnabled(self.pending_jobs == 0)
+
+    def stop_button_clicked(self):
+        """
+        Stops the running scraping job and drops the queued ones; the browser stays logged in.
+        """
+        print_the_output_statement(self.output_text, "Stopping scraping...")
+        self.stop_button.setEnabled(False)
+        self.worker.cancel_jobs()
+
+    def on_engine_restarted(self, reason):
+        """
+        Slot for a replaced engine process; the new browser has to log in again.
+
+        Args:
+            reason (str): Why the engine was restarted.
+        """
+        print_the_output_statement(
+            self.output_text,
+            f"The scraping engine was restarted because {reason}. Please log in again.",
+        )
+        self.pending_jobs = 0
+        self.report_paths = []
+        self.file_path = None
+        self.logged_in = False
+        self.login_button.setEnabled(True)
+        self.upload_csv_button.setEnabled(False)
+        self.scrap_data_button.setEnabled(False)
+        self.stop_button.setEnabled(False)
+
+    def closeEvent(self, event):
+        """
+        Shuts the scraping engine process down (closing the browser) when the window closes.
+        """
+        self.worker.shutdown()
+        super().closeEvent(event)
+
     def closed_window(self):
         """
         Asks for user confirmation before closing the browser and application.
@@ -460,6 +849,8 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
+    # The engine process is started with "spawn", also from the frozen executable
+    multiprocessing.freeze_support()
     QCoreApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     app = QApplication(sys.argv)
     app.setStyleSheet(bootstrap_style)
@@ -0,0 +1,312 @@
+"""
+Staged scraping pipeline: read -> validate -> scrape -> write.
+
+Each stage runs as its own set of asyncio tasks and hands records to the next
+one through a bounded asyncio.Queue, so a slow stage pushes back on the ones
+before it. Workbook parsing and report writing run in the default executor and
+overlap with browser time, and no stage ever holds more than a queue's worth
+of records, so memory stays flat regardless of workbook size.
+"""
+
+import asyncio
+import time
+from itertools import islice
+
+from config import (
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_READ_CHUNK,
+    PIPELINE_WRITE_BATCH,
+    REPORT_COLUMNS,
+    log_entry,
+)
+from circuit_breaker import CircuitBreaker, portal_probe
+from record_watchdog import RecordWatchdog
+from scrapping import normalize_record
+from tracing import trace_span
+from utils import CsvReportWriter, iter_xlsx_records, print_the_output_statement
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class StageMetrics:
+    """
+    Counters for one pipeline stage.
+
+    Attributes:
+        name (str): Stage name.
+        workers (int): Number of concurrent tasks running the stage.
+        processed (int): Items the stage has finished.
+        busy_seconds (float): Time spent working, summed over workers.
+        max_queue_depth (int): Deepest the stage's input queue has been.
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    def sample_queue(self, queue):
+        depth = queue.qsize()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._depth_total += depth
+        self._depth_samples += 1
+
+    @property
+    def mean_queue_depth(self):
+        return self._depth_total / self._depth_samples if self._depth_samples else 0.0
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 2),
+            "max_queue_depth": self.max_queue_depth,
+            "mean_queue_depth": round(self.mean_queue_depth, 2),
+        }
+
+
+class ScrapePipeline:
+    """
+    Scrapes a workbook into a CSV report through bounded, concurrent stages.
+
+    Args:
+        xlsx_path (str): Workbook with Server_ID and Last_Name columns.
+        output_csv (str): Report path; rows are appended as they are scraped.
+        pages (list): Logged-in search pages; one scrape task runs per page.
+        session (BrowserSession or None): Used to replace pages that crash or
+            hang; without it a dead page only produces "Lookup failed" rows.
+        tracer (LookupTracer or None): Traces sampled and slow lookups; its
+            summary is written when the run ends.
+        output_text: Object with an append(message) method for progress messages.
+        progress_callback (callable or None): Called as
+            progress_callback(processed, read, row) after every record.
+        queue_size (int): Capacity of each inter-stage queue.
+        validate_workers (int): Number of validation tasks.
+    """
+
+    def __init__(
+        self,
+        xlsx_path,
+        output_csv,
+        pages,
+        output_text,
+        progress_callback=None,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        validate_workers=1,
+        session=None,
+        tracer=None,
+    ):
+        self.xlsx_path = xlsx_path
+        self.output_csv = output_csv
+        self.pages = pages
+        self.output_text = output_text
+        self.progress_callback = progress_callback
+        self.queue_size = queue_size
+        self.validate_workers = validate_workers
+        self.session = session
+        self.tracer = tracer
+        # One breaker for all pages, so an outage pauses every scraper
+        self.breaker = CircuitBreaker(portal_probe(session)) if session else None
+        self.watchdogs = []
+        self.records_read = 0
+        self.records_done = 0
+        self.metrics = {
+            "read": StageMetrics("read", 1),
+            "validate": StageMetrics("validate", validate_workers),
+            "scrape": StageMetrics("scrape", len(pages)),
+            "write": StageMetrics("write", 1),
+        }
+
+    def _record_done(self, row):
+        self.records_done += 1
+        if self.progress_callback:
+            self.progress_callback(self.records_done, self.records_read, row)
+
+    async def _read(self, out_queue):
+        loop = asyncio.get_running_loop()
+        metrics = self.metrics["read"]
+        records = iter_xlsx_records(self.xlsx_path)
+        try:
+            while True:
+                started = time.perf_counter()
+                chunk = await loop.run_in_executor(
+                    None, list, islice(records, PIPELINE_READ_CHUNK)
+                )
+                metrics.busy_seconds += time.perf_counter() - started
+                if not chunk:
+                    return
+                for record in chunk:
+                    self.records_read += 1
+                    metrics.processed += 1
+                    await out_queue.put(record)
+        finally:
+            try:
+                records.close()
+            except ValueError:
+                # Still running in the executor after a cancellation
+                pass
+
+    async def _validate(self, in_queue, out_queue):
+        metrics = self.metrics["validate"]
+        while True:
+            metrics.sample_queue(in_queue)
+            record = await in_queue.get()
+            if record is _DONE:
+                return
+            service_number, last_name = normalize_record(record)
+            metrics.processed += 1
+            if service_number and last_name:
+                await out_queue.put((service_number, last_name))
+            else:
+                log_entry(
+                    "ERROR",
+                    service_number,
+                    last_name,
+                    f"Server ID or Last name is messing of last name {last_name}",
+                )
+                print_the_output_statement(
+                    self.output_text,
+                    f"Server ID or Last name is messing of last name {last_name}",
+                )
+                self._record_done(None)
+
+    async def _scrape(self, page, in_queue, out_queue):
+        metrics = self.metrics["scrape"]
+        watchdog = RecordWatchdog(page, self.session, breaker=self.breaker)
+        self.watchdogs.append(watchdog)
+        while True:
+            metrics.sample_queue(in_queue)
+            item = await in_queue.get()
+            if item is _DONE:
+                return
+            service_number, last_name = item
+            started = time.perf_counter()
+            async with trace_span(
+                self.tracer, watchdog.page, f"{service_number}_{last_name}"
+            ):
+                row = await watchdog.lookup(service_number, last_name)
+            metrics.busy_seconds += time.perf_counter() - started
+            metrics.processed += 1
+            await out_queue.put(row)
+            self._record_done(row)
+
+    async def _write(self, in_queue):
+        loop = asyncio.get_running_loop()
+        metrics = self.metrics["write"]
+        writer = CsvReportWriter(self.output_csv, REPORT_COLUMNS)
+        batch = []
+        pending = None
+
+        async def flush():
+            nonlocal pending
+            rows = list(batch)
+            batch.clear()
+            started = time.perf_counter()
+            pending = loop.run_in_executor(None, writer.write_rows, rows)
+            await asyncio.shield(pending)
+            metrics.busy_seconds += time.perf_counter() - started
+            metrics.processed += len(rows)
+
+        try:
+            while True:
+                metrics.sample_queue(in_queue)
+                row = await in_queue.get()
+                if row is _DONE:
+                    break
+                batch.append(row)
+                if len(batch) >= PIPELINE_WRITE_BATCH or in_queue.empty():
+                    await flush()
+            if batch:
+                await flush()
+        finally:
+            # On cancellation keep the rows that were already scraped
+            if pending is not None and not pending.done():
+                await pending
+            if batch:
+                writer.write_rows(batch)
+                metrics.processed += len(batch)
+            writer.close()
+
+    @staticmethod
+    async def _close_after(tasks, queue, consumers):
+        await asyncio.gather(*tasks)
+        for _ in range(consumers):
+            await queue.put(_DONE)
+
+    async def run(self):
+        """
+        Runs all stages to completion.
+
+        Returns:
+            int: Number of report rows written.
+        """
+        records_queue = asyncio.Queue(self.queue_size)
+        valid_queue = asyncio.Queue(self.queue_size)
+        rows_queue = asyncio.Queue(self.queue_size)
+
+        readers = [asyncio.ensure_future(self._read(records_queue))]
+        validators = [
+            asyncio.ensure_future(self._validate(records_queue, valid_queue))
+            for _ in range(self.validate_workers)
+        ]
+        scrapers = [
+            asyncio.ensure_future(self._scrape(page, valid_queue, rows_queue))
+            for page in self.pages
+        ]
+        stages = [
+            asyncio.ensure_future(
+                self._close_after(readers, records_queue, len(validators))
+            ),
+            asyncio.ensure_future(
+                self._close_after(validators, valid_queue, len(scrapers))
+            ),
+            asyncio.ensure_future(self._close_after(scrapers, rows_queue, 1)),
+            asyncio.ensure_future(self._write(rows_queue)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            # A failing or cancelled stage must not leave the others blocked
+            # on their queues.
+            for task in stages + readers + validators + scrapers:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            for watchdog in self.watchdogs:
+                watchdog.close()
+            if self.breaker is not None:
+                self.breaker.close()
+            if self.tracer is not None:
+                await self.tracer.finish()
+        self.report_metrics()
+        return self.metrics["write"].processed
+
+    def report_metrics(self):
+        """
+        Prints the per-stage counters and queue depths to the output.
+        """
+        for stage in self.metrics.values():
+            print_the_output_statement(
+                self.output_text,
+                f"{stage.name}: {stage.processed} items, {stage.workers} workers, "
+                f"busy {stage.busy_seconds:.1f}s, queue depth max {stage.max_queue_depth} "
+                f"mean {stage.mean_queue_depth:.1f}",
+            )
+        print_the_output_statement(
+            self.output_text,
+            f"watchdog: {sum(w.timeouts for w in self.watchdogs)} timeouts, "
+            f"{sum(w.crashes for w in self.watchdogs)} crashes, "
+            f"{sum(w.recoveries for w in self.watchdogs)} page replacements",
+        )
+        if self.breaker is not None and self.breaker.outages:
+            print_the_output_statement(
+                self.output_text,
+                f"portal outages: {self.breaker.outages}, paused "
+                f"{self.breaker.paused_seconds:.0f}s, "
+                f"{sum(w.outage_retries for w in self.watchdogs)} lookups retried",
+            )
@@ -0,0 +1,327 @@
+"""
+Versioned registry of the portal's DOM selectors, with fallbacks, and a
+pre-flight check that tests them right after login.
+
+The portal is a React app whose class names are build hashes
+(e.g. "sc-gAnuJb gzDMq", "abc-login_submit-button_Sl8_I") and whose result card
+is only reachable through deep nth-child paths, so a redeploy can silently
+break every lookup. Each named selector therefore lists alternatives, tried in
+order: the selector known to work first, then more structural or text based
+fallbacks. When a fallback is used it is reported once so the registry can be
+updated.
+
+Alternatives are written as "css:<selector>" or "xpath:<expression>". A JSON
+file at SELECTORS_FILE ({"version": "...", "selectors": {name: [...]}})
+overrides entries without a new release.
+
+preflight() searches a known control record after login and checks every
+search and result selector in one pass; if any of them no longer matches, the
+run is aborted with a diagnostic (and a screenshot) instead of producing hours
+of empty rows.
+"""
+
+import json
+import os
+from datetime import datetime
+
+from config import (
+    LOG_FOLDER,
+    PREFLIGHT_LAST_NAME,
+    PREFLIGHT_SERVICE_ID,
+    PREFLIGHT_TIMEOUT,
+    SELECTORS_FILE,
+)
+
+# Bump when the defaults below are updated for a portal release
+SELECTOR_VERSION = "2024.07"
+
+NO_RECORDS_TEXT = "There are no records by selected search parameters"
+_RESULT_CARD = (
+    "#root > div > div:nth-child(3) > div > div:nth-child(2) > div:nth-child(2) > "
+    "div:nth-child(3) > div:nth-child(2) > div > div > div:nth-child(1) > div"
+)
+
+DEFAULT_SELECTORS = {
+    "error_page": [
+        'xpath://span[@style="margin-left: 450px; margin-top: 120px; font-size: 120px; color: rgb(122, 124, 125); font-weight: 900; display: inline; position: absolute;"]',
+    ],
+    "login_username": ["css:#username", 'css:input[name="username"]'],
+    "login_password": ["css:#password", 'css:input[type="password"]'],
+    "login_submit": [
+        "css:button.abc-login_submit-button_Sl8_I",
+        'css:button[class*="login_submit-button"]',
+        'css:form button[type="submit"]',
+    ],
+    "login_popup": ['css:[role="alertdialog"]'],
+    "switch_dashboard": ['css:[aria-label="Switch Dashboard"]'],
+    "dashboard_menu_item": [
+        'xpath://*[@id="long-menu"]/div[2]/ul/li',
+        "css:#long-menu li",
+    ],
+    "search_server_id": ["css:#serverId"],
+    "search_last_name": ["css:#lastName"],
+    "search_button": [
+        'xpath://*[@id="root"]/div/div[3]/div/div[2]/div[2]/div[1]/div[2]/div/div/div/div/div[2]/button[2]/span[1]',
+        'xpath://*[@id="lastName"]/ancestor::form//button[@type="submit"]',
+        'xpath://button[.//span[normalize-space()="Search"]]',
+    ],
+    "clear_button": [
+        'xpath://button[contains(@class, "search-box-container_action-clear")]',
+        'css:button[class*="action-clear"]',
+    ],
+    "no_records": [
+        f"xpath://div[contains(concat(' ', @class, ' '), ' sc-gAnuJb ') and contains(concat(' ', @class, ' '), ' gzDMq ')]//p[normalize-space()='{NO_RECORDS_TEXT}']",
+        f"xpath://p[normalize-space()='{NO_RECORDS_TEXT}']",
+    ],
+    "result_name": [f"css:{_RESULT_CARD} > div:nth-child(1) > div > div > p > span"],
+    "result_service": [f"css:{_RESULT_CARD} > div:nth-child(2) > div > div > p"],
+    "result_training": [f"css:{_RESULT_CARD} > div:nth-child(3) > div > div > p"],
+    "result_status": [f"css:{_RESULT_CARD} > div:nth-child(4) > div > div > p"],
+    "result_expiration": [f"css:{_RESULT_CARD} > div:nth-child(5) > div > div > p"],
+}
+
+SEARCH_FORM_SELECTORS = ["search_server_id", "search_last_name", "search_button", "clear_button"]
+# Report field filled from each result selector
+RESULT_FIELDS = {
+    "result_name": "name",
+    "result_service": "service",
+    "result_training": "training",
+    "result_status": "status",
+    "result_expiration": "expirationDate",
+}
+
+# Returns, for each name, the index of the first matching alternative (or -1)
+# and the element's trimmed text.
+_MATCH_JS = """
+(selectors) => {
+    const matches = {};
+    for (const [name, alternatives] of Object.entries(selectors)) {
+        matches[name] = {index: -1, text: ''};
+        for (let index = 0; index < alternatives.length; index++) {
+            const [kind, expression] = alternatives[index];
+            const element = kind === 'xpath'
+                ? document.evaluate(expression, document, null,
+                    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+                : document.querySelector(expression);
+            if (element) {
+                matches[name] = {index: index, text: (element.innerText || '').trim()};
+                break;
+            }
+        }
+    }
+    return matches;
+}
+"""
+
+
+class SelectorHealthError(Exception):
+    """
+    Raised when the portal page no longer matches the selector registry.
+    """
+
+
+def _parse(alternative):
+    kind, _, expression = alternative.partition(":")
+    if kind not in ("css", "xpath") or not expression:
+        raise ValueError(f"Selector '{alternative}' must start with css: or xpath:")
+    return [kind, expression]
+
+
+class SelectorRegistry:
+    """
+    Named selectors with ordered fallback alternatives.
+
+    Attributes:
+        version (str): Registry version, reported in diagnostics.
+        matched (dict): Index of the alternative that last matched, per name.
+    """
+
+    def __init__(self, selectors=None, version=SELECTOR_VERSION):
+        self.version = version
+        self.selectors = {
+            name: [_parse(alternative) for alternative in alternatives]
+            for name, alternatives in (selectors or DEFAULT_SELECTORS).items()
+        }
+        self.matched = {}
+
+    @classmethod
+    def load(cls, path=SELECTORS_FILE):
+        """
+        Returns:
+            SelectorRegistry: The defaults, with the entries of the override
+            file at path (if it exists) replacing them.
+        """
+        selectors = dict(DEFAULT_SELECTORS)
+        version = SELECTOR_VERSION
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                overrides = json.load(file)
+            selectors.update(overrides.get("selectors", {}))
+            version = f"{SELECTOR_VERSION}+{overrides.get('version', os.path.basename(path))}"
+            print(f"Selector overrides loaded from {path}")
+        return cls(selectors, version)
+
+    def describe(self, name):
+        return ", ".join(f"{kind}:{expression}" for kind, expression in self.selectors[name])
+
+    def _note_match(self, name, index):
+        if index > 0 and self.matched.get(name) != index:
+            kind, expression = self.selectors[name][index]
+            print(
+                f"Selector '{name}' matched fallback #{index} ({kind}:{expression}); "
+                f"the primary selector is outdated (registry {self.version})"
+            )
+        if index >= 0:
+            self.matched[name] = index
+
+    async def match(self, page, names):
+        """
+        Tests several selectors in one round trip.
+
+        Returns:
+            dict: name -> {"index": matching alternative or -1, "text": element text}.
+        """
+        matches = await page.evaluate(
+            _MATCH_JS, {name: self.selectors[name] for name in names}
+        )
+        for name, match in matches.items():
+            self._note_match(name, match["index"])
+        return matches
+
+    async def _element(self, page, name, index):
+        kind, expression = self.selectors[name][index]
+        if kind == "xpath":
+            elements = await page.xpath(expression)
+            return elements[0] if elements else None
+        return await page.querySelector(expression)
+
+    async def find(self, page, name):
+        """
+        Returns:
+            ElementHandle or None: The first element matched by any alternative.
+        """
+        index = (await self.match(page, [name]))[name]["index"]
+        return await self._element(page, name, index) if index >= 0 else None
+
+    async def exists(self, page, name):
+        return (await self.match(page, [name]))[name]["index"] >= 0
+
+    async def wait_for(self, page, name, timeout=30000):
+        """
+        Waits until any alternative of the selector matches.
+
+        Returns:
+            ElementHandle: The matching element.
+
+        Raises:
+            pyppeteer.errors.TimeoutError: If nothing matched within timeout ms.
+        """
+        await self.wait_for_any(page, [name], timeout)
+        return await self.find(page, name)
+
+    async def wait_for_any(self, page, names, timeout=30000):
+        """
+        Waits until any alternative of any of the named selectors matches.
+        """
+        selectors = json.dumps({name: self.selectors[name] for name in names})
+        await page.waitForFunction(
+            f"Object.values(({_MATCH_JS})({selectors})).some(match => match.index >= 0)",
+            {"timeout": timeout},
+        )
+
+    async def read_texts(self, page, names):
+        """
+        Returns:
+            dict: name -> trimmed text of the matched element, "" when nothing matched.
+        """
+        matches = await self.match(page, names)
+        return {name: match["text"] for name, match in matches.items()}
+
+
+registry = SelectorRegistry.load()
+
+
+async def _save_diagnostics(page):
+    stem = os.path.join(
+        LOG_FOLDER, f"preflight_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    )
+    try:
+        await page.screenshot({"path": f"{stem}.png", "fullPage": True})
+        with open(f"{stem}.html", "w", encoding="utf-8") as file:
+            file.write(await page.content())
+        return stem
+    except Exception as e:
+        print(f"Could not save the pre-flight page: {e}")
+        return None
+
+
+async def preflight(
+    page,
+    service_number=PREFLIGHT_SERVICE_ID,
+    last_name=PREFLIGHT_LAST_NAME,
+    timeout=PREFLIGHT_TIMEOUT,
+):
+    """
+    Checks the search page against the registry with a known control record.
+
+    The search form selectors are always checked. When a control record is
+    configured it is searched and every result selector must match a non-empty
+    value; without one only the form is checked.
+
+    Args:
+        page: The logged-in search page.
+        service_number (str): Server ID of a record known to exist.
+        last_name (str): Last name of that record.
+        timeout (float): Seconds to wait for the search result.
+
+    Returns:
+        dict: The values read for the control record (empty without one).
+
+    Raises:
+        SelectorHealthError: With the failing selectors and what they tried.
+    """
+    problems = []
+    form = await registry.match(page, SEARCH_FORM_SELECTORS)
+    problems += [name for name, match in form.items() if match["index"] < 0]
+
+    values = {}
+    if not problems and service_number and last_name:
+        await (await registry.find(page, "search_server_id")).type(str(service_number))
+        await (await registry.find(page, "search_last_name")).type(str(last_name))
+        await (await registry.find(page, "search_button")).click()
+        try:
+            await registry.wait_for_any(
+                page, ["result_status", "no_records"], int(timeout * 1000)
+            )
+        except Exception:
+            # Reported below through the unmatched result selectors
+            pass
+        texts = await registry.read_texts(page, list(RESULT_FIELDS) + ["no_records"])
+        if texts.pop("no_records"):
+            problems.append("control record returned no results")
+        else:
+            problems += [name for name, text in texts.items() if not text]
+            values = {RESULT_FIELDS[name]: text for name, text in texts.items()}
+        try:
+            await (await registry.find(page, "clear_button")).click()
+        except Exception as e:
+            print(f"Could not clear the pre-flight search: {e}")
+    elif not service_number or not last_name:
+        print(
+            "Selector pre-flight checked the search form only; set "
+            "ABC_PREFLIGHT_SERVICE_ID and ABC_PREFLIGHT_LAST_NAME to check results too"
+        )
+
+    if problems:
+        lines = [f"The portal page no longer matches selector registry {registry.version}:"]
+        for problem in problems:
+            if problem in registry.selectors:
+                lines.append(f"  {problem}: nothing matched [{registry.describe(problem)}]")
+            else:
+                lines.append(f"  {problem} ({service_number} {last_name})")
+        saved = await _save_diagnostics(page)
+        if saved:
+            lines.append(f"Page saved to {saved}.png/.html")
+        raise SelectorHealthError("\n".join(lines))
+    print(f"Selector pre-flight passed (registry {registry.version})")
+    return values
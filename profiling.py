@@ -0,0 +1,304 @@
+"""
+Python-side profiling for scraping runs.
+
+profile_run() wraps a run on the asyncio loop thread with:
+
+    - A profiler: "cprofile" (deterministic, every call) or "sampling" (a
+      background thread samples the loop thread's stack every few
+      milliseconds, with much lower overhead). Sorted stats are dumped when the
+      run ends.
+    - A LoopLagMonitor measuring how long the event loop was blocked. A ticker
+      coroutine records how late each wake-up was, and a watcher thread grabs
+      the loop thread's stack whenever the loop has not ticked for longer than
+      the stall threshold, which points at the synchronous code that starved
+      concurrent lookups.
+
+Output goes to a profile_<timestamp> folder in the log directory.
+"""
+
+import asyncio
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from config import (
+    LOG_FOLDER,
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_SAMPLES,
+    LOOP_LAG_STALLS,
+    LOOP_LAG_THRESHOLD,
+)
+from utils import create_directory
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop blocking and captures stacks of long stalls.
+
+    A run can last for days, so only the latest ticks are kept for the
+    percentiles and only the longest stalls keep their stack; the counts,
+    total and maximum cover the whole run.
+
+    Attributes:
+        lags (deque): Lateness in seconds of the latest max_samples ticks.
+        ticks (int): Ticks measured.
+        total_lag (float): Sum of the lateness of every tick.
+        max_lag (float): Largest lateness of any tick.
+        stalls (list): Heap of (duration, start, stack text) of the max_stalls
+            longest stalls over the threshold.
+        stall_count (int): Stalls over the threshold.
+    """
+
+    def __init__(
+        self,
+        interval=LOOP_LAG_INTERVAL,
+        threshold=LOOP_LAG_THRESHOLD,
+        max_samples=LOOP_LAG_SAMPLES,
+        max_stalls=LOOP_LAG_STALLS,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=max_samples)
+        self.ticks = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.max_stalls = max_stalls
+        self.stalls = []
+        self.stall_count = 0
+        # [duration, start, stack] of the stall in progress; its duration
+        # grows until the loop ticks again
+        self._stall = None
+        self._last_tick = None
+        self._loop_thread_id = None
+        self._ticker = None
+        self._stopped = threading.Event()
+        self._watcher = None
+
+    def start(self):
+        """
+        Starts monitoring the running loop; call from a coroutine on that loop.
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.perf_counter()
+        self._ticker = asyncio.ensure_future(self._tick())
+        self._watcher = threading.Thread(
+            target=self._watch, name="LoopLagWatcher", daemon=True
+        )
+        self._watcher.start()
+
+    async def _tick(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._record(max(now - expected, 0))
+            self._last_tick = now
+
+    def _record(self, lag):
+        self.lags.append(lag)
+        self.ticks += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self):
+        # Sample the loop thread once per stall, when it crosses the threshold
+        reported_tick = None
+        while not self._stopped.wait(self.threshold / 4):
+            last_tick = self._last_tick
+            blocked = time.perf_counter() - last_tick
+            if self._stall is not None and self._stall[1] == last_tick:
+                # Still the same stall: keep its duration up to date
+                self._stall[0] = blocked
+                continue
+            self._end_stall()
+            if blocked > self.interval + self.threshold and last_tick != reported_tick:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    stack = "".join(traceback.format_stack(frame))
+                    self._stall = [blocked, last_tick, stack]
+                    reported_tick = last_tick
+        self._end_stall()
+
+    def _end_stall(self):
+        if self._stall is None:
+            return
+        self.stall_count += 1
+        heapq.heappush(self.stalls, tuple(self._stall))
+        if len(self.stalls) > self.max_stalls:
+            heapq.heappop(self.stalls)
+        self._stall = None
+
+    def stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def report(self):
+        """
+        Returns:
+            str: Lag statistics followed by the stack of every stall, longest first.
+        """
+        lags = sorted(self.lags)
+        lines = [
+            f"ticks: {self.ticks} every {self.interval * 1000:.0f} ms",
+            f"total blocked: {self.total_lag:.3f} s",
+        ]
+        if lags:
+            lines += [
+                f"mean lag: {self.total_lag / self.ticks * 1000:.1f} ms",
+                f"median lag (last {len(lags)} ticks): {lags[len(lags) // 2] * 1000:.1f} ms",
+                f"p99 lag (last {len(lags)} ticks): "
+                f"{lags[min(int(len(lags) * 0.99), len(lags) - 1)] * 1000:.1f} ms",
+                f"max lag: {self.max_lag * 1000:.1f} ms",
+            ]
+        lines.append(f"stalls over {self.threshold * 1000:.0f} ms: {self.stall_count}")
+        if self.stall_count > len(self.stalls):
+            lines.append(f"stacks of the {len(self.stalls)} longest stalls follow")
+        for blocked, _, stack in sorted(self.stalls, reverse=True):
+            lines += ["", f"--- loop blocked for at least {blocked * 1000:.0f} ms ---", stack]
+        return "\n".join(lines)
+
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler for one thread.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self.self_counts = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="StackSampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            self.samples += 1
+            self.self_counts[stack[0]] += 1
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def dump(self, folder):
+        """
+        Writes the top functions by self samples and collapsed stacks.
+
+        The collapsed file can be fed to flamegraph.pl or speedscope.
+
+        Returns:
+            str: Path of the text report.
+        """
+        report_path = os.path.join(folder, "sampling_profile.txt")
+        with open(report_path, "w", encoding="utf-8") as file:
+            file.write(f"samples: {self.samples} every {self.interval * 1000:.0f} ms\n\n")
+            file.write("self samples  share  function\n")
+            for function, count in self.self_counts.most_common(50):
+                file.write(f"{count:12d}  {count / self.samples:5.1%}  {function}\n")
+        with open(
+            os.path.join(folder, "sampling_profile.collapsed"), "w", encoding="utf-8"
+        ) as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        return report_path
+
+
+def _dump_cprofile(profiler, folder):
+    profiler.dump_stats(os.path.join(folder, "cprofile.prof"))
+    report_path = os.path.join(folder, "cprofile.txt")
+    with open(report_path, "w", encoding="utf-8") as file:
+        for sort_key in ("cumulative", "tottime"):
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats(sort_key).print_stats(40)
+            file.write(f"===== sorted by {sort_key} =====\n{stream.getvalue()}\n")
+    return report_path
+
+
+@asynccontextmanager
+async def profile_run(mode="cprofile", threshold=LOOP_LAG_THRESHOLD, folder=None):
+    """
+    Profiles everything run on the current event loop inside the block.
+
+    Must be entered from a coroutine running on the loop to profile.
+
+    Args:
+        mode (str): "cprofile" or "sampling".
+        threshold (float): Seconds of blocking that count as a stall.
+        folder (str or None): Output folder; defaults to log/profile_<timestamp>.
+
+    Yields:
+        str: The output folder.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of {PROFILE_MODES}")
+    folder = folder or os.path.join(
+        LOG_FOLDER, f"profile_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    )
+    create_directory(folder)
+    monitor = LoopLagMonitor(threshold=threshold)
+    monitor.start()
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = StackSampler(threading.get_ident())
+        profiler.start()
+    try:
+        yield folder
+    finally:
+        if mode == "cprofile":
+            profiler.disable()
+            report_path = _dump_cprofile(profiler, folder)
+        else:
+            profiler.stop()
+            report_path = profiler.dump(folder)
+        monitor.stop()
+        lag_path = os.path.join(folder, "loop_lag.txt")
+        with open(lag_path, "w", encoding="utf-8") as file:
+            file.write(monitor.report())
+        print(f"Profile written to {report_path}, loop lag report to {lag_path}")
+
+
+@asynccontextmanager
+async def _no_profile():
+    yield None
+
+
+def maybe_profile(mode, threshold=LOOP_LAG_THRESHOLD):
+    """
+    Returns profile_run(mode) or, when mode is empty, a context that does nothing.
+    """
+    if not mode:
+        return _no_profile()
+    return profile_run(mode, threshold)
@@ -0,0 +1,255 @@
+"""
+Per-record watchdog for portal lookups.
+
+Every lookup runs under a single deadline covering all of its steps, so a
+hung waitForXPath costs at most RECORD_DEADLINE_SECONDS instead of several
+30s pyppeteer timeouts in a row. The watchdog also listens for the DevTools
+target-crashed, page-closed and browser-disconnected events and aborts the
+in-flight lookup as soon as one fires. After a failure the page is reset, or
+replaced with a fresh authenticated tab from the BrowserSession, and only the
+affected record is retried.
+
+With a CircuitBreaker the watchdog also pauses before each lookup while the
+portal is down; lookups that ran into the outage, and records that would
+otherwise be given up while the portal is down, are retried once it is back.
+"""
+
+import asyncio
+
+from config import RECORD_DEADLINE_SECONDS, RECORD_MAX_ATTEMPTS, log_entry
+from circuit_breaker import OPEN
+from scrapping import clear_search_form, scrape_record
+
+
+class PageCrashed(Exception):
+    """
+    Raised when the page's renderer crashed or the browser connection dropped.
+    """
+
+
+class RecordWatchdog:
+    """
+    Runs lookups on one page with a deadline, crash detection and recovery.
+
+    Attributes:
+        page: The page currently used for lookups; replaced after a crash.
+        timeouts (int): Lookups that hit the deadline.
+        crashes (int): Lookups aborted by a crash or disconnect.
+        recoveries (int): Times the page was replaced.
+        outage_retries (int): Lookups repeated because they ran into an outage.
+    """
+
+    def __init__(
+        self,
+        page,
+        session=None,
+        deadline=RECORD_DEADLINE_SECONDS,
+        max_attempts=RECORD_MAX_ATTEMPTS,
+        breaker=None,
+    ):
+        self.session = session
+        self.breaker = breaker
+        self.outage_retries = 0
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.timeouts = 0
+        self.crashes = 0
+        self.recoveries = 0
+        self._crash_reason = None
+        self._crashed = asyncio.Event()
+        self._browser = None
+        # (emitter, event, listener) registered on the current page and browser
+        self._page_listeners = []
+        self._browser_listener = None
+        self.page = None
+        self._watch(page)
+
+    def _watch(self, page):
+        self._unwatch_page()
+        self.page = page
+        self._crash_reason = None
+        self._crashed.clear()
+        # pyppeteer emits "error" for Inspector.targetCrashed
+        self._page_listeners = [
+            (
+                page,
+                "error",
+                page.on(
+                    "error",
+                    lambda error, page=page: self._on_event(page, f"target crashed: {error}"),
+                ),
+            ),
+            (page, "close", page.on("close", lambda page=page: self._on_event(page, "page closed"))),
+        ]
+        if self.breaker is not None:
+            self.breaker.attach(page)
+        browser = self.session.browser if self.session is not None else None
+        if browser is not None and browser is not self._browser:
+            self._unwatch_browser()
+            self._browser = browser
+            self._browser_listener = browser.on(
+                "disconnected",
+                lambda browser=browser: self._on_event(browser, "browser disconnected"),
+            )
+
+    def _unwatch_page(self):
+        for emitter, event, listener in self._page_listeners:
+            emitter.remove_listener(event, listener)
+        self._page_listeners = []
+        if self.breaker is not None and self.page is not None:
+            self.breaker.detach(self.page)
+
+    def _unwatch_browser(self):
+        if self._browser_listener is not None:
+            self._browser.remove_listener("disconnected", self._browser_listener)
+        self._browser_listener = None
+
+    def follow(self, page):
+        """
+        Switches to a page the session opened by itself, e.g. after logging in
+        again between batches.
+        """
+        if page is not self.page:
+            self._watch(page)
+
+    def close(self):
+        """
+        Removes the listeners from the page and browser, which outlive the
+        watchdog in a long-running session.
+        """
+        self._unwatch_page()
+        self._unwatch_browser()
+        self._browser = None
+
+    def _on_event(self, source, reason):
+        # Events from a page or browser that has already been replaced are stale
+        if source is self.page or source is self._browser:
+            self._crash_reason = reason
+            self._crashed.set()
+
+    async def _run_with_deadline(self, coroutine):
+        lookup = asyncio.ensure_future(coroutine)
+        crashed = asyncio.ensure_future(self._crashed.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {lookup, crashed},
+                timeout=self.deadline,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            crashed.cancel()
+            if not lookup.done():
+                lookup.cancel()
+                await asyncio.gather(lookup, return_exceptions=True)
+        if lookup in done:
+            return lookup.result()
+        if self._crashed.is_set():
+            raise PageCrashed(self._crash_reason)
+        raise asyncio.TimeoutError(f"lookup exceeded {self.deadline} seconds")
+
+    async def _recover(self, crashed):
+        if not crashed:
+            # The page is alive but the form may be half filled
+            try:
+                await asyncio.wait_for(clear_search_form(self.page), 10)
+                return
+            except Exception as e:
+                print(f"Could not reset the search form: {e or type(e).__name__}")
+        if self.session is None:
+            raise PageCrashed("page is unusable and there is no session to recover it")
+        print(f"Replacing the search page ({self._crash_reason or 'unresponsive'})")
+        page = await self.session.replace_page(self.page)
+        self.recoveries += 1
+        self._watch(page)
+
+    async def lookup(self, service_number, last_name):
+        """
+        Looks up one record, retrying it on a recovered page if it hangs or crashes.
+
+        While the breaker is open the lookup waits for the portal to come back;
+        those retries do not count as attempts.
+
+        Returns:
+            dict: The report row; "record data" is "Lookup failed" when every
+            attempt failed.
+        """
+        attempt = 0
+        while attempt < self.max_attempts:
+            if self.breaker is not None:
+                await self.breaker.wait_until_closed()
+                self.breaker.begin(self.page)
+            row = None
+            crashed = False
+            try:
+                if self._crashed.is_set():
+                    raise PageCrashed(self._crash_reason)
+                row = await self._run_with_deadline(
+                    scrape_record(self.page, service_number, last_name)
+                )
+            except PageCrashed as e:
+                self.crashes += 1
+                crashed = True
+                error = f"page crashed ({e})"
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                error = f"no result within {self.deadline} seconds"
+            except Exception as e:
+                crashed = self.page.isClosed()
+                error = str(e)
+            outage = None
+            if self.breaker is not None:
+                outage = await self.breaker.outage_signal(self.page, row is None)
+            if row is not None and outage is None:
+                return row
+            if outage is not None:
+                self.outage_retries += 1
+                error = f"portal outage ({outage})"
+            if self.breaker is not None and self.breaker.state == OPEN:
+                print(
+                    f"Lookup of {service_number} {last_name} will be retried "
+                    f"when the portal is back: {error}"
+                )
+            else:
+                attempt += 1
+                print(
+                    f"Lookup of {service_number} {last_name} failed on attempt "
+                    f"{attempt}/{self.max_attempts}: {error}"
+                )
+                if (
+                    attempt >= self.max_attempts
+                    and self.breaker is not None
+                    and not await self.breaker.check_portal()
+                ):
+                    # The record failed because the portal is down, not on its own
+                    attempt -= 1
+                    self.outage_retries += 1
+                    print(
+                        f"Lookup of {service_number} {last_name} will be retried "
+                        f"when the portal is back"
+                    )
+            if self.breaker is not None and self.breaker.state == OPEN:
+                # Recovering against a portal that is down would only fail;
+                # the probe logs in again if the outage ended the session
+                on_session_page = self.session is not None and self.session.page is self.page
+                await self.breaker.wait_until_closed()
+                if (
+                    on_session_page
+                    and self.session.page is not None
+                    and self.session.page is not self.page
+                ):
+                    # The probe already relaunched or logged in again; use
+                    # its page rather than replacing ours a second time
+                    self._watch(self.session.page)
+                    continue
+                crashed = crashed or self.page.isClosed()
+            try:
+                await self._recover(crashed)
+            except Exception as e:
+                print(f"Recovery failed: {e}")
+                break
+        log_entry("ERROR", service_number, last_name, f"Lookup failed: {error}")
+        return {
+            "lastName": last_name,
+            "service": service_number,
+            "record data": "Lookup failed",
+        }
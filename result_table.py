@@ -0,0 +1,207 @@
+"""
+Compact, column-oriented storage for scraped report rows.
+
+A list of row dicts costs a dict, a set of key pointers and a fresh string per
+field for every record. ResultTable stores the rows column by column instead:
+
+    - Low-cardinality columns (status, training, dates, "record data") are
+      dictionary encoded: one interned string per distinct value plus a 4-byte
+      code per row in an array.
+    - Free-text columns (name, lastName, service) are packed into one UTF-8
+      buffer with an 8-byte end offset per row, the layout Arrow uses for
+      large_string.
+
+to_dataframe() hands the codes to pandas as Categorical columns without
+building per-row Python objects, and to_arrow() wraps the buffers directly when
+pyarrow is installed. Run benchmarks/result_memory.py to compare bytes per
+record with the list of dicts.
+"""
+
+import sys
+from array import array
+
+from config import REPORT_COLUMNS
+
+# Columns with few distinct values across a report
+CATEGORICAL_COLUMNS = ("training", "status", "expirationDate", "reportDate", "record data")
+
+
+def _as_text(value):
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+
+class DictionaryColumn:
+    """
+    Column stored as interned categories and an int32 code per row.
+    """
+
+    __slots__ = ("codes", "categories", "_lookup")
+
+    def __init__(self):
+        self.codes = array("i")
+        self.categories = []
+        self._lookup = {}
+
+    def append(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.categories)
+            self.categories.append(sys.intern(value))
+        self.codes.append(code)
+
+    def __getitem__(self, index):
+        return self.categories[self.codes[index]]
+
+    def nbytes(self):
+        return (
+            self.codes.itemsize * len(self.codes)
+            + sum(sys.getsizeof(value) for value in self.categories)
+        )
+
+
+class PackedStringColumn:
+    """
+    Column stored as one UTF-8 buffer and int64 end offsets.
+    """
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+
+    def append(self, value):
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, index):
+        return self.data[self.offsets[index] : self.offsets[index + 1]].decode("utf-8")
+
+    def __iter__(self):
+        data, offsets = self.data, self.offsets
+        for index in range(len(offsets) - 1):
+            yield data[offsets[index] : offsets[index + 1]].decode("utf-8")
+
+    def nbytes(self):
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class ResultTable:
+    """
+    Append-only table of report rows.
+
+    Rows are appended as the dicts produced by scrape_record; missing fields
+    are stored as "" and every value is stored as text. Iterating yields row
+    dicts again, so code that expects the old list of dicts keeps working.
+
+    Note:
+        to_dataframe() and to_arrow() may share the table's buffers; do not
+        append to the table while their results are still in use.
+
+    Args:
+        columns (list): Column names, in report order.
+        categorical (tuple): Columns to dictionary encode.
+    """
+
+    def __init__(self, columns=REPORT_COLUMNS, categorical=CATEGORICAL_COLUMNS):
+        self.columns = list(columns)
+        self._data = {
+            column: DictionaryColumn() if column in categorical else PackedStringColumn()
+            for column in self.columns
+        }
+        self._length = 0
+
+    def append(self, row):
+        for column, values in self._data.items():
+            values.append(_as_text(row.get(column)))
+        self._length += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("ResultTable index out of range")
+        return {column: values[index] for column, values in self._data.items()}
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self[index]
+
+    def __repr__(self):
+        return f"<ResultTable {self._length} rows, {self.nbytes()} bytes>"
+
+    def to_records(self):
+        """
+        Returns:
+            list: The rows as dicts, e.g. for JSON serialisation.
+        """
+        return list(self)
+
+    def nbytes(self):
+        """
+        Returns:
+            int: Approximate bytes held by the column buffers and categories.
+        """
+        return sum(values.nbytes() for values in self._data.values())
+
+    def to_dataframe(self):
+        """
+        Builds a DataFrame; dictionary columns become Categoricals made
+        straight from the code buffers.
+
+        Returns:
+            pandas.DataFrame: One column per report column, in report order.
+        """
+        import numpy as np
+        import pandas as pd
+
+        frame = {}
+        for column, values in self._data.items():
+            if isinstance(values, DictionaryColumn):
+                codes = np.frombuffer(values.codes, dtype=np.int32)
+                frame[column] = pd.Categorical.from_codes(codes, values.categories)
+            else:
+                frame[column] = list(values)
+        return pd.DataFrame(frame, columns=self.columns)
+
+    def to_arrow(self):
+        """
+        Wraps the buffers in a pyarrow Table without copying them.
+
+        Returns:
+            pyarrow.Table: dictionary<int32, string> and large_string columns.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        import pyarrow as pa
+
+        arrays = []
+        for values in self._data.values():
+            if isinstance(values, DictionaryColumn):
+                codes = pa.Array.from_buffers(
+                    pa.int32(), self._length, [None, pa.py_buffer(values.codes)]
+                )
+                arrays.append(
+                    pa.DictionaryArray.from_arrays(
+                        codes, pa.array(values.categories, pa.string())
+                    )
+                )
+            else:
+                arrays.append(
+                    pa.Array.from_buffers(
+                        pa.large_string(),
+                        self._length,
+                        [None, pa.py_buffer(values.offsets), pa.py_buffer(values.data)],
+                    )
+                )
+        return pa.Table.from_arrays(arrays, names=self.columns)
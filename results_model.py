@@ -0,0 +1,300 @@
+"""
+Lazy table model showing the rows of the report being scraped.
+
+The model never holds the rows themselves. It indexes the spooled report CSV
+as the engine appends to it and keeps, per row, its byte offset in the file,
+a dictionary-encoded status and the expiry date as an ordinal, plus its place
+in the view: 20 bytes a row (offset 8, status 4, expiry 4, view 4), so 100k
+rows cost about 2 MB. Cells are read back from the file only when the view
+paints them, through a small row cache.
+
+Sorting (by status, expiry, or file order for the other columns) and filtering
+(by status and expiry) only rebuild an array of row numbers; new rows are
+placed into it with a binary search, so the view keeps its order while rows
+stream in. Placing a row in a sorted view shifts the rows after it, which is
+O(n), but only moves 4 bytes a row: about 0.4 MB per row at 100k rows, well
+under a millisecond, against the batches of rows the engine sends every half
+second. In report order new rows are appended at the end. Rows are exposed to
+the view in RESULTS_FETCH_ROWS chunks through canFetchMore()/fetchMore(), so
+QTableView only ever lays out what was scrolled to.
+"""
+
+import csv
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from config import (
+    EXPIRATION_DATE_FORMAT,
+    REPORT_COLUMNS,
+    RESULTS_FETCH_ROWS,
+    RESULTS_ROW_CACHE,
+)
+from result_table import DictionaryColumn
+
+# Expiry filters offered in the window: None, "missing", or a (first, last)
+# range of days from today, either end open when None
+EXPIRY_FILTERS = {
+    "Any expiry": None,
+    "Expired": (None, -1),
+    "Expires within 30 days": (0, 30),
+    "Expires within 90 days": (0, 90),
+    "No expiry date": "missing",
+}
+
+
+def _expiry_ordinal(value):
+    try:
+        return datetime.strptime(value, EXPIRATION_DATE_FORMAT).toordinal()
+    except ValueError:
+        return 0
+
+
+class ReportTableModel(QAbstractTableModel):
+    """
+    Table model over a report CSV that is still being written.
+
+    Attributes:
+        path (str or None): The report file shown.
+        columns (list): Column names, from the file's header.
+    """
+
+    def __init__(self, parent=None, fetch_rows=RESULTS_FETCH_ROWS, cache_rows=RESULTS_ROW_CACHE):
+        super().__init__(parent)
+        self.fetch_rows = fetch_rows
+        self.cache_rows = cache_rows
+        self.columns = list(REPORT_COLUMNS)
+        self.path = None
+        self._file = None
+        self._status_filter = None
+        self._expiry_filter = None
+        self._sort_column = None
+        self._descending = False
+        self._clear()
+
+    def _clear(self):
+        self._header_read = False
+        self._scan_offset = 0
+        self._offsets = array("q")
+        self._statuses = DictionaryColumn()
+        self._expiry = array("i")
+        # Expiry dates repeat across rows, and strptime is the slowest step
+        self._ordinals = {}
+        # Row numbers in display order, after filtering and sorting
+        self._view = array("i")
+        self._exposed = 0
+        self._cache = OrderedDict()
+
+    def load(self, path):
+        """
+        Shows another report, e.g. when the next workbook starts.
+
+        The sort order and expiry filter are kept; the status filter is
+        cleared since the new report has its own statuses.
+        """
+        self.beginResetModel()
+        self.close_file()
+        self.path = path
+        self._status_filter = None
+        self._clear()
+        self.endResetModel()
+        self.refresh()
+
+    def close_file(self):
+        """
+        Closes the report file so it can be moved; it is reopened on demand.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _handle(self):
+        if self._file is None and self.path is not None:
+            try:
+                self._file = open(self.path, "rb")
+            except OSError:
+                return None
+        return self._file
+
+    def statuses(self):
+        """
+        Returns:
+            list: Every status seen so far, in order of appearance.
+        """
+        return list(self._statuses.categories)
+
+    def refresh(self):
+        """
+        Indexes the rows appended to the report since the last call.
+
+        Returns:
+            int: Number of new rows.
+        """
+        handle = self._handle()
+        if handle is None:
+            return 0
+        handle.seek(self._scan_offset)
+        chunk = handle.read()
+        row_start = search = 0
+        first_row = len(self._offsets)
+        while True:
+            end = chunk.find(b"\n", search)
+            if end < 0:
+                # A partly flushed row is picked up by the next refresh
+                break
+            line = chunk[row_start : end + 1]
+            if line.count(b'"') % 2:
+                # Newline inside a quoted field
+                search = end + 1
+                continue
+            self._index_row(self._scan_offset + row_start, line)
+            row_start = search = end + 1
+        self._scan_offset += row_start
+        for row in range(first_row, len(self._offsets)):
+            if self._accepts(row):
+                self._place(row)
+        return len(self._offsets) - first_row
+
+    def _index_row(self, offset, line):
+        values = next(csv.reader([line.decode("utf-8")]))
+        if not self._header_read:
+            self._header_read = True
+            self.columns = values
+            self.headerDataChanged.emit(Qt.Horizontal, 0, len(values) - 1)
+            return
+        row = dict(zip(self.columns, values))
+        self._offsets.append(offset)
+        # Rows without a portal status say why in "record data"
+        self._statuses.append(row.get("status") or row.get("record data", ""))
+        expiration = row.get("expirationDate", "")
+        ordinal = self._ordinals.get(expiration)
+        if ordinal is None:
+            ordinal = self._ordinals[expiration] = _expiry_ordinal(expiration)
+        self._expiry.append(ordinal)
+
+    def _row_values(self, row):
+        values = self._cache.get(row)
+        if values is not None:
+            self._cache.move_to_end(row)
+            return values
+        end = self._offsets[row + 1] if row + 1 < len(self._offsets) else self._scan_offset
+        handle = self._handle()
+        if handle is None:
+            return []
+        handle.seek(self._offsets[row])
+        values = next(csv.reader([handle.read(end - self._offsets[row]).decode("utf-8")]))
+        self._cache[row] = values
+        if len(self._cache) > self.cache_rows:
+            self._cache.popitem(last=False)
+        return values
+
+    def _accepts(self, row):
+        if self._status_filter is not None and self._statuses[row] != self._status_filter:
+            return False
+        if self._expiry_filter is None:
+            return True
+        ordinal = self._expiry[row]
+        if self._expiry_filter == "missing":
+            return ordinal == 0
+        if ordinal == 0:
+            return False
+        first, last = self._expiry_filter
+        days = ordinal - date.today().toordinal()
+        return (first is None or days >= first) and (last is None or days <= last)
+
+    def _sort_key(self, row):
+        if self._sort_column == "status":
+            return self._statuses[row]
+        if self._sort_column == "expirationDate":
+            return self._expiry[row]
+        return row
+
+    def _place(self, row):
+        position = len(self._view)
+        if self._sort_column is not None:
+            key = self._sort_key(row)
+            low, high = 0, len(self._view)
+            while low < high:
+                middle = (low + high) // 2
+                other = self._sort_key(self._view[middle])
+                if (key > other) if self._descending else (key < other):
+                    high = middle
+                else:
+                    low = middle + 1
+            position = low
+        # array.insert shifts the tail (O(n) memmove), see the module docstring
+        if position < self._exposed:
+            self.beginInsertRows(QModelIndex(), position, position)
+            self._view.insert(position, row)
+            self._exposed += 1
+            self.endInsertRows()
+        else:
+            # Shown once the view fetches that far
+            self._view.insert(position, row)
+
+    def set_filter(self, status=None, expiry=None):
+        """
+        Shows only the rows with the status and within the expiry range.
+
+        Args:
+            status (str or None): Status to keep, None for all.
+            expiry: A value of EXPIRY_FILTERS.
+        """
+        self._status_filter = status
+        self._expiry_filter = expiry
+        self._rebuild_view()
+
+    def _rebuild_view(self):
+        self.beginResetModel()
+        rows = [row for row in range(len(self._offsets)) if self._accepts(row)]
+        if self._sort_column is not None:
+            rows.sort(key=self._sort_key, reverse=self._descending)
+        self._view = array("i", rows)
+        self._exposed = min(len(self._view), max(self._exposed, self.fetch_rows))
+        self.endResetModel()
+
+    # QAbstractTableModel interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._exposed
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._exposed < len(self._view)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.fetch_rows, len(self._view) - self._exposed)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._exposed, self._exposed + count - 1)
+        self._exposed += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        values = self._row_values(self._view[index.row()])
+        return values[index.column()] if index.column() < len(values) else ""
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        # Position in the report, which differs from the view row when sorted
+        return str(self._view[section] + 1) if section < self._exposed else None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Sorts by status or expiry; the other columns sort by report order.
+        """
+        name = self.columns[column] if 0 <= column < len(self.columns) else None
+        self._sort_column = name if name in ("status", "expirationDate") else ""
+        self._descending = order == Qt.DescendingOrder
+        self._rebuild_view()
@@ -6,14 +6,32 @@ import asyncio
 import pyppeteer
 import math
 from pyppeteer_stealth import stealth
+from portal_selectors import RESULT_FIELDS, registry
+from result_table import ResultTable
+from tracing import trace_span
 from utils import print_the_output_statement
 
 
-async def abiotic_login(browser, username, password, output_text):
+async def error_page_shown(page):
+    """
+    Returns:
+        bool: True if the page shows the portal's error page (the large grey
+        status code shown instead of the app when it is down).
+    """
+    return await registry.exists(page, "error_page")
+
+
+async def abiotic_login(browser, username, password, output_text, tracer=None):
     print("Login Processing.........................")
     page = await browser.newPage()  # type: ignore
     await stealth(page)
     await page.setViewport({"width": WIDTH, "height": HEIGHT})
+    # The login is rare and slow, so it is always fully traced when tracing is on
+    async with trace_span(tracer, page, "login", force=True):
+        return await _login_on_page(browser, page, username, password, output_text)
+
+
+async def _login_on_page(browser, page, username, password, output_text):
     Response = ""
     # return True, Response, browser, page
     try:
@@ -22,43 +40,29 @@ async def abiotic_login(browser, username, password, output_text):
         if load_page:
             await asyncio.sleep(7)
             # Select the element using XPath
-            element_404_error = await page.xpath(
-                '//span[@style="margin-left: 450px; margin-top: 120px; font-size: 120px; color: rgb(122, 124, 125); font-weight: 900; display: inline; position: absolute;"]'
-            )
-            if element_404_error:
+            if await error_page_shown(page):
                 text = "Internal Error Occurred while running application. Please Try Again!!"
                 print(f"error {text}")
                 return False, text, "", ""
             else:
                 # Username Elements
-                username_selector = (
-                    "#username"  # CSS selector for the element with id 'username'
-                )
-                await page.waitForSelector(username_selector)
-                username_element = await page.querySelector(username_selector)
+                username_element = await registry.wait_for(page, "login_username")
                 await username_element.type(username)
                 print(f"Enter the username with type {username}")
                 await asyncio.sleep(3)
 
                 await asyncio.sleep(3)
                 # Password
-                password_selector = (
-                    "#password"  # CSS selector for the element with id 'password'
-                )
-                await page.waitForSelector(password_selector)
-                password_element = await page.querySelector(password_selector)
+                password_element = await registry.wait_for(page, "login_password")
                 await password_element.type(password)
                 print(f'Enter the password with secure password {"*" * len(password)}')
                 await asyncio.sleep(3)
                 # Login Button Clicked
-                login_button_selector = "button.abc-login_submit-button_Sl8_I"  # CSS selector for the button with the specific class
-                await page.waitForSelector(login_button_selector)
-                login_button = await page.querySelector(login_button_selector)
+                login_button = await registry.wait_for(page, "login_submit")
                 await login_button.click()
                 print("Login button clicked")
                 await asyncio.sleep(7)
-                popup_selector = '[role="alertdialog"]'  # CSS selector for the element with role="alertdialog"
-                popup_element = await page.querySelector(popup_selector)
+                popup_element = await registry.find(page, "login_popup")
                 if popup_element:
                     popup_text = await popup_element.querySelectorEval(
                         "pre", "node => node.innerText"
@@ -66,19 +70,14 @@ async def abiotic_login(browser, username, password, output_text):
                     print("popup_text", popup_text)
                     return False, popup_text, "", ""
                 else:
-                    # Select the button by its aria-label and click it
-                    button_aria_label = "Switch Dashboard"
-                    button_selector = f'[aria-label="{button_aria_label}"]'
-                    await page.waitForSelector(button_selector)
-                    button_element = await page.querySelector(button_selector)
+                    # Open the dashboard switcher and pick the search dashboard
+                    button_element = await registry.wait_for(page, "switch_dashboard")
                     await button_element.click()
-                    print(f'Clicked the button with aria-label "{button_aria_label}"')
+                    print('Clicked the button with aria-label "Switch Dashboard"')
                     await asyncio.sleep(5)
                     # Second
-                    target_element_xpath = '//*[@id="long-menu"]/div[2]/ul/li'
-                    await page.waitForXPath(target_element_xpath)
-                    target_element = await page.xpath(target_element_xpath)
-                    await target_element[0].click()
+                    target_element = await registry.wait_for(page, "dashboard_menu_item")
+                    await target_element.click()
                     await asyncio.sleep(10)
                     print("nexe button .....2")
                     Response = f"Login Successfully with username={username}"
@@ -98,117 +97,169 @@ async def abiotic_login(browser, username, password, output_text):
         print_the_output_statement(output_text, f"Login Process Failed: {str(e)}")
 
 
-async def scrapping_data(browser, page, json_data, output_text):
+async def clear_search_form(page):
+    """
+    Clicks the portal's clear button so the search form is ready for the next record.
+
+    Args:
+        page: The logged-in search page.
+    """
+    clear_button = await registry.wait_for(page, "clear_button")
+    await clear_button.click()
+
+
+def normalize_record(record):
+    """
+    Extracts the search fields of a workbook record.
+
+    Args:
+        record (dict): One workbook row keyed by column header.
+
+    Returns:
+        tuple: (service_number, last_name); either is "" when missing or invalid.
+    """
+    server_id = record.get("Server_ID")
+    try:
+        service_number = "" if server_id is None or math.isnan(float(server_id)) else int(float(server_id))
+    except ValueError:
+        service_number = ""
+    last_name = record.get("Last_Name")
+    if last_name is None or (isinstance(last_name, float) and math.isnan(last_name)):
+        last_name = ""
+    return service_number, str(last_name).strip()
+
+
+async def scrape_record(page, service_number, last_name):
+    """
+    Searches the portal for one record and reads the result card.
+
+    Args:
+        page: The logged-in search page.
+        service_number (int): Server ID to search for.
+        last_name (str): Last name to search for.
+
+    Returns:
+        dict: The report row, with "record data" set to "success" or "No data found".
+    """
+    table_data = {}
+    print(
+        f"scrapping of the data {service_number} and last name {last_name}"
+    )
+    server_id_element = await registry.wait_for(page, "search_server_id")
+    last_name_element = await registry.wait_for(page, "search_last_name")
+    await server_id_element.type(str(service_number))
+    await last_name_element.type(last_name)
+    # Click the search button
+    search_button_element = await registry.wait_for(page, "search_button")
+    await search_button_element.click()
+    await asyncio.sleep(5)
+    viewport_height = await page.evaluate("window.innerHeight")
+    print("viewport_height element is found")
+    scroll_distance = int(viewport_height * 0.2)
+    await page.evaluate(f"window.scrollBy(0, {scroll_distance})")
+    print(f"scroll_distance progress")
+    element_exists = await registry.exists(page, "no_records")
+    if element_exists:
+        # expirationDate,lastName,name,reportDate,service,status,training
+        table_data["expirationDate"] = ""
+        table_data["lastName"] = last_name
+        table_data["reportDate"] = datetime.now().strftime("%Y-%m-%d")
+        table_data["service"] = service_number
+        table_data["status"] = ''
+        table_data["training"] = ""
+        table_data["record data"] = "No data found"
+        log_entry(
+            "ERROR",
+            service_number,
+            last_name,
+            f"No data found",
+        )
+        print(
+            f"There are no records by selected search parameters on the service_number {service_number} and last name {last_name}",
+        )
+
+    else:
+        print(
+            f"data found on the {service_number}",
+        )
+        log_entry("INFO", service_number, last_name, "success")
+        print(
+            f"Getting data from table for {service_number } and {last_name}"
+        )
+        texts = await registry.read_texts(page, list(RESULT_FIELDS))
+        table_data = {RESULT_FIELDS[name]: text for name, text in texts.items()}
+        if table_data:
+            table_data["reportDate"] = datetime.now().strftime("%Y-%m-%d")
+            table_data["lastName"] = (
+                last_name  # Replace with actual last name
+            )
+            table_data["record data"] = (
+                "success"  # Replace with actual last name
+            )
+    await clear_search_form(page)
+    return table_data
+
+
+async def scrapping_data(
+    browser,
+    page,
+    json_data,
+    output_text,
+    close_browser=True,
+    progress_callback=None,
+    watchdog=None,
+    tracer=None,
+):
+    """
+    Looks up every record of the workbook on the portal search page.
+
+    Args:
+        browser: The logged-in pyppeteer browser.
+        page: The page returned by abiotic_login.
+        json_data (str): Workbook records as produced by xlsx_to_json.
+        output_text: Widget (or ConsoleOutput) receiving progress messages.
+        close_browser (bool): Close the browser when done; distributed workers
+            keep it open to process the next batch.
+        progress_callback (callable or None): Called as
+            progress_callback(processed, total, row) after every record; row
+            is None for records skipped because of missing fields.
+        watchdog (RecordWatchdog or None): When given, every lookup runs under
+            its per-record deadline and a crashed page is replaced instead of
+            ending the run.
+        tracer (LookupTracer or None): Traces sampled and slow lookups.
+
+    Returns:
+        tuple: (True, ResultTable of result rows).
+
+    Raises:
+        Exception: Whatever ended the run before every record was looked up,
+            so callers never take the rows collected so far for the whole batch.
+    """
     print("scrapping_data")
     json_object = parse_json(json_data)
     print_the_output_statement(output_text, f'Total Number of Records {len(json_object)}')
 
     # print("json_object", json_object)
-    Response = []
+    Response = ResultTable()
+    total = len(json_object)
+    processed = 0
     try:
-        for record in json_object:
-            table_data = {}  # Initialize table_data for each record
-            service_number = "" if math.isnan(record["Server_ID"]) else int(record["Server_ID"])
-            # print("service_number", service_number)
-            last_name = record["Last_Name"]
+        for processed, record in enumerate(json_object, start=1):
+            service_number, last_name = normalize_record(record)
             if service_number and last_name:
-                print(
-                    f"scrapping of the data {service_number} and last name {last_name}"
-                )
-                last_name_xpath = '//*[@id="lastName"]'
-                await page.waitForXPath('//*[@id="serverId"]')
-                await page.waitForXPath(last_name_xpath)
-                server_id_element = await page.xpath('//*[@id="serverId"]')
-                await server_id_element[0].type(str(service_number))
-                last_name_element = await page.xpath(last_name_xpath)
-                await last_name_element[0].type(last_name)
-                # Click the search button
-                search_button_xpath = '//*[@id="root"]/div/div[3]/div/div[2]/div[2]/div[1]/div[2]/div/div/div/div/div[2]/button[2]/span[1]'
-                await page.waitForXPath(search_button_xpath)
-                search_button_element = await page.xpath(search_button_xpath)
-                await search_button_element[0].click()
-                await asyncio.sleep(5)
-                viewport_height = await page.evaluate("window.innerHeight")
-                print("viewport_height element is found")
-                scroll_distance = int(viewport_height * 0.2)
-                await page.evaluate(f"window.scrollBy(0, {scroll_distance})")
-                print(f"scroll_distance progress")
-                check_script = """
-                                            () => {
-                                                const div = document.querySelector('div.sc-gAnuJb.gzDMq');
-                                                if (div) {
-                                                    const pElement = div.querySelector('p');
-                                                    if (pElement && pElement.textContent.trim() === 'There are no records by selected search parameters') {
-                                                        return true;
-                                                    }
-                                                }
-                                                return false;
-                                            }
-                                        """
-                element_exists = await page.evaluate(check_script)
-                if element_exists:
-                    # expirationDate,lastName,name,reportDate,service,status,training
-                    table_data["expirationDate"] = ""
-                    table_data["lastName"] = last_name
-                    table_data["reportDate"] = datetime.now().strftime("%Y-%m-%d")
-                    table_data["service"] = service_number
-                    table_data["status"] = ''
-                    table_data["training"] = ""
-                    table_data["record data"] = "No data found"
+                async with trace_span(
+                    tracer,
+                    watchdog.page if watchdog is not None else page,
+                    f"{service_number}_{last_name}",
+                ):
+                    if watchdog is not None:
+                        table_data = await watchdog.lookup(service_number, last_name)
+                    else:
+                        table_data = await scrape_record(page, service_number, last_name)
+                if table_data:
                     Response.append(table_data)
-                    log_entry(
-                        "ERROR",
-                        service_number,
-                        last_name,
-                        f"No data found",
-                    )
-                    print(
-                        f"There are no records by selected search parameters on the service_number {service_number} and last name {last_name}",
-                    )
-
-                else:
-                    print(
-                        f"data found on the {service_number}",
-                    )
-                    log_entry("INFO", service_number, last_name, "success")
-                    print(
-                        f"Getting data from table for {service_number } and {last_name}"
-                    )
-                    table_data = await page.evaluate(
-                        """() => {
-                                        const nameElement = document.querySelector('#root > div > div:nth-child(3) > div > div:nth-child(2) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > div > div > div:nth-child(1) > div > div:nth-child(1) > div > div > p > span');
-                                        const serviceElement = document.querySelector('#root > div > div:nth-child(3) > div > div:nth-child(2) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > div > div > div:nth-child(1) > div > div:nth-child(2) > div > div > p');
-                                        const trainingElement = document.querySelector('#root > div > div:nth-child(3) > div > div:nth-child(2) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > div > div > div:nth-child(1) > div > div:nth-child(3) > div > div > p');
-                                        const statusElement = document.querySelector('#root > div > div:nth-child(3) > div > div:nth-child(2) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > div > div > div:nth-child(1) > div > div:nth-child(4) > div > div > p');
-                                        const expireDateElement = document.querySelector('#root > div > div:nth-child(3) > div > div:nth-child(2) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > div > div > div:nth-child(1) > div > div:nth-child(5) > div > div > p');
-
-                                        return {
-                                            name: nameElement ? nameElement.innerText.trim() : '',
-                                            service: serviceElement ? serviceElement.innerText.trim() : '',
-                                            training: trainingElement ? trainingElement.innerText.trim() : '',
-                                            status: statusElement ? statusElement.innerText.trim() : '',
-                                            expirationDate: expireDateElement ? expireDateElement.innerText.trim() : ''
-                                        };
-                                    }"""
-                    )
-                    if table_data:
-                        table_data["reportDate"] = datetime.now().strftime("%Y-%m-%d")
-                        table_data["lastName"] = (
-                            last_name  # Replace with actual last name
-                        )
-                        table_data["record data"] = (
-                            "success"  # Replace with actual last name
-                        )
-                        Response.append(table_data)
-                await page.waitForXPath(
-                    '//button[contains(@class, "search-box-container_action-clear")]'
-                )
-
-                clear_button = await page.xpath(
-                    '//button[contains(@class, "search-box-container_action-clear")]'
-                )
-
-                await clear_button[0].click()
+                if progress_callback:
+                    progress_callback(processed, total, table_data or None)
             else:
                 log_entry(
                         "ERROR",
@@ -217,13 +268,13 @@ async def scrapping_data(browser, page, json_data, output_text):
                         f'Server ID or Last name is messing of last name {last_name}',
                     )
                 print_the_output_statement(output_text, f'Server ID or Last name is messing of last name {last_name}')
-    except PyppeteerTimeoutError as timeout_error:
-        print(f"timeout_error {timeout_error}")
-    except pyppeteer.errors.NetworkError as NetworkError:
-        print(f"NetworkError {NetworkError}")
+                if progress_callback:
+                    progress_callback(processed, total, None)
     except Exception as e:
-        print(f"NetworkError {e}")
+        print(f"Scraping stopped at record {processed} of {total}: {e}")
+        raise
     finally:
-        await browser.close()
+        if close_browser:
+            await browser.close()
     # print_the_output_statement(output_text, f"Total records processed: {processed_count}")
     return True, Response
@@ -0,0 +1,358 @@
+"""
+Long-running service mode: keeps one logged-in browser warm and scrapes every
+workbook dropped into an inbox folder.
+
+Each new .xlsx file in the inbox is streamed through the ScrapePipeline on the
+warm session; the report is written to the outbox and the workbook is moved to
+inbox/processed (or inbox/failed). The session is checked periodically while
+idle and logs in again when the portal session expires, so the browser launch
+and ~40s login are paid once instead of once per file.
+
+By default the inbox is polled continuously; with --schedule it is only
+scanned at the times matched by a cron expression.
+
+Usage:
+    python service.py --inbox inbox --outbox outbox
+    python service.py --schedule "0 6,18 * * 1-5"
+
+Credentials are read from --username/--password or the
+ABC_USERNAME/ABC_PASSWORD environment variables.
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+from config import (
+    SERVICE_INBOX,
+    SERVICE_OUTBOX,
+    SERVICE_POLL_INTERVAL,
+    SESSION_CHECK_INTERVAL,
+    FILE_NAME,
+    FILE_TYPE,
+    LOOP_LAG_THRESHOLD,
+    PROFILE_MODE,
+    TRACE_SAMPLE_RATE,
+    TRACE_SLOWEST_PERCENT,
+)
+from pipeline import ScrapePipeline
+from profiling import PROFILE_MODES, maybe_profile
+from session import BrowserSession, LoginError
+from tracing import LookupTracer
+from utils import ConsoleOutput, create_directory, read_xlsx_header
+
+REQUIRED_HEADERS = ["Server_ID", "Last_Name"]
+
+
+class CronSchedule:
+    """
+    Minimal five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Each field accepts "*", numbers, ranges ("1-5"), steps ("*/15", "0-30/10")
+    and comma-separated lists of those. Day of week runs 0-6 from Sunday (7 is
+    also Sunday). As in cron, when both day fields are restricted a day matches
+    if either does.
+    """
+
+    _RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+        self.expression = expression
+        self._restricted = [field != "*" for field in fields]
+        self._values = [
+            self._parse_field(field, low, high)
+            for field, (low, high) in zip(fields, self._RANGES)
+        ]
+        if 7 in self._values[4]:
+            self._values[4].add(0)
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for part in field.split(","):
+            part_range, _, step = part.partition("/")
+            if part_range == "*":
+                start, end = low, high
+            elif "-" in part_range:
+                start, end = (int(value) for value in part_range.split("-"))
+            else:
+                start = end = int(part_range)
+                if step:
+                    end = high
+            if not (low <= start <= end <= high):
+                raise ValueError(f"Cron field '{field}' is outside {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def matches(self, moment):
+        minutes, hours, days, months, weekdays = self._values
+        if moment.minute not in minutes or moment.hour not in hours:
+            return False
+        if moment.month not in months:
+            return False
+        day_matches = moment.day in days
+        # datetime.weekday() is Monday=0; cron is Sunday=0
+        weekday_matches = (moment.weekday() + 1) % 7 in weekdays
+        if self._restricted[2] and self._restricted[4]:
+            return day_matches or weekday_matches
+        return day_matches and weekday_matches
+
+    def next_run(self, after):
+        """
+        Returns:
+            datetime: The first matching minute strictly after the given time.
+        """
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Every valid expression matches at least once within ~4 years
+        for _ in range(4 * 366 * 24 * 60):
+            if self.matches(moment):
+                return moment
+            moment += timedelta(minutes=1)
+        raise ValueError(f"Cron expression never matches: '{self.expression}'")
+
+
+def pending_workbooks(inbox, min_age=2):
+    """
+    Lists the workbooks in the inbox that are ready to be processed.
+
+    Files modified within the last min_age seconds are skipped because they may
+    still be being copied in.
+
+    Args:
+        inbox (str): Folder to scan.
+        min_age (float): Minimum seconds since the file was last modified.
+
+    Returns:
+        list: Paths sorted by modification time, oldest first.
+    """
+    now = time.time()
+    paths = [
+        os.path.join(inbox, name)
+        for name in os.listdir(inbox)
+        if name.lower().endswith(".xlsx") and not name.startswith("~$")
+    ]
+    paths = [path for path in paths if os.path.isfile(path)]
+    return sorted(
+        (path for path in paths if now - os.path.getmtime(path) >= min_age),
+        key=os.path.getmtime,
+    )
+
+
+class ScrapingService:
+    """
+    Processes inbox workbooks on a single warm, authenticated browser.
+    """
+
+    def __init__(
+        self,
+        session,
+        inbox,
+        outbox,
+        schedule=None,
+        poll_interval=SERVICE_POLL_INTERVAL,
+        trace_sample_rate=0,
+        trace_slowest_percent=0,
+    ):
+        self.session = session
+        self.trace_sample_rate = trace_sample_rate
+        self.trace_slowest_percent = trace_slowest_percent
+        self.inbox = inbox
+        self.outbox = outbox
+        self.schedule = schedule
+        self.poll_interval = poll_interval
+        self.processed_folder = os.path.join(inbox, "processed")
+        self.failed_folder = os.path.join(inbox, "failed")
+        self.output = ConsoleOutput()
+        for folder in (inbox, outbox, self.processed_folder, self.failed_folder):
+            create_directory(folder)
+
+    def _archive(self, xlsx_path, folder):
+        target = os.path.join(folder, os.path.basename(xlsx_path))
+        if os.path.exists(target):
+            stem, extension = os.path.splitext(target)
+            target = f"{stem}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}{extension}"
+        shutil.move(xlsx_path, target)
+
+    async def process_file(self, xlsx_path):
+        """
+        Scrapes one workbook into the outbox and archives it.
+
+        Returns:
+            str or None: The report path, or None if the workbook was rejected.
+        """
+        print(f"Processing {xlsx_path}")
+        loop = asyncio.get_running_loop()
+        try:
+            header_columns, has_records = await loop.run_in_executor(
+                None, read_xlsx_header, xlsx_path
+            )
+        except Exception as e:
+            print(f"Cannot read {xlsx_path}: {e}")
+            self._archive(xlsx_path, self.failed_folder)
+            return None
+        missing_headers = [
+            header for header in REQUIRED_HEADERS if header not in header_columns
+        ]
+        if missing_headers or not has_records:
+            print(f"{xlsx_path} is empty or missing headers {missing_headers}")
+            self._archive(xlsx_path, self.failed_folder)
+            return None
+
+        await self.session.ensure_ready()
+        stem = os.path.splitext(os.path.basename(xlsx_path))[0]
+        report_path = os.path.join(
+            self.outbox,
+            f"{stem}_{FILE_NAME}_report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.{FILE_TYPE}",
+        )
+        started = time.time()
+        # Written under a temporary name so outbox readers never see a partial report
+        partial_path = f"{report_path}.part"
+        pipeline = ScrapePipeline(
+            xlsx_path,
+            partial_path,
+            [self.session.page],
+            self.output,
+            session=self.session,
+            tracer=LookupTracer.create(
+                self.trace_sample_rate, self.trace_slowest_percent
+            ),
+        )
+        try:
+            rows_written = await pipeline.run()
+            os.replace(partial_path, report_path)
+        finally:
+            # Left behind only when the run failed or was stopped; the
+            # workbook is scraped again from the start, never resumed from it
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        self._archive(xlsx_path, self.processed_folder)
+        print(
+            f"{xlsx_path}: {rows_written} rows written to {report_path} "
+            f"in {time.time() - started:.1f} seconds"
+        )
+        return report_path
+
+    async def process_inbox(self):
+        """
+        Processes every workbook currently waiting in the inbox.
+        """
+        for xlsx_path in pending_workbooks(self.inbox):
+            try:
+                await self.process_file(xlsx_path)
+            except LoginError as e:
+                # Leave the remaining files for the next scan
+                print(f"Login failed, retrying later: {e}")
+                return
+            except Exception as e:
+                print(f"Failed to process {xlsx_path}: {e}")
+                self._archive(xlsx_path, self.failed_folder)
+
+    async def _wait_until(self, deadline):
+        # Sleep until the deadline while keeping the session warm
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, SESSION_CHECK_INTERVAL))
+            if time.time() - self._last_check >= SESSION_CHECK_INTERVAL:
+                self._last_check = time.time()
+                try:
+                    await self.session.ensure_ready()
+                except LoginError as e:
+                    print(f"Keep-alive login failed, retrying later: {e}")
+
+    async def run_forever(self):
+        """
+        Watches the inbox (or waits for scheduled times) and processes workbooks.
+        """
+        await self.session.ensure_ready()
+        self._last_check = time.time()
+        print(f"Watching {self.inbox}, reports go to {self.outbox}")
+        while True:
+            if self.schedule:
+                next_run = self.schedule.next_run(datetime.now())
+                print(f"Next scheduled run at {next_run}")
+                await self._wait_until(next_run.timestamp())
+            await self.process_inbox()
+            if not self.schedule:
+                await self._wait_until(time.time() + self.poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ABC portal scraping service")
+    parser.add_argument("--inbox", default=SERVICE_INBOX)
+    parser.add_argument("--outbox", default=SERVICE_OUTBOX)
+    parser.add_argument("--schedule", help='cron expression, e.g. "0 6 * * 1-5"')
+    parser.add_argument("--poll-interval", type=float, default=SERVICE_POLL_INTERVAL)
+    parser.add_argument("--username", default=os.environ.get("ABC_USERNAME"))
+    parser.add_argument("--password", default=os.environ.get("ABC_PASSWORD"))
+    parser.add_argument(
+        "--once", action="store_true", help="Process the current inbox and exit"
+    )
+    parser.add_argument(
+        "--trace-sample",
+        type=float,
+        default=TRACE_SAMPLE_RATE,
+        help="Fraction of lookups recorded with a full DevTools trace",
+    )
+    parser.add_argument(
+        "--trace-slowest",
+        type=float,
+        default=TRACE_SLOWEST_PERCENT,
+        help="Percentage of the slowest lookups whose request timings are kept",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        default=PROFILE_MODE or None,
+        help="Profile the whole run and report event loop stalls when it stops",
+    )
+    parser.add_argument(
+        "--lag-threshold",
+        type=float,
+        default=LOOP_LAG_THRESHOLD,
+        help="Seconds the event loop must be blocked to record a stall",
+    )
+    args = parser.parse_args()
+    if not args.username or not args.password:
+        parser.error("needs --username/--password or ABC_USERNAME/ABC_PASSWORD")
+    schedule = CronSchedule(args.schedule) if args.schedule else None
+
+    async def run():
+        session = BrowserSession(args.username, args.password)
+        service = ScrapingService(
+            session,
+            args.inbox,
+            args.outbox,
+            schedule,
+            args.poll_interval,
+            args.trace_sample,
+            args.trace_slowest,
+        )
+        try:
+            async with maybe_profile(args.profile, args.lag_threshold):
+                if args.once:
+                    await session.ensure_ready()
+                    await service.process_inbox()
+                else:
+                    await service.run_forever()
+        finally:
+            await session.close()
+
+    try:
+        asyncio.run(run())
+    except LoginError as e:
+        print(f"Login failed: {e}")
+        raise SystemExit(1)
+    except KeyboardInterrupt:
+        print("Service stopped")
+
+
+if __name__ == "__main__":
+    main()
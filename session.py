@@ -0,0 +1,285 @@
+"""
+Logged-in browser session shared by the GUI engine, the service mode and the
+distributed workers.
+
+A BrowserSession launches Chrome once, logs in with abiotic_login and keeps the
+search page around. ensure_ready() is called before each unit of work and
+transparently relaunches the browser or logs in again when the portal session
+has expired, so long-running processes never pay for a fresh login unless it
+is actually needed.
+
+Chrome runs on a persistent BrowserProfile, so the portal's static assets
+stay in the disk cache between launches and between runs.
+
+With BROWSER_SHARED the session connects to the host's shared Chrome (see
+shared_browser.py) and only disconnects from it on close(), leaving its
+logged-in tab for the next job to pick up.
+
+Every login is followed by the selector pre-flight, so a portal redeploy that
+broke the page structure fails the login with a diagnostic instead of letting
+a run produce empty rows.
+"""
+
+import time
+
+from pyppeteer_stealth import stealth
+
+from browser_profile import BrowserProfile, warm_up
+from config import (
+    BROWSER_CACHE_WARMUP,
+    BROWSER_SHARED,
+    HEIGHT,
+    PREFLIGHT_ENABLED,
+    WIDTH,
+)
+from portal_selectors import SelectorHealthError, preflight, registry
+from scrapping import abiotic_login
+from shared_browser import claim_warm_tab, connect_shared_browser, own_tab, release_tab
+from utils import ConsoleOutput
+from webdriver import launch_browser
+
+
+class LoginError(Exception):
+    """
+    Raised when the portal rejects the login or the browser cannot be started.
+    """
+
+
+class BrowserSession:
+    """
+    A launched browser with an authenticated search page.
+
+    Attributes:
+        browser: The pyppeteer browser, or None before start().
+        page: The logged-in search page, or None before start().
+        search_url (str): URL of the search page after login, used to open more tabs.
+        logged_in_at (float): time.time() of the last successful login.
+        profile (BrowserProfile): The persistent Chrome profile and disk cache.
+        shared (bool): Use the host's shared Chrome instead of launching one.
+        on_browser_started (callable or None): Called with the pid of every
+            Chrome this session launches, including relaunches.
+    """
+
+    def __init__(self, username, password, output_text=None, shared=BROWSER_SHARED):
+        self.username = username
+        self.password = password
+        self.output_text = output_text or ConsoleOutput()
+        self.browser = None
+        self.page = None
+        self.search_url = None
+        self.logged_in_at = None
+        self.disconnected = False
+        self.profile = BrowserProfile()
+        self.shared = shared
+        self.on_browser_started = None
+
+    def _on_disconnected(self):
+        self.disconnected = True
+
+    async def launch(self):
+        """
+        Launches the browser and warms its cache, without logging in.
+
+        Called ahead of time so Chrome is ready by the time credentials are
+        entered; does nothing if the browser is already running.
+
+        Raises:
+            LoginError: If the browser cannot be started.
+        """
+        if self.browser is not None:
+            return
+        try:
+            if self.shared:
+                self.browser, started = await connect_shared_browser(self.profile)
+            else:
+                self.profile.acquire()
+                self.browser = await launch_browser(self.profile)
+                started = True
+        except Exception as e:
+            self.profile.release()
+            raise LoginError(f"Error initializing browser: {e}")
+        process = getattr(self.browser, "process", None)
+        if process is not None:
+            # A Chrome outliving this process still holds the profile
+            self.profile.record_browser_pid(process.pid)
+            if self.on_browser_started is not None:
+                self.on_browser_started(process.pid)
+        self.disconnected = False
+        self.browser.on("disconnected", self._on_disconnected)
+        if not started:
+            # A running Chrome is already warm, and may hold a logged-in tab
+            await self._adopt_warm_tab()
+        elif BROWSER_CACHE_WARMUP:
+            try:
+                await warm_up(self.browser, self.profile)
+            except Exception as e:
+                print(f"Cache warm-up failed: {e}")
+
+    async def _adopt_warm_tab(self):
+        page = await claim_warm_tab(self.browser)
+        if page is None:
+            return
+        self.page = page
+        if not await self.is_authenticated():
+            # Left on an expired session; start() replaces it
+            return
+        # Stealth patches and viewport belong to the previous DevTools connection
+        await stealth(page)
+        await page.setViewport({"width": WIDTH, "height": HEIGHT})
+        self.search_url = page.url
+        self.logged_in_at = time.time()
+        print(f"Reusing the logged-in tab {page.url}")
+        await self._preflight(page)
+
+    async def _preflight(self, page):
+        if PREFLIGHT_ENABLED:
+            try:
+                await preflight(page)
+            except SelectorHealthError as e:
+                raise LoginError(str(e))
+
+    async def start(self, tracer=None):
+        """
+        Launches the browser if needed and logs in.
+
+        Args:
+            tracer (LookupTracer or None): Records a DevTools trace of the login.
+
+        Returns:
+            str: The login status message.
+
+        Raises:
+            LoginError: If the browser cannot be started, the login fails or
+                the search page fails the selector pre-flight.
+        """
+        await self.launch()
+        if self.page is not None:
+            # A stale page from an expired session
+            try:
+                await self.page.close()
+            except Exception:
+                pass
+            self.page = None
+        login_result = await abiotic_login(
+            self.browser, self.username, self.password, self.output_text, tracer
+        )
+        if not login_result:
+            raise LoginError("Login Process Failed")
+        status, LoginStatus, _, page = login_result
+        if not status:
+            raise LoginError(LoginStatus)
+        self.page = page
+        self.search_url = page.url
+        self.logged_in_at = time.time()
+        if self.shared:
+            await own_tab(page)
+        await self._preflight(page)
+        return LoginStatus
+
+    async def replace_page(self, old_page):
+        """
+        Swaps a crashed or wedged page for a fresh authenticated one.
+
+        A new tab is opened on the search page URL, sharing the browser's
+        cookies; if that does not show the search form (or the browser itself
+        is gone) a full login is done instead.
+
+        Args:
+            old_page: The page to discard.
+
+        Returns:
+            The replacement search page.
+
+        Raises:
+            LoginError: If the session cannot be restored.
+        """
+        if self.shared:
+            await release_tab(old_page)
+        try:
+            if not old_page.isClosed():
+                await old_page.close()
+        except Exception as e:
+            print(f"Could not close the old page: {e}")
+        if old_page is self.page:
+            self.page = None
+        if self.browser is None or self.disconnected or not self.search_url:
+            await self.ensure_ready()
+            return self.page
+
+        page = await self.browser.newPage()
+        try:
+            await stealth(page)
+            await page.setViewport({"width": WIDTH, "height": HEIGHT})
+            await page.goto(self.search_url, waitUntil="domcontentloaded")
+            await registry.wait_for(page, "search_server_id", timeout=15000)
+            if self.shared:
+                await own_tab(page)
+        except Exception as e:
+            print(f"Fresh tab did not reach the search page ({e}), logging in again")
+            try:
+                await page.close()
+            except Exception:
+                pass
+            await self.start()
+            return self.page
+        if self.page is None:
+            self.page = page
+        return page
+
+    async def is_authenticated(self):
+        """
+        Checks that the search page is still open and not bounced to the login form.
+
+        Returns:
+            bool: True if the page still shows the search form.
+        """
+        if self.browser is None or self.disconnected:
+            return False
+        if self.page is None or self.page.isClosed():
+            return False
+        try:
+            if "/login" in self.page.url:
+                return False
+            return await registry.exists(self.page, "search_server_id")
+        except Exception as e:
+            print(f"Session check failed: {e}")
+            return False
+
+    async def ensure_ready(self):
+        """
+        Makes sure there is a live browser with a logged-in search page.
+
+        The browser is relaunched if it died and the login is repeated if the
+        portal session expired.
+
+        Raises:
+            LoginError: If re-authentication fails.
+        """
+        if self.browser is not None and self.disconnected:
+            print("Browser connection lost, relaunching")
+            await self.close()
+        if not await self.is_authenticated():
+            print("Session expired, logging in again" if self.logged_in_at else "Logging in")
+            await self.start()
+
+    async def close(self):
+        """
+        Closes the browser and unlocks its profile.
+
+        A shared browser is only disconnected from, with the search page left
+        open for the next job.
+        """
+        if self.browser is not None and self.shared:
+            await release_tab(self.page)
+            try:
+                await self.browser.disconnect()
+            except Exception as e:
+                print(f"Error disconnecting from the shared browser: {e}")
+        elif self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception as e:
+                print(f"Error closing browser: {e}")
+        self.profile.release()
+        self.browser = None
+        self.page = None
@@ -0,0 +1,273 @@
+"""
+One Chrome shared by every scraper process on the host.
+
+With BROWSER_SHARED a BrowserSession does not launch Chrome itself. It reads
+the DevTools endpoint from http://127.0.0.1:<port>/json/version (trying the port
+saved in BROWSER_ENDPOINT_FILE, then BROWSER_DEBUG_PORT) and connects to it. If
+no Chrome answers, one is started detached on the shared profile, its endpoint
+is saved, and it keeps running after the job: sessions disconnect instead of
+closing it, so the next job skips the Chrome startup and reuses a warm,
+logged-in tab.
+
+Tabs are handed out through BROWSER_TABS_FILE, which maps the DevTools target
+id of every tab in use to the pid driving it, so two processes never drive the
+same tab; a tab whose owner no longer runs is free again. The map is kept on
+this side rather than in the page, where a navigation would wipe it.
+Processes sharing a browser also share its portal cookies, so they should use
+the same account.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import signal
+import subprocess
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from pyppeteer import connect
+
+from browser_profile import STALE_LOCK_GRACE, lock_age, pid_alive
+from config import (
+    BROWSER_DEBUG_PORT,
+    BROWSER_ENDPOINT_FILE,
+    BROWSER_START_TIMEOUT,
+    BROWSER_TABS_FILE,
+    LOGINURL,
+)
+from webdriver import start_detached_chrome
+
+# Longest a process waits for the tab map, which is only held for a read and write
+TABS_LOCK_TIMEOUT = 10
+
+
+def _read_endpoint_file(endpoint_file):
+    try:
+        with open(endpoint_file, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _devtools_endpoint(port, timeout=1):
+    # The WebSocket URL changes with every Chrome start, so it is always asked
+    # for rather than taken from the saved file
+    try:
+        with urllib.request.urlopen(
+            f"http://127.0.0.1:{port}/json/version", timeout=timeout
+        ) as response:
+            return json.loads(response.read().decode("utf-8"))["webSocketDebuggerUrl"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def discover_endpoint(port=BROWSER_DEBUG_PORT, endpoint_file=BROWSER_ENDPOINT_FILE):
+    """
+    Looks for a running Chrome with remote debugging.
+
+    Returns:
+        str or None: The browser's WebSocket DevTools endpoint.
+    """
+    ports = [_read_endpoint_file(endpoint_file).get("port"), port]
+    for candidate in dict.fromkeys(p for p in ports if p):
+        endpoint = _devtools_endpoint(candidate)
+        if endpoint:
+            return endpoint
+    return None
+
+
+class _FileLock:
+    # Serializes work on a shared file between processes. A lock whose holder
+    # no longer runs is taken over; a live holder is waited for until timeout.
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+
+    async def __aenter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                descriptor = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                with os.fdopen(descriptor, "w") as file:
+                    file.write(str(os.getpid()))
+                return self
+            except FileExistsError:
+                try:
+                    with open(self.path) as file:
+                        owner = int(file.read())
+                except (OSError, ValueError):
+                    owner = None
+                if owner is None:
+                    # The holder may not have written its pid yet
+                    stale = lock_age(self.path) > STALE_LOCK_GRACE
+                else:
+                    stale = not pid_alive(owner)
+                if stale:
+                    print(f"Removing stale lock {self.path} of pid {owner}")
+                    try:
+                        os.remove(self.path)
+                    except OSError:
+                        pass
+                    continue
+                if time.time() > deadline:
+                    holder = f"running process {owner}" if owner else "a process writing it"
+                    raise TimeoutError(
+                        f"{self.path} is still held by {holder} after {self.timeout} seconds"
+                    )
+            await asyncio.sleep(0.5)
+
+    async def __aexit__(self, *exc_info):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _kill(pid):
+    try:
+        if platform.system() == "Windows":
+            subprocess.run(["taskkill", "/PID", str(pid), "/T", "/F"], capture_output=True)
+        else:
+            os.kill(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+async def connect_shared_browser(
+    profile, port=BROWSER_DEBUG_PORT, endpoint_file=BROWSER_ENDPOINT_FILE
+):
+    """
+    Connects to the shared Chrome, starting it first if none is reachable.
+
+    Args:
+        profile (BrowserProfile): Selects the shared profile if Chrome is started.
+        port (int): Debugging port to start Chrome on.
+        endpoint_file (str): Where the endpoint of the shared Chrome is saved.
+
+    Returns:
+        tuple: (browser, started), started being True if Chrome was launched
+        by this call.
+
+    Raises:
+        Exception: If Chrome cannot be started or does not answer in time.
+    """
+    loop = asyncio.get_event_loop()
+    endpoint = await loop.run_in_executor(None, discover_endpoint, port, endpoint_file)
+    started = False
+    if endpoint is None:
+        os.makedirs(os.path.dirname(endpoint_file), exist_ok=True)
+        # The holder may need BROWSER_START_TIMEOUT for Chrome to answer
+        async with _FileLock(f"{endpoint_file}.lock", 2 * BROWSER_START_TIMEOUT):
+            # Another process may have started it while we waited for the lock
+            endpoint = await loop.run_in_executor(
+                None, discover_endpoint, port, endpoint_file
+            )
+            if endpoint is None:
+                profile.acquire_shared()
+                pid = start_detached_chrome(profile, port)
+                deadline = time.time() + BROWSER_START_TIMEOUT
+                while endpoint is None:
+                    if time.time() > deadline:
+                        # Detached, it would otherwise outlive us holding the profile
+                        _kill(pid)
+                        raise TimeoutError(
+                            f"Chrome did not open debugging port {port} "
+                            f"within {BROWSER_START_TIMEOUT} seconds"
+                        )
+                    await asyncio.sleep(0.25)
+                    endpoint = await loop.run_in_executor(None, _devtools_endpoint, port)
+                with open(endpoint_file, "w", encoding="utf-8") as file:
+                    json.dump(
+                        {"port": port, "pid": pid, "endpoint": endpoint, "since": time.time()},
+                        file,
+                    )
+                started = True
+    browser = await connect(browserWSEndpoint=endpoint)
+    print(f"{'Started' if started else 'Connected to'} shared browser at {endpoint}")
+    return browser, started
+
+
+async def _target_id(page):
+    # Stays the same across navigations, unlike anything stored in the page.
+    # pyppeteer only keeps it privately, so it is asked from DevTools.
+    client = await page.target.createCDPSession()
+    try:
+        info = await client.send("Target.getTargetInfo")
+    finally:
+        await client.detach()
+    return info["targetInfo"]["targetId"]
+
+
+def _read_tab_owners(tabs_file):
+    try:
+        with open(tabs_file, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_tab_owners(tabs_file, owners):
+    os.makedirs(os.path.dirname(tabs_file) or ".", exist_ok=True)
+    with open(tabs_file, "w", encoding="utf-8") as file:
+        json.dump(owners, file)
+
+
+async def claim_warm_tab(browser, tabs_file=BROWSER_TABS_FILE):
+    """
+    Takes over a portal tab left open by an earlier job.
+
+    Returns:
+        The claimed page, or None if no free portal tab is open.
+    """
+    portal_host = urlsplit(LOGINURL).hostname
+    pages = await browser.pages()
+    target_ids = [await _target_id(page) for page in pages]
+    async with _FileLock(f"{tabs_file}.lock", TABS_LOCK_TIMEOUT):
+        open_tabs = set(target_ids)
+        # Forget closed tabs and tabs whose owner exited
+        owners = {
+            target_id: owner
+            for target_id, owner in _read_tab_owners(tabs_file).items()
+            if target_id in open_tabs and pid_alive(owner)
+        }
+        claimed = None
+        for page, target_id in zip(pages, target_ids):
+            if urlsplit(page.url).hostname != portal_host or "/login" in page.url:
+                continue
+            if owners.get(target_id, os.getpid()) != os.getpid():
+                continue
+            owners[target_id] = os.getpid()
+            claimed = page
+            break
+        _write_tab_owners(tabs_file, owners)
+    return claimed
+
+
+async def own_tab(page, tabs_file=BROWSER_TABS_FILE):
+    """
+    Records a tab this process opened, so no other process claims it.
+    """
+    target_id = await _target_id(page)
+    async with _FileLock(f"{tabs_file}.lock", TABS_LOCK_TIMEOUT):
+        owners = _read_tab_owners(tabs_file)
+        owners[target_id] = os.getpid()
+        _write_tab_owners(tabs_file, owners)
+
+
+async def release_tab(page, tabs_file=BROWSER_TABS_FILE):
+    """
+    Marks a tab as free for the next job, leaving it open.
+    """
+    if page is None:
+        return
+    try:
+        target_id = await _target_id(page)
+        async with _FileLock(f"{tabs_file}.lock", TABS_LOCK_TIMEOUT):
+            owners = _read_tab_owners(tabs_file)
+            if owners.get(target_id) == os.getpid():
+                del owners[target_id]
+                _write_tab_owners(tabs_file, owners)
+    except Exception as e:
+        print(f"Could not release tab: {e}")
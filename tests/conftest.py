@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# The application modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Qt widgets and models are created without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(autouse=True)
+def log_folder(tmp_path, monkeypatch):
+    # Keep log files, traces and profiles written by the code under test out of
+    # the repository's log folder
+    folder = tmp_path / "log"
+    folder.mkdir()
+    for name in ("config", "tracing", "portal_selectors", "profiling"):
+        module = sys.modules.get(name)
+        if module is not None:
+            monkeypatch.setattr(module, "LOG_FOLDER", str(folder))
+    return folder
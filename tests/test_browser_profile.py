@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+from browser_profile import LOCK_FILE, STALE_LOCK_GRACE, BrowserProfile
+
+
+def _profile(tmp_path):
+    return BrowserProfile(root=str(tmp_path), slots=1, max_age_days=30)
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _write_lock(tmp_path, **owner):
+    slot_dir = tmp_path / "slot-0"
+    slot_dir.mkdir(exist_ok=True)
+    (slot_dir / LOCK_FILE).write_text(json.dumps(owner), encoding="utf-8")
+
+
+def test_acquire_locks_a_slot_and_release_frees_it(tmp_path):
+    profile = _profile(tmp_path)
+    slot_dir = profile.acquire()
+    assert slot_dir == os.path.join(str(tmp_path), "slot-0")
+    assert _profile(tmp_path).acquire() is None
+
+    profile.release()
+    assert not os.path.exists(os.path.join(slot_dir, LOCK_FILE))
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    _write_lock(tmp_path, pid=_dead_pid())
+    assert _profile(tmp_path).acquire() is not None
+
+
+def test_lock_of_a_live_orphan_chrome_is_kept(tmp_path):
+    chrome = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        _write_lock(tmp_path, pid=_dead_pid(), browser_pid=chrome.pid)
+        assert _profile(tmp_path).acquire() is None
+    finally:
+        chrome.kill()
+        chrome.wait()
+    assert _profile(tmp_path).acquire() is not None
+
+
+def test_browser_pid_is_recorded_in_the_lock(tmp_path):
+    profile = _profile(tmp_path)
+    slot_dir = profile.acquire()
+    profile.record_browser_pid(4321)
+    with open(os.path.join(slot_dir, LOCK_FILE), encoding="utf-8") as file:
+        owner = json.load(file)
+    assert owner["pid"] == os.getpid()
+    assert owner["browser_pid"] == 4321
+
+
+def test_unreadable_lock_is_held_until_it_is_old(tmp_path):
+    slot_dir = tmp_path / "slot-0"
+    slot_dir.mkdir()
+    lock_path = slot_dir / LOCK_FILE
+    # A locking process that has not written its owner yet
+    lock_path.write_text("", encoding="utf-8")
+    assert _profile(tmp_path).acquire() is None
+
+    old = os.path.getmtime(lock_path) - STALE_LOCK_GRACE - 1
+    os.utime(lock_path, (old, old))
+    assert _profile(tmp_path).acquire() is not None
+
+
+def test_lock_is_written_through_a_temporary_file(tmp_path):
+    profile = _profile(tmp_path)
+    slot_dir = profile.acquire()
+    profile.record_browser_pid(4321)
+    # The lock is linked or replaced into place; no temporary file is left
+    assert LOCK_FILE in os.listdir(slot_dir)
+    assert not [name for name in os.listdir(slot_dir) if name.endswith(".tmp")]
@@ -0,0 +1,287 @@
+import asyncio
+
+from pyee import EventEmitter
+
+import circuit_breaker
+import record_watchdog
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker
+from config import LOGINURL
+from record_watchdog import RecordWatchdog
+
+
+class FakeRequest:
+    def __init__(self, resource_type, navigation=False):
+        self.resourceType = resource_type
+        self.navigation = navigation
+
+    def isNavigationRequest(self):
+        return self.navigation
+
+
+class FakeResponse:
+    def __init__(self, status, resource_type, url=LOGINURL):
+        self.status = status
+        self.url = url
+        self.request = FakeRequest(resource_type, resource_type == "document")
+
+
+class FakePage(EventEmitter):
+    def __init__(self):
+        super().__init__()
+        self.error_page = False
+
+    def isClosed(self):
+        return False
+
+
+async def _error_page_shown(page):
+    return page.error_page
+
+
+def _breaker(monkeypatch, probe_results=(True,), threshold=3):
+    monkeypatch.setattr(circuit_breaker, "error_page_shown", _error_page_shown)
+    results = list(probe_results)
+
+    async def probe():
+        return results.pop(0) if results else True
+
+    return CircuitBreaker(probe, failure_threshold=threshold, base_delay=0, max_delay=0)
+
+
+def test_api_not_found_does_not_discard_a_successful_lookup(monkeypatch):
+    async def run():
+        breaker = _breaker(monkeypatch)
+        page = FakePage()
+        breaker.attach(page)
+        breaker.begin(page)
+        page.emit("response", FakeResponse(404, "xhr"))
+        page.emit("response", FakeResponse(403, "fetch"))
+        return breaker, await breaker.outage_signal(page, failed=False)
+
+    breaker, reason = asyncio.run(run())
+    assert reason is None
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_navigation_errors_and_api_server_errors_are_recorded(monkeypatch):
+    breaker = _breaker(monkeypatch)
+    page = FakePage()
+    breaker.attach(page)
+    page.emit("response", FakeResponse(404, "document"))
+    page.emit("response", FakeResponse(502, "xhr"))
+    page.emit("response", FakeResponse(500, "image"))
+    page.emit("response", FakeResponse(503, "xhr", "https://cdn.example.com/app.js"))
+    assert breaker._bad_responses[page] == [
+        f"HTTP 404 {LOGINURL}",
+        f"HTTP 502 {LOGINURL}",
+    ]
+
+
+def test_breaker_opens_after_threshold_and_closes_when_probe_succeeds(monkeypatch):
+    async def run():
+        breaker = _breaker(monkeypatch, probe_results=[False, True])
+        page = FakePage()
+        breaker.attach(page)
+        reasons = []
+        for _ in range(3):
+            breaker.begin(page)
+            reasons.append(await breaker.outage_signal(page, failed=True))
+        assert breaker.state == OPEN
+        # A row that overlapped the detected outage is not trusted
+        page.emit("response", FakeResponse(503, "xhr"))
+        assert await breaker.outage_signal(page, failed=False) == f"HTTP 503 {LOGINURL}"
+        await asyncio.wait_for(breaker.wait_until_closed(), 5)
+        return breaker, reasons
+
+    breaker, reasons = asyncio.run(run())
+    assert reasons == [None, None, "lookup failed"]
+    assert breaker.state == CLOSED
+    assert breaker.outages == 1
+    assert breaker.consecutive_failures == 0
+
+
+def test_error_page_opens_the_breaker_at_once(monkeypatch):
+    async def run():
+        breaker = _breaker(monkeypatch)
+        page = FakePage()
+        page.error_page = True
+        breaker.attach(page)
+        reason = await breaker.outage_signal(page, failed=False)
+        state = breaker.state
+        breaker.close()
+        return reason, state
+
+    assert asyncio.run(run()) == ("portal error page", OPEN)
+
+
+def test_success_resets_the_failure_count(monkeypatch):
+    async def run():
+        breaker = _breaker(monkeypatch)
+        page = FakePage()
+        breaker.attach(page)
+        await breaker.outage_signal(page, failed=True)
+        await breaker.outage_signal(page, failed=True)
+        await breaker.outage_signal(page, failed=False)
+        await breaker.outage_signal(page, failed=True)
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 1
+
+
+def test_first_record_hit_by_an_outage_is_retried(monkeypatch):
+    portal = {"up": False}
+    lookups = []
+
+    async def scrape_record(page, service_number, last_name):
+        lookups.append(portal["up"])
+        if not portal["up"]:
+            raise RuntimeError("search did not load")
+        return {"service": service_number, "lastName": last_name, "record data": "success"}
+
+    async def clear_search_form(page):
+        pass
+
+    async def probe():
+        up = portal["up"]
+        # The portal comes back after the first probe
+        portal["up"] = True
+        return up
+
+    async def run():
+        monkeypatch.setattr(circuit_breaker, "error_page_shown", _error_page_shown)
+        monkeypatch.setattr(record_watchdog, "scrape_record", scrape_record)
+        monkeypatch.setattr(record_watchdog, "clear_search_form", clear_search_form)
+        breaker = CircuitBreaker(probe, failure_threshold=3, base_delay=0, max_delay=0)
+        watchdog = RecordWatchdog(FakePage(), max_attempts=2, breaker=breaker)
+        return watchdog, await asyncio.wait_for(watchdog.lookup(1001, "SMITH"), 5)
+
+    watchdog, row = asyncio.run(run())
+    assert row["record data"] == "success"
+    assert lookups == [False, False, True]
+    assert watchdog.outage_retries == 1
+
+
+def test_attach_is_idempotent_and_close_detaches(monkeypatch):
+    breaker = _breaker(monkeypatch)
+    page = FakePage()
+    breaker.attach(page)
+    breaker.attach(page)
+    assert len(page.listeners("response")) == 1
+
+    breaker.close()
+    assert page.listeners("response") == []
+    assert breaker._bad_responses == {}
+
+
+def test_watchdog_listeners_do_not_pile_up(monkeypatch):
+    class FakeSession:
+        browser = EventEmitter()
+
+    breaker = _breaker(monkeypatch)
+    session = FakeSession()
+    first, second = FakePage(), FakePage()
+    watchdog = RecordWatchdog(first, session, breaker=breaker)
+    watchdog.follow(first)
+    watchdog.follow(second)
+
+    assert first.listeners("close") == [] and first.listeners("response") == []
+    assert len(second.listeners("close")) == 1
+    assert len(second.listeners("response")) == 1
+    assert len(session.browser.listeners("disconnected")) == 1
+
+    watchdog.close()
+    assert second.listeners("close") == [] and second.listeners("error") == []
+    assert session.browser.listeners("disconnected") == []
+
+
+def test_watchdog_uses_the_page_the_probe_logged_in_on(monkeypatch):
+    old_page, new_page = FakePage(), FakePage()
+    used_pages = []
+
+    class FakeSession:
+        browser = None
+        page = old_page
+
+        async def replace_page(self, page):
+            raise AssertionError("the page was replaced a second time")
+
+    session = FakeSession()
+
+    async def scrape_record(page, service_number, last_name):
+        used_pages.append(page)
+        if page is old_page:
+            page.error_page = True
+            raise RuntimeError("portal error page")
+        return {"service": service_number, "lastName": last_name, "record data": "success"}
+
+    async def probe():
+        # Logging in again during the outage opens a new search page
+        session.page = new_page
+        return True
+
+    async def run():
+        monkeypatch.setattr(circuit_breaker, "error_page_shown", _error_page_shown)
+        monkeypatch.setattr(record_watchdog, "scrape_record", scrape_record)
+        breaker = CircuitBreaker(probe, failure_threshold=3, base_delay=0, max_delay=0)
+        watchdog = RecordWatchdog(old_page, session, max_attempts=2, breaker=breaker)
+        return watchdog, await asyncio.wait_for(watchdog.lookup(1001, "SMITH"), 5)
+
+    watchdog, row = asyncio.run(run())
+    assert row["record data"] == "success"
+    assert used_pages == [old_page, new_page]
+    assert watchdog.page is new_page
+    assert watchdog.recoveries == 0
+
+
+def test_rows_answered_with_api_server_errors_open_the_breaker(monkeypatch):
+    async def run():
+        breaker = _breaker(monkeypatch, probe_results=[False] * 10)
+        page = FakePage()
+        breaker.attach(page)
+        reasons = []
+        for _ in range(3):
+            breaker.begin(page)
+            page.emit("response", FakeResponse(503, "xhr"))
+            reasons.append(await breaker.outage_signal(page, failed=False))
+        state, failures = breaker.state, breaker.consecutive_failures
+        breaker.close()
+        return reasons, state, failures
+
+    reasons, state, failures = asyncio.run(run())
+    assert reasons == [f"HTTP 503 {LOGINURL}"] * 3
+    assert state == OPEN
+    assert failures == 3
+
+
+def test_no_data_row_from_a_failing_search_api_is_retried(monkeypatch):
+    lookups = []
+
+    async def scrape_record(page, service_number, last_name):
+        lookups.append(service_number)
+        if len(lookups) == 1:
+            # The search API fails and the app shows "no records"
+            page.emit("response", FakeResponse(503, "xhr"))
+            return {
+                "service": service_number,
+                "lastName": last_name,
+                "record data": "No data found",
+            }
+        return {"service": service_number, "lastName": last_name, "record data": "success"}
+
+    async def clear_search_form(page):
+        pass
+
+    async def run():
+        breaker = _breaker(monkeypatch)
+        monkeypatch.setattr(record_watchdog, "scrape_record", scrape_record)
+        monkeypatch.setattr(record_watchdog, "clear_search_form", clear_search_form)
+        watchdog = RecordWatchdog(FakePage(), max_attempts=2, breaker=breaker)
+        return watchdog, await asyncio.wait_for(watchdog.lookup(1001, "SMITH"), 5)
+
+    watchdog, row = asyncio.run(run())
+    assert row["record data"] == "success"
+    assert lookups == [1001, 1001]
+    assert watchdog.outage_retries == 1
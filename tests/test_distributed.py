@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import distributed
+from result_table import ResultTable
+from work_queue import FAILED, PENDING, SQLiteWorkQueue
+
+
+class FakeSession:
+    browser = page = None
+
+    async def ensure_ready(self):
+        pass
+
+
+def test_worker_hands_back_a_batch_it_could_not_finish(tmp_path, monkeypatch):
+    async def scrapping_data(*args, **kwargs):
+        raise RuntimeError("browser went away")
+
+    monkeypatch.setattr(distributed, "scrapping_data", scrapping_data)
+    monkeypatch.setattr(distributed, "RecordWatchdog", lambda *args, **kwargs: None)
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+    queue.publish("job", [[{"Server_ID": 1, "Last_Name": "SMITH"}]])
+
+    asyncio.run(
+        distributed.worker_loop(queue, FakeSession(), "worker", 60, 0, exit_when_idle=True)
+    )
+
+    counts = queue.progress("job")
+    assert counts[FAILED] == 1 and counts[PENDING] == 0
+    assert queue.results("job") == []
+
+
+def test_worker_keeps_one_watchdog_for_the_session(tmp_path, monkeypatch):
+    watchdogs = []
+
+    class FakeWatchdog:
+        def __init__(self, page, session, breaker=None):
+            self.page = page
+            self.closed = False
+            watchdogs.append(self)
+
+        def follow(self, page):
+            self.page = page
+
+        def close(self):
+            self.closed = True
+
+    async def scrapping_data(browser, page, json_data, output, **kwargs):
+        rows = ResultTable()
+        for record in json.loads(json_data):
+            rows.append({"service": record["Server_ID"], "record data": "success"})
+        return True, rows
+
+    monkeypatch.setattr(distributed, "scrapping_data", scrapping_data)
+    monkeypatch.setattr(distributed, "RecordWatchdog", FakeWatchdog)
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"))
+    queue.publish("job", [[{"Server_ID": 1}], [{"Server_ID": 2}], [{"Server_ID": 3}]])
+
+    asyncio.run(
+        distributed.worker_loop(queue, FakeSession(), "worker", 60, 0, exit_when_idle=True)
+    )
+
+    assert len(watchdogs) == 1 and watchdogs[0].closed
+    assert [str(row["service"]) for row in queue.results("job")] == ["1", "2", "3"]
@@ -0,0 +1,78 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+from engine import ScrapingEngine
+
+
+@pytest.fixture
+def engine():
+    engine = ScrapingEngine()
+    engine.start()
+    yield engine
+    engine.shutdown()
+
+
+def test_jobs_run_one_after_another_in_submission_order(engine):
+    order = []
+
+    async def job(name, delay):
+        order.append(f"{name} start")
+        await asyncio.sleep(delay)
+        order.append(f"{name} end")
+        return name
+
+    futures = [engine.submit(job, "first", 0.05), engine.submit(job, "second", 0)]
+
+    assert [future.result(timeout=5) for future in futures] == ["first", "second"]
+    assert order == ["first start", "first end", "second start", "second end"]
+
+
+def test_cancel_stops_the_running_job_and_drops_queued_ones(engine):
+    started = threading.Event()
+
+    async def running():
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            return "stopped"
+
+    async def queued():
+        return "ran"
+
+    first = engine.submit(running)
+    second = engine.submit(queued)
+    assert started.wait(5)
+    engine.cancel_jobs()
+
+    # The running job handles the cancellation itself and still resolves
+    assert first.result(timeout=5) == "stopped"
+    with pytest.raises(concurrent.futures.CancelledError):
+        second.result(timeout=5)
+    # Jobs submitted after the Stop run normally
+    assert engine.submit(queued).result(timeout=5) == "ran"
+
+
+def test_stop_while_the_session_is_restored_reports_a_stopped_scrape(engine, tmp_path):
+    restoring = threading.Event()
+
+    class FakeSession:
+        logged_in_at = 1.0
+        page = None
+
+        async def ensure_ready(self):
+            restoring.set()
+            await asyncio.sleep(30)
+
+    engine.session = FakeSession()
+    report_path = str(tmp_path / "report.csv")
+    future = engine.submit_scrape(str(tmp_path / "records.xlsx"), report_path, None)
+    assert restoring.wait(5)
+    engine.cancel_jobs()
+
+    # The running job resolves as stopped; only queued jobs are cancelled
+    assert future.result(timeout=5) == (False, report_path, True)
+    engine.session = None
@@ -0,0 +1,77 @@
+import asyncio
+
+from openpyxl import Workbook
+
+import pipeline
+from config import REPORT_COLUMNS
+from engine_process import RowBatcher
+from pipeline import ScrapePipeline
+
+
+class FakeChannel:
+    def __init__(self):
+        self.events = []
+
+    def send(self, *event):
+        self.events.append(event)
+
+    def append(self, message):
+        pass
+
+
+class FakeWatchdog:
+    def __init__(self, page, session=None, breaker=None):
+        self.page = page
+        self.timeouts = self.crashes = self.recoveries = self.outage_retries = 0
+
+    async def lookup(self, service_number, last_name):
+        return {"service": service_number, "lastName": last_name, "record data": "success"}
+
+    def close(self):
+        pass
+
+
+def _workbook(path, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Server_ID", "Last_Name"])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def test_invalid_rows_are_counted_without_report_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "RecordWatchdog", FakeWatchdog)
+    xlsx_path = tmp_path / "records.xlsx"
+    _workbook(xlsx_path, [[1001, "SMITH"], [None, "DOE"], ["abc", ""], [1002, "LEE"]])
+    channel = FakeChannel()
+    batcher = RowBatcher(channel, "job")
+
+    written = asyncio.run(
+        ScrapePipeline(
+            str(xlsx_path), str(tmp_path / "report.csv"), [object()], channel, batcher
+        ).run()
+    )
+    batcher.flush()
+
+    assert written == 2
+    rows = [row for event in channel.events if event[0] == "rows" for row in event[2]]
+    services = [row[REPORT_COLUMNS.index("service")] for row in rows]
+    assert sorted(services) == [1001, 1002]
+    assert channel.events[-1] == ("progress", "job", 4, 4)
+
+
+def test_batches_are_sent_when_full(monkeypatch):
+    monkeypatch.setattr("engine_process.ENGINE_ROW_BATCH", 2)
+    monkeypatch.setattr("engine_process.ENGINE_FLUSH_SECONDS", 3600)
+    channel = FakeChannel()
+    batcher = RowBatcher(channel, "job")
+
+    batcher(1, 3, {"service": 1})
+    batcher(2, 3, None)
+    assert channel.events == []
+    batcher(3, 3, {"service": 2})
+
+    assert [event[0] for event in channel.events] == ["rows", "progress"]
+    assert len(channel.events[0][2]) == 2
+    assert channel.events[1] == ("progress", "job", 3, 3)
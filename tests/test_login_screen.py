@@ -0,0 +1,94 @@
+from openpyxl import Workbook
+
+import login_screen
+from login_screen import Worker
+
+
+def _finished(worker):
+    finished = []
+    worker.scrapping_finished.connect(lambda status, path: finished.append((status, path)))
+    return finished
+
+
+def test_stopped_scrape_succeeds_only_with_a_report(qapp, tmp_path):
+    worker = Worker()
+    finished = _finished(worker)
+    report_path = tmp_path / "report.csv"
+
+    worker._handle(("scrape_done", 1, False, str(report_path), True))
+    report_path.write_text("name\n", encoding="utf-8")
+    worker._handle(("scrape_done", 2, False, str(report_path), True))
+
+    assert finished == [(False, str(report_path)), (True, str(report_path))]
+
+
+def test_restart_reports_interrupted_jobs_after_the_poll(qapp, tmp_path, monkeypatch):
+    worker = Worker()
+    finished = _finished(worker)
+    restarted = []
+    worker.engine_restarted.connect(restarted.append)
+    monkeypatch.setattr(worker, "_stop_engine", lambda timeout: None)
+    monkeypatch.setattr(worker, "start_engine", lambda: restarted.append("started"))
+    report_path = tmp_path / "report.csv"
+    report_path.write_text("name\n", encoding="utf-8")
+    worker.jobs = {1: ("scrape", str(report_path))}
+
+    worker._restart("the engine hung")
+    assert finished == [] and restarted == ["started"]
+
+    qapp.processEvents()
+    assert finished == [(True, str(report_path))]
+    assert restarted == ["started", "the engine hung"]
+    assert worker.jobs == {}
+
+
+def _window(monkeypatch, tmp_path):
+    sent = []
+    monkeypatch.setattr(login_screen.Worker, "start_engine", lambda self: None)
+    monkeypatch.setattr(login_screen.Worker, "_send", lambda self, *command: sent.append(command))
+    monkeypatch.setattr(login_screen, "AUTO_START_SCRAPE", True)
+    xlsx_path = tmp_path / "records.xlsx"
+    workbook = Workbook()
+    workbook.active.append(["Server_ID", "Last_Name"])
+    workbook.active.append([1001, "SMITH"])
+    workbook.save(xlsx_path)
+    monkeypatch.setattr(
+        login_screen.QFileDialog,
+        "getOpenFileName",
+        staticmethod(lambda *args, **kwargs: (str(xlsx_path), "")),
+    )
+    window = login_screen.MainWindow()
+    window.username_field.setText("user")
+    window.password_field.setText("secret")
+    return window, sent, str(xlsx_path)
+
+
+def _scrapes(sent):
+    return [command[2] for command in sent if command[0] == "scrape"]
+
+
+def test_scrape_starts_when_the_file_is_chosen_after_login(qapp, tmp_path, monkeypatch):
+    window, sent, xlsx_path = _window(monkeypatch, tmp_path)
+
+    window.login_function()
+    assert [command[0] for command in sent] == ["login"]
+    window.on_login_finished(True, "Login successful")
+    assert _scrapes(sent) == []
+
+    window.upload_excel()
+    assert _scrapes(sent) == [xlsx_path]
+    assert window.file_path is None and window.report_paths
+
+
+def test_scrape_starts_when_login_ends_after_the_file_was_chosen(qapp, tmp_path, monkeypatch):
+    window, sent, xlsx_path = _window(monkeypatch, tmp_path)
+
+    window.login_function()
+    # The workbook is chosen and validated while the login still runs
+    window.upload_excel()
+    assert window.file_path == xlsx_path
+    assert _scrapes(sent) == []
+
+    window.on_login_finished(True, "Login successful")
+    assert _scrapes(sent) == [xlsx_path]
+    assert window.file_path is None
@@ -0,0 +1,60 @@
+import asyncio
+import csv
+
+from openpyxl import Workbook
+
+import pipeline
+from pipeline import ScrapePipeline
+
+
+class FakeOutput:
+    def append(self, message):
+        pass
+
+
+class FakeWatchdog:
+    pages_used = []
+
+    def __init__(self, page, session=None, breaker=None):
+        self.page = page
+        self.timeouts = self.crashes = self.recoveries = self.outage_retries = 0
+
+    async def lookup(self, service_number, last_name):
+        FakeWatchdog.pages_used.append(self.page)
+        await asyncio.sleep(0.001)
+        return {"service": service_number, "lastName": last_name, "record data": "success"}
+
+    def close(self):
+        pass
+
+
+def test_every_record_is_scraped_once_across_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "RecordWatchdog", FakeWatchdog)
+    FakeWatchdog.pages_used = []
+    xlsx_path = tmp_path / "records.xlsx"
+    workbook = Workbook()
+    workbook.active.append(["Server_ID", "Last_Name"])
+    for number in range(300):
+        workbook.active.append([1000 + number, f"NAME{number}"])
+    workbook.save(xlsx_path)
+    report_path = tmp_path / "report.csv"
+    progress = []
+
+    scraper = ScrapePipeline(
+        str(xlsx_path),
+        str(report_path),
+        ["page-1", "page-2", "page-3"],
+        FakeOutput(),
+        lambda processed, read, row: progress.append(processed),
+        queue_size=10,
+    )
+    written = asyncio.run(scraper.run())
+
+    assert written == 300
+    with open(report_path, newline="", encoding="utf-8") as file:
+        services = sorted(int(row["service"]) for row in csv.DictReader(file))
+    assert services == list(range(1000, 1300))
+    assert set(FakeWatchdog.pages_used) == {"page-1", "page-2", "page-3"}
+    assert progress[-1] == 300
+    # Bounded queues: no stage ever saw more than queue_size waiting items
+    assert all(stage.max_queue_depth <= 10 for stage in scraper.metrics.values())
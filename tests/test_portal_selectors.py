@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+import portal_selectors
+from portal_selectors import SelectorHealthError, SelectorRegistry, preflight
+
+
+class FakePage:
+    """
+    Evaluates the registry's match script against the expressions present on
+    the "page", mapped to their text.
+    """
+
+    def __init__(self, present):
+        self.present = present
+
+    async def evaluate(self, script, selectors):
+        matches = {}
+        for name, alternatives in selectors.items():
+            matches[name] = {"index": -1, "text": ""}
+            for index, (_, expression) in enumerate(alternatives):
+                if expression in self.present:
+                    matches[name] = {"index": index, "text": self.present[expression]}
+                    break
+        return matches
+
+
+def test_fallback_is_used_and_reported_once(capsys):
+    registry = SelectorRegistry(
+        {"search_button": ["css:#old", "css:button.search", "xpath://button"]}
+    )
+    page = FakePage({"button.search": "Search", "//button": "Other"})
+
+    assert asyncio.run(registry.read_texts(page, ["search_button"])) == {
+        "search_button": "Search"
+    }
+    asyncio.run(registry.exists(page, "search_button"))
+    assert registry.matched == {"search_button": 1}
+    assert capsys.readouterr().out.count("matched fallback #1") == 1
+
+
+def test_unmatched_selector():
+    registry = SelectorRegistry({"search_button": ["css:#old"]})
+    assert not asyncio.run(registry.exists(FakePage({}), "search_button"))
+    assert registry.matched == {}
+
+
+def test_alternatives_need_a_kind():
+    with pytest.raises(ValueError):
+        SelectorRegistry({"search_button": ["#old"]})
+
+
+def test_override_file_replaces_entries(tmp_path):
+    path = tmp_path / "portal_selectors.json"
+    path.write_text(
+        json.dumps({"version": "hotfix-1", "selectors": {"search_button": ["css:#new"]}}),
+        encoding="utf-8",
+    )
+    registry = SelectorRegistry.load(str(path))
+    assert registry.version.endswith("+hotfix-1")
+    assert registry.selectors["search_button"] == [["css", "#new"]]
+    assert registry.selectors["search_last_name"] == [["css", "#lastName"]]
+
+
+def test_preflight_names_the_broken_selectors(monkeypatch):
+    registry = SelectorRegistry()
+    monkeypatch.setattr(portal_selectors, "registry", registry)
+
+    async def save_diagnostics(page):
+        return None
+
+    monkeypatch.setattr(portal_selectors, "_save_diagnostics", save_diagnostics)
+    # Everything but the clear button is on the page
+    present = {
+        expression: "x"
+        for name in ("search_server_id", "search_last_name", "search_button")
+        for _, expression in registry.selectors[name]
+    }
+
+    with pytest.raises(SelectorHealthError) as error:
+        asyncio.run(preflight(FakePage(present), service_number="", last_name=""))
+    assert "clear_button: nothing matched" in str(error.value)
+    assert "search_button" not in str(error.value)
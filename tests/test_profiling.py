@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from profiling import LoopLagMonitor
+
+
+def test_lag_samples_are_bounded_but_totals_cover_every_tick():
+    monitor = LoopLagMonitor(interval=0.05, threshold=0.25, max_samples=100)
+    for tick in range(1000):
+        monitor._record(0.5 if tick == 3 else 0.001)
+
+    assert len(monitor.lags) == 100
+    assert monitor.ticks == 1000
+    assert monitor.max_lag == 0.5
+    assert abs(monitor.total_lag - (0.5 + 999 * 0.001)) < 1e-9
+    report = monitor.report()
+    assert "ticks: 1000 every 50 ms" in report
+    assert "max lag: 500.0 ms" in report
+    assert "median lag (last 100 ticks): 1.0 ms" in report
+
+
+def test_only_the_longest_stalls_keep_their_stack():
+    monitor = LoopLagMonitor(interval=0.05, threshold=0.25, max_stalls=5)
+    for number in range(200):
+        monitor._stall = [0.3 + (number % 50) / 100, number, f"stack {number}"]
+        monitor._end_stall()
+
+    assert monitor.stall_count == 200
+    assert len(monitor.stalls) == 5
+    # Four stalls of each duration; the five longest are 0.79 s and 0.78 s
+    assert sorted(round(stall[0], 2) for stall in monitor.stalls) == [0.78] + [0.79] * 4
+    report = monitor.report()
+    assert "stalls over 250 ms: 200" in report
+    assert "stacks of the 5 longest stalls follow" in report
+    assert report.count("--- loop blocked") == 5
+
+
+def test_a_blocked_loop_is_reported_once_with_its_full_duration():
+    async def run():
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.3)
+        await asyncio.sleep(0.1)
+        monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(run())
+    assert monitor.stall_count == 1
+    [(blocked, _, stack)] = monitor.stalls
+    assert blocked >= 0.2
+    assert "time.sleep(0.3)" in stack
@@ -0,0 +1,87 @@
+import asyncio
+
+from pyee import EventEmitter
+
+import record_watchdog
+from record_watchdog import RecordWatchdog
+
+
+class FakePage(EventEmitter):
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    def isClosed(self):
+        return self.closed
+
+
+class FakeSession:
+    def __init__(self):
+        self.browser = EventEmitter()
+        self.replaced = []
+
+    async def replace_page(self, page):
+        self.replaced.append(page)
+        return FakePage()
+
+
+def _patch(monkeypatch, scrape_record):
+    async def clear_search_form(page):
+        pass
+
+    monkeypatch.setattr(record_watchdog, "scrape_record", scrape_record)
+    monkeypatch.setattr(record_watchdog, "clear_search_form", clear_search_form)
+
+
+def test_hung_lookup_is_cut_at_the_deadline_and_retried(monkeypatch):
+    calls = []
+
+    async def scrape_record(page, service_number, last_name):
+        calls.append(page)
+        if len(calls) == 1:
+            await asyncio.sleep(30)
+        return {"service": service_number, "record data": "success"}
+
+    _patch(monkeypatch, scrape_record)
+    watchdog = RecordWatchdog(FakePage(), FakeSession(), deadline=0.1, max_attempts=2)
+    row = asyncio.run(asyncio.wait_for(watchdog.lookup(1001, "SMITH"), 5))
+
+    assert row["record data"] == "success"
+    assert watchdog.timeouts == 1 and watchdog.recoveries == 0
+    assert calls[0] is calls[1]
+
+
+def test_crashed_page_is_replaced(monkeypatch):
+    session = FakeSession()
+    first_page = FakePage()
+    calls = []
+
+    async def scrape_record(page, service_number, last_name):
+        calls.append(page)
+        if page is first_page:
+            page.emit("error", "renderer gone")
+            await asyncio.sleep(30)
+        return {"service": service_number, "record data": "success"}
+
+    _patch(monkeypatch, scrape_record)
+    watchdog = RecordWatchdog(first_page, session, deadline=5, max_attempts=2)
+    row = asyncio.run(asyncio.wait_for(watchdog.lookup(1001, "SMITH"), 5))
+
+    assert row["record data"] == "success"
+    assert watchdog.crashes == 1 and watchdog.recoveries == 1
+    assert session.replaced == [first_page]
+    assert calls[1] is watchdog.page is not first_page
+    # The replaced page no longer reports to the watchdog
+    assert first_page.listeners("error") == []
+
+
+def test_record_is_reported_failed_after_max_attempts(monkeypatch):
+    async def scrape_record(page, service_number, last_name):
+        raise RuntimeError("search form missing")
+
+    _patch(monkeypatch, scrape_record)
+    monkeypatch.setattr(record_watchdog, "log_entry", lambda *args: None)
+    watchdog = RecordWatchdog(FakePage(), FakeSession(), deadline=5, max_attempts=2)
+    row = asyncio.run(watchdog.lookup(1001, "SMITH"))
+
+    assert row == {"lastName": "SMITH", "service": 1001, "record data": "Lookup failed"}
@@ -0,0 +1,50 @@
+import pytest
+
+from config import REPORT_COLUMNS
+from result_table import ResultTable
+
+ROWS = [
+    {"name": "Ana Núñez", "lastName": "NUÑEZ", "service": 1001, "status": "Active"},
+    {"lastName": "LEE", "service": "1002", "record data": "No data found"},
+    {"name": None, "lastName": "SMITH", "service": 1003, "status": "Active"},
+]
+
+
+def _table():
+    table = ResultTable()
+    table.extend(ROWS)
+    return table
+
+
+def test_rows_round_trip_as_text():
+    table = _table()
+    assert len(table) == 3
+    assert table[0]["name"] == "Ana Núñez"
+    assert table[0]["service"] == "1001"
+    assert table[1]["name"] == "" and table[2]["name"] == ""
+    assert table[-1]["lastName"] == "SMITH"
+    assert list(table[0]) == REPORT_COLUMNS
+    assert [row["lastName"] for row in table] == ["NUÑEZ", "LEE", "SMITH"]
+    with pytest.raises(IndexError):
+        table[3]
+
+
+def test_repeated_values_share_one_category():
+    table = _table()
+    status = table._data["status"]
+    assert status.categories == ["Active", ""]
+    assert list(status.codes) == [0, 1, 0]
+
+
+def test_dataframe_matches_the_rows():
+    frame = _table().to_dataframe()
+    assert list(frame.columns) == REPORT_COLUMNS
+    assert str(frame["status"].dtype) == "category"
+    assert frame.to_dict("records") == _table().to_records()
+
+
+def test_arrow_matches_the_rows():
+    pyarrow = pytest.importorskip("pyarrow")
+    arrow = _table().to_arrow()
+    assert isinstance(arrow, pyarrow.Table)
+    assert arrow.to_pylist() == _table().to_records()
@@ -0,0 +1,81 @@
+import csv
+from datetime import date, timedelta
+
+from PyQt5.QtCore import Qt
+
+from config import EXPIRATION_DATE_FORMAT, REPORT_COLUMNS
+from results_model import EXPIRY_FILTERS, ReportTableModel
+
+
+def _write(path, rows, mode="w"):
+    with open(path, mode, newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if mode == "w":
+            writer.writerow(REPORT_COLUMNS)
+        for row in rows:
+            writer.writerow([row.get(column, "") for column in REPORT_COLUMNS])
+
+
+def _row(number, status="Active", expires_in=None):
+    expiry = ""
+    if expires_in is not None:
+        expiry = (date.today() + timedelta(days=expires_in)).strftime(EXPIRATION_DATE_FORMAT)
+    return {"service": str(number), "status": status, "expirationDate": expiry}
+
+
+def _column(model, name):
+    column = model.columns.index(name)
+    return [model.data(model.index(row, column)) for row in range(model.rowCount())]
+
+
+def test_rows_are_exposed_in_fetch_chunks(qapp, tmp_path):
+    path = tmp_path / "report.csv"
+    _write(path, [_row(number) for number in range(25)])
+    model = ReportTableModel(fetch_rows=10)
+    model.load(str(path))
+
+    assert model.rowCount() == 0 and model.canFetchMore()
+    model.fetchMore()
+    assert model.rowCount() == 10
+    model.fetchMore()
+    model.fetchMore()
+    assert model.rowCount() == 25 and not model.canFetchMore()
+    assert _column(model, "service")[:3] == ["0", "1", "2"]
+
+
+def test_appended_rows_keep_sort_order(qapp, tmp_path):
+    path = tmp_path / "report.csv"
+    _write(path, [_row(1, "Expired"), _row(2, "Active")])
+    model = ReportTableModel(fetch_rows=100)
+    model.load(str(path))
+    model.sort(model.columns.index("status"))
+    model.fetchMore()
+    assert _column(model, "status") == ["Active", "Expired"]
+
+    _write(path, [_row(3, "Cancelled"), _row(4, "Active")], mode="a")
+    assert model.refresh() == 2
+    assert _column(model, "status") == ["Active", "Active", "Cancelled", "Expired"]
+    assert model.headerData(0, Qt.Vertical) == "2"
+
+
+def test_filters_by_status_and_expiry(qapp, tmp_path):
+    path = tmp_path / "report.csv"
+    _write(
+        path,
+        [
+            _row(1, "Active", expires_in=10),
+            _row(2, "Active", expires_in=-5),
+            _row(3, "Expired", expires_in=60),
+            _row(4, "Active"),
+        ],
+    )
+    model = ReportTableModel(fetch_rows=100)
+    model.load(str(path))
+
+    model.set_filter("Active", EXPIRY_FILTERS["Expires within 30 days"])
+    assert _column(model, "service") == ["1"]
+    model.set_filter(None, EXPIRY_FILTERS["Expired"])
+    assert _column(model, "service") == ["2"]
+    model.set_filter(None, EXPIRY_FILTERS["No expiry date"])
+    assert _column(model, "service") == ["4"]
+    assert model.statuses() == ["Active", "Expired"]
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import pytest
+from openpyxl import Workbook
+
+import service
+from service import CronSchedule, ScrapingService, pending_workbooks
+
+
+def test_weekday_schedule_skips_the_weekend():
+    schedule = CronSchedule("0 6,18 * * 1-5")
+    # Friday 2024-07-05 18:30 -> Monday 06:00
+    assert schedule.next_run(datetime(2024, 7, 5, 18, 30)) == datetime(2024, 7, 8, 6, 0)
+    assert schedule.next_run(datetime(2024, 7, 8, 6, 0)) == datetime(2024, 7, 8, 18, 0)
+
+
+def test_steps_ranges_and_lists():
+    schedule = CronSchedule("*/15 9-10 * * *")
+    assert schedule.next_run(datetime(2024, 1, 1, 8, 59)) == datetime(2024, 1, 1, 9, 0)
+    assert schedule.next_run(datetime(2024, 1, 1, 9, 50)) == datetime(2024, 1, 1, 10, 0)
+    assert schedule.next_run(datetime(2024, 1, 1, 10, 45)) == datetime(2024, 1, 2, 9, 0)
+
+
+def test_restricted_day_fields_match_either():
+    # The 1st of the month or any Sunday (7 is Sunday too)
+    schedule = CronSchedule("0 0 1 * 7")
+    assert schedule.matches(datetime(2024, 7, 1, 0, 0))  # Monday the 1st
+    assert schedule.matches(datetime(2024, 7, 7, 0, 0))  # Sunday
+    assert not schedule.matches(datetime(2024, 7, 2, 0, 0))
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* * 0 * *", "5-1 * * * *"])
+def test_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_impossible_dates_never_match():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_run(datetime(2024, 1, 1))
+
+
+def test_pending_workbooks_skips_files_still_being_copied(tmp_path):
+    ready = tmp_path / "ready.xlsx"
+    copying = tmp_path / "copying.xlsx"
+    (tmp_path / "notes.txt").write_text("", encoding="utf-8")
+    ready.write_bytes(b"")
+    copying.write_bytes(b"")
+    old = time.time() - 60
+    os.utime(ready, (old, old))
+
+    assert [os.path.basename(path) for path in pending_workbooks(str(tmp_path))] == [
+        "ready.xlsx"
+    ]
+
+
+def test_failed_run_leaves_no_partial_report(tmp_path, monkeypatch):
+    class FakeSession:
+        page = None
+
+        async def ensure_ready(self):
+            pass
+
+    class FailingPipeline:
+        def __init__(self, xlsx_path, report_path, *args, **kwargs):
+            self.report_path = report_path
+
+        async def run(self):
+            with open(self.report_path, "w", encoding="utf-8") as file:
+                file.write("name,lastName\n")
+            raise RuntimeError("browser disconnected")
+
+    inbox, outbox = tmp_path / "inbox", tmp_path / "outbox"
+    workbook = Workbook()
+    workbook.active.append(["Server_ID", "Last_Name"])
+    workbook.active.append([1001, "SMITH"])
+    inbox.mkdir()
+    workbook.save(inbox / "records.xlsx")
+    old = time.time() - 60
+    os.utime(inbox / "records.xlsx", (old, old))
+    monkeypatch.setattr(service, "ScrapePipeline", FailingPipeline)
+
+    scraping = ScrapingService(FakeSession(), str(inbox), str(outbox))
+    asyncio.run(scraping.process_inbox())
+
+    assert os.listdir(outbox) == []
+    assert os.listdir(inbox / "failed") == ["records.xlsx"]
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+import shared_browser
+from browser_profile import pid_alive
+from config import LOGINURL
+from shared_browser import _FileLock, claim_warm_tab, own_tab, release_tab
+
+SEARCH_URL = LOGINURL.replace("/login", "/search")
+
+
+class FakeCDPSession:
+    def __init__(self, target_id):
+        self.target_id = target_id
+
+    async def send(self, method):
+        assert method == "Target.getTargetInfo"
+        return {"targetInfo": {"targetId": self.target_id, "type": "page"}}
+
+    async def detach(self):
+        pass
+
+
+class FakeTarget:
+    def __init__(self, target_id):
+        self.target_id = target_id
+
+    async def createCDPSession(self):
+        return FakeCDPSession(self.target_id)
+
+
+class FakePage:
+    def __init__(self, target_id, url=SEARCH_URL):
+        self.target = FakeTarget(target_id)
+        self.url = url
+
+
+class FakeBrowser:
+    def __init__(self, pages):
+        self._pages = pages
+
+    async def pages(self):
+        return self._pages
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_tab_ownership_survives_navigation(tmp_path):
+    tabs_file = str(tmp_path / "tabs.json")
+    page = FakePage("A")
+
+    async def run():
+        await own_tab(page, tabs_file)
+        # Navigating wipes anything kept in the page, but not the target id
+        page.url = SEARCH_URL + "?q=1"
+        owners = shared_browser._read_tab_owners(tabs_file)
+        await release_tab(page, tabs_file)
+        return owners, shared_browser._read_tab_owners(tabs_file)
+
+    owners, released = asyncio.run(run())
+    assert owners == {"A": os.getpid()}
+    assert released == {}
+
+
+def test_claim_skips_tabs_of_live_processes(tmp_path):
+    tabs_file = str(tmp_path / "tabs.json")
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        shared_browser._write_tab_owners(
+            tabs_file, {"busy": other.pid, "orphan": _dead_pid(), "closed": other.pid}
+        )
+        pages = [
+            FakePage("login", LOGINURL),
+            FakePage("busy"),
+            FakePage("orphan"),
+        ]
+        claimed = asyncio.run(claim_warm_tab(FakeBrowser(pages), tabs_file))
+        assert claimed is pages[2]
+        assert shared_browser._read_tab_owners(tabs_file) == {
+            "busy": other.pid,
+            "orphan": os.getpid(),
+        }
+        assert asyncio.run(claim_warm_tab(FakeBrowser(pages[:2]), tabs_file)) is None
+    finally:
+        other.kill()
+        other.wait()
+
+
+def test_lock_of_a_live_holder_is_not_taken_over(tmp_path):
+    path = str(tmp_path / "launch.lock")
+    holder = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        with open(path, "w") as file:
+            file.write(str(holder.pid))
+
+        async def enter():
+            async with _FileLock(path, 0):
+                pass
+
+        with pytest.raises(TimeoutError):
+            asyncio.run(enter())
+        assert os.path.exists(path)
+    finally:
+        holder.kill()
+        holder.wait()
+    # Once the holder is gone the lock is taken over
+    asyncio.run(enter())
+    assert not os.path.exists(path)
+
+
+def test_unreadable_lock_is_only_taken_over_once_it_is_old(tmp_path):
+    path = str(tmp_path / "launch.lock")
+    # Created by a process that has not written its pid yet
+    open(path, "w").close()
+
+    async def enter():
+        async with _FileLock(path, 0):
+            pass
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(enter())
+    assert os.path.exists(path)
+    # Left half-written by a process that crashed while locking
+    old = os.path.getmtime(path) - shared_browser.STALE_LOCK_GRACE - 1
+    os.utime(path, (old, old))
+    asyncio.run(enter())
+    assert not os.path.exists(path)
+
+
+def test_pid_alive_rejects_process_groups():
+    assert not pid_alive(0)
+    assert not pid_alive(-1)
+    assert pid_alive(os.getpid())
+
+
+def test_chrome_is_killed_when_it_does_not_answer(tmp_path, monkeypatch):
+    started = []
+
+    class FakeProfile:
+        def acquire_shared(self):
+            pass
+
+    def start_detached_chrome(profile, port):
+        process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        started.append(process)
+        return process.pid
+
+    monkeypatch.setattr(shared_browser, "start_detached_chrome", start_detached_chrome)
+    monkeypatch.setattr(shared_browser, "discover_endpoint", lambda *args: None)
+    monkeypatch.setattr(shared_browser, "_devtools_endpoint", lambda *args: None)
+    monkeypatch.setattr(shared_browser, "BROWSER_START_TIMEOUT", 0)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(
+            shared_browser.connect_shared_browser(
+                FakeProfile(), 1, str(tmp_path / "endpoint.json")
+            )
+        )
+    started[0].wait(5)
+    assert not pid_alive(started[0].pid)
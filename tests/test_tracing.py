@@ -0,0 +1,55 @@
+import asyncio
+import json
+import os
+
+import tracing
+from tracing import LookupTracer
+
+
+class FakeCapture:
+    def __init__(self, url="https://abcbiz.abc.ca.gov/api/search"):
+        self.url = url
+
+    def har_entries(self):
+        return [
+            {
+                "time": 1.0,
+                "request": {"method": "GET", "url": self.url},
+                "response": {"bodySize": 10},
+                "timings": {"wait": 1.0},
+            }
+        ]
+
+
+def _run_spans(tmp_path, durations, slowest_percent=10):
+    async def run():
+        tracer = LookupTracer(
+            sample_rate=0, slowest_percent=slowest_percent, trace_folder=str(tmp_path)
+        )
+        for number, duration in enumerate(durations):
+            await tracer._record(number, f"record{number}", duration, FakeCapture(), False)
+        return tracer, await tracer.finish()
+
+    return asyncio.run(run())
+
+
+def test_slowest_percent_is_exact_when_slow_spans_come_first(tmp_path):
+    durations = [1000 - number for number in range(1000)]
+    tracer, summary = _run_spans(tmp_path, durations)
+
+    written = sorted(duration for duration, _, _ in tracer._written)
+    assert written == sorted(durations)[-100:]
+    assert summary["spans"] == 1000
+    # Only the slowest spans' files are left, and the spool is gone
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".har.json")]) == 100
+    assert not os.path.exists(tmp_path / tracing.SPOOL_FILE)
+
+
+def test_written_har_holds_the_spooled_entries(tmp_path):
+    tracer, _ = _run_spans(tmp_path, [0.5, 2.0, 1.0], slowest_percent=34)
+
+    [(duration, label, path)] = tracer._written
+    assert (duration, label) == (2.0, "record1")
+    with open(path, encoding="utf-8") as file:
+        har = json.load(file)
+    assert har["log"]["entries"] == FakeCapture().har_entries()
@@ -0,0 +1,150 @@
+import json
+import sqlite3
+import urllib.error
+import urllib.request
+
+import pytest
+
+from work_queue import (
+    DONE,
+    FAILED,
+    LEASED,
+    PENDING,
+    CoordinatorQueue,
+    HTTPWorkQueue,
+    SQLiteWorkQueue,
+    WorkerQueue,
+    serve_work_queue,
+)
+
+
+def _queue(tmp_path, max_attempts=3):
+    return SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts)
+
+
+def test_batches_are_claimed_in_order_and_completed(tmp_path):
+    queue = _queue(tmp_path)
+    first, second = queue.publish("job", [[{"Server_ID": 1}], [{"Server_ID": 2}]])
+
+    assert queue.claim("a", 60) == (first, [{"Server_ID": 1}])
+    assert queue.claim("b", 60) == (second, [{"Server_ID": 2}])
+    assert queue.claim("c", 60) is None
+
+    assert queue.renew(first, "a", 60)
+    assert not queue.renew(first, "b", 60)
+    assert queue.complete(second, "b", [{"service": 2}])
+    assert not queue.complete(first, "b", [{"service": 1}])
+    assert queue.progress("job") == {PENDING: 0, LEASED: 1, DONE: 1, FAILED: 0}
+
+
+def test_expired_lease_is_requeued_and_old_holder_is_rejected(tmp_path):
+    queue = _queue(tmp_path)
+    (batch_id,) = queue.publish("job", [[{"Server_ID": 1}]])
+    queue.claim("a", -1)
+
+    assert queue.requeue_expired() == (1, 0)
+    assert queue.claim("b", 60) == (batch_id, [{"Server_ID": 1}])
+    assert not queue.complete(batch_id, "a", [{"service": 1}])
+    assert queue.complete(batch_id, "b", [{"service": 1}])
+    assert queue.results("job") == [{"service": 1}]
+
+
+def test_batch_fails_after_max_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    (batch_id,) = queue.publish("job", [[{"Server_ID": 1}]])
+
+    queue.claim("a", -1)
+    assert queue.requeue_expired() == (1, 0)
+    queue.claim("b", -1)
+    assert queue.requeue_expired() == (0, 1)
+
+    assert queue.claim("c", 60) is None
+    assert queue.progress("job")[FAILED] == 1
+    assert list(queue.failed_batches("job")) == [(batch_id, [{"Server_ID": 1}])]
+    assert queue.results("job") == []
+
+
+def _post(server, action, body, token="secret"):
+    host, port = server.server_address[:2]
+    request = urllib.request.Request(
+        f"http://{host}:{port}/{action}",
+        data=body if isinstance(body, bytes) else json.dumps(body).encode("utf-8"),
+        headers={"Authorization": f"Bearer {token}"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, None
+
+
+def test_served_queue_checks_token_and_body(tmp_path):
+    queue = _queue(tmp_path)
+    (batch_id,) = queue.publish("job", [[{"Server_ID": 1}]])
+    with pytest.raises(ValueError):
+        serve_work_queue(queue, "127.0.0.1", 0, "")
+    server = serve_work_queue(queue, "127.0.0.1", 0, "secret")
+    try:
+        claim = {"worker_id": "a", "lease_seconds": 60}
+        assert _post(server, "claim", claim, token="wrong") == (401, None)
+        assert _post(server, "claim", b"{not json") == (400, None)
+        assert _post(server, "claim", {"worker_id": "a"}) == (400, None)
+        assert _post(server, "claim", [1, 2]) == (400, None)
+        assert _post(server, "renew", {**claim, "batch_id": "1"}) == (400, None)
+        assert _post(server, "missing", claim) == (404, None)
+
+        host, port = server.server_address[:2]
+        client = HTTPWorkQueue(f"http://{host}:{port}", token="secret")
+        assert client.claim("a", 60) == (batch_id, [{"Server_ID": 1}])
+        assert client.complete(batch_id, "a", [{"service": 1}])
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert queue.results("job") == [{"service": 1}]
+
+
+def test_http_client_only_has_the_worker_operations():
+    client = HTTPWorkQueue("http://127.0.0.1:1", token="secret")
+    assert isinstance(client, WorkerQueue)
+    assert not isinstance(client, CoordinatorQueue)
+    assert not hasattr(client, "publish")
+    with pytest.raises(TypeError):
+        WorkerQueue()
+
+
+def test_released_batch_is_requeued_until_out_of_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    (batch_id,) = queue.publish("job", [[{"Server_ID": 1}]])
+
+    queue.claim("a", 60)
+    assert not queue.release(batch_id, "b")
+    assert queue.release(batch_id, "a")
+    assert queue.progress("job")[PENDING] == 1
+
+    queue.claim("b", 60)
+    assert queue.release(batch_id, "b")
+    assert queue.progress("job")[FAILED] == 1
+
+
+def test_served_queue_answers_backend_errors(tmp_path, monkeypatch):
+    queue = _queue(tmp_path)
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    def rejected(*args):
+        raise TypeError("results must be rows")
+
+    monkeypatch.setattr(queue, "claim", locked)
+    monkeypatch.setattr(queue, "complete", rejected)
+    server = serve_work_queue(queue, "127.0.0.1", 0, "secret")
+    try:
+        assert _post(server, "claim", {"worker_id": "a", "lease_seconds": 60}) == (500, None)
+        complete = {"batch_id": 1, "worker_id": "a", "results": [1]}
+        assert _post(server, "complete", complete) == (400, None)
+        # The server keeps answering after both
+        assert _post(server, "release", {"batch_id": 1, "worker_id": "a"}) == (200, False)
+    finally:
+        server.shutdown()
+        server.server_close()
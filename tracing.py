@@ -0,0 +1,399 @@
+"""
+On-demand Chrome performance tracing for portal lookups.
+
+When enabled, a LookupTracer wraps the login and every lookup in a span:
+
+    - A sampled fraction of spans (sample_rate) records a full DevTools
+      performance trace (Chrome's trace JSON, loadable in chrome://tracing or
+      the Performance panel) plus a HAR-like file of request timings.
+    - Every span captures request timings cheaply over the DevTools Network
+      domain. They are spooled to disk rather than kept in memory, and at the
+      end of the run the slowest slowest_percent of spans get their HAR-like
+      file written too.
+    - finish() writes summary.json with the slowest spans and the URLs and
+      timing phases (dns, connect, ssl, wait, receive) where time went.
+
+Files are written to a traces_<run> folder next to the run log.
+"""
+
+import asyncio
+import heapq
+import json
+import os
+import random
+import time
+from array import array
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from config import (
+    LOG_FOLDER,
+    TRACE_SAMPLE_RATE,
+    TRACE_SLOWEST_PERCENT,
+)
+from utils import create_directory
+
+# Request timings of every span not written yet, one JSON line per span
+SPOOL_FILE = "spans.spool.jsonl"
+
+# Categories close to the DevTools Performance panel defaults
+TRACE_CATEGORIES = [
+    "devtools.timeline",
+    "disabled-by-default-devtools.timeline",
+    "disabled-by-default-devtools.timeline.frame",
+    "toplevel",
+    "blink.user_timing",
+    "loading",
+    "latencyInfo",
+    "v8.execute",
+]
+
+
+class NetworkCapture:
+    """
+    Collects request timings for one page from DevTools Network events.
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self._client = None
+
+    async def start(self, page):
+        self._client = await page.target.createCDPSession()
+        self._client.on("Network.requestWillBeSent", self._on_request)
+        self._client.on("Network.responseReceived", self._on_response)
+        self._client.on("Network.loadingFinished", self._on_finished)
+        self._client.on("Network.loadingFailed", self._on_failed)
+        await self._client.send("Network.enable")
+
+    async def stop(self):
+        if self._client is not None:
+            try:
+                await self._client.detach()
+            except Exception:
+                # The page may have crashed or been replaced
+                pass
+            self._client = None
+
+    def _on_request(self, event):
+        self.requests[event["requestId"]] = {
+            "url": event["request"]["url"],
+            "method": event["request"]["method"],
+            "wallTime": event.get("wallTime", time.time()),
+            "startTime": event["timestamp"],
+            "endTime": None,
+            "status": None,
+            "mimeType": "",
+            "bytes": 0,
+            "timing": None,
+            "fromCache": False,
+            "error": None,
+        }
+
+    def _on_response(self, event):
+        entry = self.requests.get(event["requestId"])
+        if entry is not None:
+            response = event["response"]
+            entry["status"] = response.get("status")
+            entry["mimeType"] = response.get("mimeType", "")
+            entry["timing"] = response.get("timing")
+            entry["fromCache"] = response.get("fromDiskCache", False)
+
+    def _on_finished(self, event):
+        entry = self.requests.get(event["requestId"])
+        if entry is not None:
+            entry["endTime"] = event["timestamp"]
+            entry["bytes"] = event.get("encodedDataLength", 0)
+
+    def _on_failed(self, event):
+        entry = self.requests.get(event["requestId"])
+        if entry is not None:
+            entry["endTime"] = event["timestamp"]
+            entry["error"] = event.get("errorText")
+
+    def har_entries(self):
+        """
+        Converts the captured requests to HAR 1.2 style entries.
+
+        Returns:
+            list: One entry per finished request, in start order.
+        """
+        entries = []
+        for entry in sorted(self.requests.values(), key=lambda item: item["startTime"]):
+            if entry["endTime"] is None:
+                continue
+            total = (entry["endTime"] - entry["startTime"]) * 1000
+            entries.append(
+                {
+                    "startedDateTime": time.strftime(
+                        "%Y-%m-%dT%H:%M:%S", time.gmtime(entry["wallTime"])
+                    ),
+                    "time": round(total, 2),
+                    "request": {"method": entry["method"], "url": entry["url"]},
+                    "response": {
+                        "status": entry["status"],
+                        "mimeType": entry["mimeType"],
+                        "bodySize": entry["bytes"],
+                        "fromDiskCache": entry["fromCache"],
+                        "error": entry["error"],
+                    },
+                    "timings": self._phases(entry, total),
+                }
+            )
+        return entries
+
+    @staticmethod
+    def _phases(entry, total):
+        timing = entry["timing"]
+        if not timing:
+            # Served without network timing (e.g. from the memory cache)
+            return {
+                "blocked": -1,
+                "dns": -1,
+                "connect": -1,
+                "ssl": -1,
+                "send": 0,
+                "wait": round(total, 2),
+                "receive": 0,
+            }
+
+        def span(start, end):
+            start, end = timing.get(start, -1), timing.get(end, -1)
+            return round(end - start, 2) if start >= 0 and end >= 0 else -1
+
+        headers_received = timing["requestTime"] * 1000 + timing["receiveHeadersEnd"]
+        return {
+            "blocked": round(max(timing["requestTime"] - entry["startTime"], 0) * 1000, 2),
+            "dns": span("dnsStart", "dnsEnd"),
+            "connect": span("connectStart", "connectEnd"),
+            "ssl": span("sslStart", "sslEnd"),
+            "send": span("sendStart", "sendEnd"),
+            "wait": span("sendEnd", "receiveHeadersEnd"),
+            "receive": round(max(entry["endTime"] * 1000 - headers_received, 0), 2),
+        }
+
+
+class LookupTracer:
+    """
+    Decides which spans to trace and writes the trace, HAR and summary files.
+
+    Args:
+        sample_rate (float): Fraction of spans that get a full DevTools trace.
+        slowest_percent (float): Percentage of the slowest spans whose request
+            timings are written at the end of the run.
+        trace_folder (str or None): Output folder; defaults to a traces_<run>
+            folder in the log folder.
+    """
+
+    def __init__(
+        self,
+        sample_rate=TRACE_SAMPLE_RATE,
+        slowest_percent=TRACE_SLOWEST_PERCENT,
+        trace_folder=None,
+    ):
+        self.sample_rate = sample_rate
+        self.slowest_percent = slowest_percent
+        self.trace_folder = trace_folder or os.path.join(
+            LOG_FOLDER, f"traces_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')}"
+        )
+        self.spans_seen = 0
+        # 8 bytes a span; the request timings themselves go to the spool file
+        self.durations = array("d")
+        self._spool_path = os.path.join(self.trace_folder, SPOOL_FILE)
+        self._spool_size = 0
+        self._spool_lock = asyncio.Lock()
+        self._spooled_durations = array("d")
+        self._spooled_offsets = array("q")
+        self._written = []
+        self._url_totals = defaultdict(lambda: {"count": 0, "ms": 0.0, "bytes": 0})
+        self._phase_totals = defaultdict(float)
+        self._tracing_lock = asyncio.Lock()
+        create_directory(self.trace_folder)
+
+    @classmethod
+    def create(cls, sample_rate=TRACE_SAMPLE_RATE, slowest_percent=TRACE_SLOWEST_PERCENT):
+        """
+        Returns:
+            LookupTracer or None: A tracer, or None when both settings are 0.
+        """
+        if sample_rate > 0 or slowest_percent > 0:
+            return cls(sample_rate, slowest_percent)
+        return None
+
+    def _file_name(self, number, label, extension):
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(label))
+        return os.path.join(self.trace_folder, f"{number:06d}_{safe_label}.{extension}")
+
+    @asynccontextmanager
+    async def span(self, page, label, force=False):
+        """
+        Traces everything done on the page inside the block.
+
+        Args:
+            page: The page the lookup (or login) runs on.
+            label (str): Name used for the span's files, e.g. "12345_Smith".
+            force (bool): Always record a full trace, regardless of sampling.
+        """
+        self.spans_seen += 1
+        number = self.spans_seen
+        sampled = force or random.random() < self.sample_rate
+        capture = NetworkCapture()
+        trace_path = None
+        try:
+            await capture.start(page)
+        except Exception as e:
+            print(f"Network capture unavailable for {label}: {e}")
+            capture = None
+        if sampled and not self._tracing_lock.locked():
+            # Chrome runs one trace at a time per browser
+            await self._tracing_lock.acquire()
+            trace_path = self._file_name(number, label, "trace.json")
+            try:
+                await page.tracing.start(path=trace_path, categories=TRACE_CATEGORIES)
+            except Exception as e:
+                print(f"Tracing unavailable for {label}: {e}")
+                trace_path = None
+                self._tracing_lock.release()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            if trace_path:
+                try:
+                    await page.tracing.stop()
+                except Exception as e:
+                    print(f"Could not stop tracing for {label}: {e}")
+                finally:
+                    self._tracing_lock.release()
+            if capture is not None:
+                await capture.stop()
+                await self._record(number, label, duration, capture, sampled)
+
+    async def _record(self, number, label, duration, capture, sampled):
+        self.durations.append(duration)
+        entries = capture.har_entries()
+        for entry in entries:
+            url = urlsplit(entry["request"]["url"])
+            totals = self._url_totals[f"{url.netloc}{url.path}"]
+            totals["count"] += 1
+            totals["ms"] += entry["time"]
+            totals["bytes"] += entry["response"]["bodySize"] or 0
+            for phase, value in entry["timings"].items():
+                if value > 0:
+                    self._phase_totals[phase] += value
+        span = (duration, number, label, entries)
+        if sampled:
+            await self._write_har(span)
+        elif self.slowest_percent > 0:
+            # Which spans are among the slowest is only known at the end
+            await self._spool(span)
+
+    async def _spool(self, span):
+        line = (json.dumps(span) + "\n").encode("utf-8")
+        # Spans finish concurrently; appends and offsets must not interleave
+        async with self._spool_lock:
+            await asyncio.get_running_loop().run_in_executor(
+                None, _append_bytes, self._spool_path, line
+            )
+            self._spooled_durations.append(span[0])
+            self._spooled_offsets.append(self._spool_size)
+            self._spool_size += len(line)
+
+    def _read_spooled(self, indexes):
+        spans = []
+        with open(self._spool_path, "rb") as file:
+            for index in indexes:
+                file.seek(self._spooled_offsets[index])
+                spans.append(tuple(json.loads(file.readline())))
+        return spans
+
+    async def _write_har(self, span):
+        duration, number, label, entries = span
+        path = self._file_name(number, label, "har.json")
+        har = {
+            "log": {
+                "version": "1.2",
+                "creator": {"name": "abcbiz-scraper", "version": "1"},
+                "comment": f"{label}: {duration:.2f}s",
+                "entries": entries,
+            }
+        }
+        await asyncio.get_running_loop().run_in_executor(None, _write_json, path, har)
+        self._written.append((duration, label, path))
+
+    async def finish(self):
+        """
+        Writes the slowest spans' request timings and the run summary.
+
+        Returns:
+            dict: The summary that was written to summary.json.
+        """
+        if self._spooled_durations:
+            keep = max(1, int(len(self.durations) * self.slowest_percent / 100))
+            slowest = heapq.nlargest(
+                keep,
+                range(len(self._spooled_durations)),
+                key=self._spooled_durations.__getitem__,
+            )
+            loop = asyncio.get_running_loop()
+            for span in await loop.run_in_executor(None, self._read_spooled, slowest):
+                await self._write_har(span)
+            self._spooled_durations = array("d")
+            self._spooled_offsets = array("q")
+        if os.path.exists(self._spool_path):
+            os.remove(self._spool_path)
+        durations = sorted(self.durations)
+        top_urls = sorted(
+            self._url_totals.items(), key=lambda item: item[1]["ms"], reverse=True
+        )[:15]
+        summary = {
+            "spans": len(durations),
+            "median_seconds": round(durations[len(durations) // 2], 2) if durations else 0,
+            "p95_seconds": (
+                round(durations[min(int(len(durations) * 0.95), len(durations) - 1)], 2)
+                if durations
+                else 0
+            ),
+            "slowest_spans": [
+                {"label": label, "seconds": round(duration, 2), "har": path}
+                for duration, label, path in sorted(self._written, reverse=True)[:15]
+            ],
+            "top_urls_by_time": [
+                {"url": url, **{key: round(value, 2) for key, value in totals.items()}}
+                for url, totals in top_urls
+            ],
+            "network_ms_by_phase": {
+                phase: round(value, 2) for phase, value in self._phase_totals.items()
+            },
+        }
+        path = os.path.join(self.trace_folder, "summary.json")
+        await asyncio.get_running_loop().run_in_executor(None, _write_json, path, summary)
+        print(f"Trace summary written to {path}")
+        return summary
+
+
+@asynccontextmanager
+async def _no_span():
+    yield
+
+
+def trace_span(tracer, page, label, force=False):
+    """
+    Returns tracer.span(...) or, when tracing is off, a context that does nothing.
+    """
+    if tracer is None:
+        return _no_span()
+    return tracer.span(page, label, force)
+
+
+def _append_bytes(path, data):
+    with open(path, "ab") as file:
+        file.write(data)
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
@@ -5,15 +5,18 @@ Modules:
     - platform: Provides a way to access underlying platform’s data.
     - shutil: Provides functions to operate on files and collections of files.
     - csv: Provides functionality to read and write CSV files.
+    - openpyxl: Streams workbook rows without loading the whole file.
     - json: Provides methods for parsing and creating JSON data.
     - PyQt5.QtWidgets.QDesktopWidget: Provides screen-related information and utilities.
     - PyQt5.QtWidgets.QMessageBox: Provides a dialog box to display messages to the user.
 """
 
+import csv
 import json
 import os
 import platform
 import shutil
+from openpyxl import load_workbook
 from PyQt5.QtWidgets import QDesktopWidget
 from PyQt5.QtWidgets import QMessageBox
 import pandas as pd
@@ -99,17 +102,9 @@ def find_chrome_path():
             ),
         ]
         possible_paths.extend(windows_specific_paths)
-        chrome_path = next(
+        return next(
             (path for path in possible_paths if os.path.exists(path)), None
         )
-        temp_dir = os.path.join(os.environ.get("TEMP", "C:\\Temp"), "chrome_temp")
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-        except OSError as e:
-            print(f"Error: {e.strerror}")
-
-        return chrome_path
     elif system == "Linux":
         chrome_path = shutil.which("google-chrome") or shutil.which(
             "google-chrome-stable"
@@ -127,12 +122,20 @@ def find_chrome_path():
     return None
 
 
+def is_outage_status(status):
+    """
+    Returns:
+        bool: True for the HTTP statuses the portal answers with when it is down.
+    """
+    return status in (403, 404) or status >= 500
+
+
 async def page_load(page, pageurl):
     # Navigate to the page and wait for DOM content to be loaded
     response = await page.goto(pageurl, waitUntil="domcontentloaded")
     print(response)
     # Check response status using ternary operators
-    return False if response.status in [404, 403] else True
+    return False if response is None or is_outage_status(response.status) else True
 
 
 def print_the_output_statement(output, message):
@@ -141,6 +144,18 @@ def print_the_output_statement(output, message):
     print(message)
 
 
+class ConsoleOutput:
+    """
+    Stand-in for the GUI output widget when running without a window.
+
+    print_the_output_statement already echoes every message to the console,
+    so appended messages are simply dropped.
+    """
+
+    def append(self, message):
+        pass
+
+
 def convert_into_csv_and_save(json_data, out_put_csv):
 
     report_directory = os.path.dirname(out_put_csv)
@@ -148,7 +163,11 @@ def convert_into_csv_and_save(json_data, out_put_csv):
 
     create_directory(report_directory)
     print(json_data)
-    df = pd.DataFrame(json_data)
+    # A ResultTable hands its columns over without rebuilding row dicts
+    if hasattr(json_data, "to_dataframe"):
+        df = json_data.to_dataframe()
+    else:
+        df = pd.DataFrame(json_data)
     df.to_csv(
         out_put_csv, index=False
     )  # Set index=False to exclude DataFrame index in the CSV output
@@ -173,6 +192,84 @@ def xlsx_to_json(xlsx_file_path):
     return header_columns, json_data, num_records
 
 
+def read_xlsx_header(xlsx_file_path):
+    """
+    Reads the header row of a workbook and checks that it has data.
+
+    Args:
+        xlsx_file_path (str): Path to the .xlsx file.
+
+    Returns:
+        tuple: (header_columns, has_records).
+    """
+    workbook = load_workbook(xlsx_file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        has_records = any(
+            any(value is not None for value in row) for row in rows
+        )
+        return [column for column in header if column is not None], has_records
+    finally:
+        workbook.close()
+
+
+def iter_xlsx_records(xlsx_file_path):
+    """
+    Yields the rows of a workbook one at a time as dicts keyed by header.
+
+    Unlike xlsx_to_json the file is streamed, so memory does not grow with
+    the number of rows. Completely empty rows are skipped.
+
+    Args:
+        xlsx_file_path (str): Path to the .xlsx file.
+
+    Yields:
+        dict: One record per data row.
+    """
+    workbook = load_workbook(xlsx_file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        for row in rows:
+            if any(value is not None for value in row):
+                yield {
+                    column: value
+                    for column, value in zip(header, row)
+                    if column is not None
+                }
+    finally:
+        workbook.close()
+
+
+class CsvReportWriter:
+    """
+    Appends report rows to a CSV file as they are produced.
+
+    Attributes:
+        out_put_csv (str): The report path.
+        rows_written (int): Number of rows written so far.
+    """
+
+    def __init__(self, out_put_csv, columns):
+        create_directory(os.path.dirname(out_put_csv) or ".")
+        self.out_put_csv = out_put_csv
+        self.rows_written = 0
+        self._file = open(out_put_csv, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(
+            self._file, fieldnames=columns, restval="", extrasaction="ignore"
+        )
+        self._writer.writeheader()
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
 def parse_json(json_string):
     """
     Parses a JSON string and returns a Python dictionary.
@@ -1,9 +1,115 @@
 import asyncio
-from pyppeteer import launch
+import platform
+import subprocess
+from pyppeteer import executablePath, launch
 from config import HEADLESS, HEIGHT, WIDTH
 from utils import find_chrome_path
 
 
+async def launch_browser(profile=None):
+    """
+    Launches a Pyppeteer browser instance with the application settings.
+
+    Args:
+        profile (BrowserProfile or None): Persistent profile to launch with; it
+            must already be acquired. Without one Chrome gets a throwaway profile.
+
+    Returns:
+        pyppeteer.browser.Browser: The launched browser.
+
+    Raises:
+        Exception: If Chrome cannot be started.
+    """
+    executable_path = find_chrome_path()
+    print("executable_path", executable_path)
+    print(f"window size: {WIDTH}x{HEIGHT}")
+    # print(f"Using user agent: {USERAGENT}")
+    profile_options = {}
+    if profile is not None and profile.user_data_dir is not None:
+        profile_options["userDataDir"] = profile.user_data_dir
+    return await launch(
+        executablePath=executable_path,
+        headless=HEADLESS,
+        **profile_options,
+        args=chrome_args(profile),
+    )
+
+
+def chrome_args(profile=None):
+    """
+    Returns:
+        list: The Chrome command line switches used by the application.
+    """
+    profile_args = []
+    if profile is not None and profile.user_data_dir is not None:
+        profile_args = profile.launch_args()
+    return [
+        "--no-sandbox",
+        "--disable-setuid-sandbox",
+        "--disable-infobars",
+        # f"--user-agent={USERAGENT}"
+        "--disable-dev-shm-usage",
+        "--disable-accelerated-2d-canvas",
+        "--disable-gpu",
+        f"--window-size={WIDTH},{HEIGHT}",
+        "--start-maximized",
+        "--disable-notifications",
+        "--disable-popup-blocking",
+        "--ignore-certificate-errors",
+        "--allow-file-access",
+        *profile_args,
+    ]
+
+
+def start_detached_chrome(profile, port):
+    """
+    Starts Chrome with remote debugging as a process of its own, so it keeps
+    running after the process that started it exits.
+
+    pyppeteer's launch() ties Chrome to the launching process (pipes, exit
+    handlers), which is why the shared browser is started here instead.
+
+    Args:
+        profile (BrowserProfile): The acquired profile to run Chrome on.
+        port (int): Remote debugging port.
+
+    Returns:
+        int: The pid of the Chrome process.
+    """
+    executable_path = find_chrome_path() or executablePath()
+    args = [
+        executable_path,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={profile.user_data_dir}",
+        # Defaults pyppeteer's launch() would add
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--disable-background-timer-throttling",
+        "--disable-backgrounding-occluded-windows",
+        "--disable-renderer-backgrounding",
+        *chrome_args(profile),
+    ]
+    if HEADLESS:
+        args += ["--headless", "--hide-scrollbars", "--mute-audio"]
+    args.append("about:blank")
+    options = {}
+    if platform.system() == "Windows":
+        options["creationflags"] = (
+            subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        )
+    else:
+        options["start_new_session"] = True
+    process = subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **options,
+    )
+    print(f"Started shared Chrome (pid {process.pid}) on debugging port {port}")
+    return process.pid
+
+
 def pyppeteerBrowserInit(loop):
     """
     Initializes a Pyppeteer browser instance with specified settings.
@@ -17,33 +123,9 @@ def pyppeteerBrowserInit(loop):
     Raises:
         Exception: If there is an error while initializing the browser.  
     """
-    executable_path = find_chrome_path()
-    print("executable_path", executable_path)
-    print(f"window size: {WIDTH}x{HEIGHT}")
-    # print(f"Using user agent: {USERAGENT}")
     asyncio.set_event_loop(loop)
     try:
-        browser = loop.run_until_complete(
-            launch(
-                executablePath=executable_path,
-                headless=HEADLESS,
-                args=[
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox",
-                    "--disable-infobars",
-                    # f"--user-agent={USERAGENT}"
-                    "--disable-dev-shm-usage",
-                    "--disable-accelerated-2d-canvas",
-                    "--disable-gpu",
-                    f"--window-size={WIDTH},{HEIGHT}",
-                    "--start-maximized",
-                    "--disable-notifications",
-                    "--disable-popup-blocking",
-                    "--ignore-certificate-errors",
-                    "--allow-file-access",
-                ],
-            )
-        )
+        browser = loop.run_until_complete(launch_browser())
         return browser
     except Exception as e:
         # Print the error and return None if an exception occurs
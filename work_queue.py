@@ -0,0 +1,527 @@
+"""
+Durable work queue used by the distributed coordinator/worker mode.
+
+The coordinator publishes batches of workbook records, workers claim them with
+a lease, and the finished rows are pushed back so the coordinator can assemble
+the final report. A batch whose lease expired QUEUE_MAX_ATTEMPTS times (e.g.
+because it crashes every worker that takes it) is marked failed instead of
+being handed out again. The default backend is a SQLite file so the whole flow can be
+exercised on a single machine; other brokers can be plugged in with
+``register_broker``.
+
+Modules:
+    - json: Serialises record batches and results.
+    - sqlite3: Backing store for the default queue implementation.
+    - urllib.request: Client side of the HTTP broker used by remote workers.
+    - http.server: Serves a local queue to workers on other hosts.
+
+The HTTP broker only answers requests carrying the shared QUEUE_TOKEN as a
+bearer token.
+"""
+
+import hmac
+import json
+import sqlite3
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from config import QUEUE_MAX_ATTEMPTS, QUEUE_TOKEN
+
+# Batch states stored in the queue
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class WorkerQueue(ABC):
+    """
+    Operations a worker uses: claiming batches and reporting them back.
+
+    A batch is a list of workbook records (dicts) identified by an integer id.
+    Claimed batches carry a lease that the worker renews while it scrapes.
+    """
+
+    @abstractmethod
+    def claim(self, worker_id, lease_seconds):
+        """
+        Leases the oldest pending batch to a worker.
+
+        Args:
+            worker_id (str): Name of the worker claiming the batch.
+            lease_seconds (float): How long the lease stays valid without renewal.
+
+        Returns:
+            tuple or None: (batch_id, records) or None when nothing is pending.
+        """
+
+    @abstractmethod
+    def renew(self, batch_id, worker_id, lease_seconds):
+        """
+        Extends the lease of a batch still held by the worker.
+
+        Returns:
+            bool: False if the worker no longer holds the lease.
+        """
+
+    @abstractmethod
+    def complete(self, batch_id, worker_id, results):
+        """
+        Stores the scraped rows for a batch and marks it done.
+
+        Returns:
+            bool: False if the worker no longer holds the lease.
+        """
+
+    @abstractmethod
+    def release(self, batch_id, worker_id):
+        """
+        Hands back a batch the worker could not finish, without waiting for
+        its lease to expire. It is re-queued, or failed once out of attempts.
+
+        Returns:
+            bool: False if the worker no longer holds the lease.
+        """
+
+
+class CoordinatorQueue(ABC):
+    """
+    Operations the coordinator uses: publishing a job and collecting it.
+
+    A lease that is not renewed or completed before it expires is put back on
+    the queue by ``requeue_expired``, or marked failed once the batch has been
+    claimed too often.
+    """
+
+    @abstractmethod
+    def publish(self, job_id, batches):
+        """
+        Adds record batches for a job to the queue.
+
+        Args:
+            job_id (str): Identifier of the coordinator run owning the batches.
+            batches (list): List of record lists, one per batch.
+
+        Returns:
+            list: The ids assigned to the published batches, in order.
+        """
+
+    @abstractmethod
+    def requeue_expired(self):
+        """
+        Puts batches whose lease has expired back to pending, or marks them
+        failed when they have used up their attempts.
+
+        Returns:
+            tuple: (re-queued, failed) batch counts.
+        """
+
+    @abstractmethod
+    def progress(self, job_id):
+        """
+        Returns:
+            dict: Batch counts per state for the job.
+        """
+
+    @abstractmethod
+    def result_batches(self, job_id):
+        """
+        Yields the result rows of the job one batch at a time, ordered by batch
+        id, so a large report never has to be decoded in one piece.
+
+        Yields:
+            list: Result rows of one batch.
+        """
+
+    @abstractmethod
+    def failed_batches(self, job_id):
+        """
+        Yields the batches of the job that were given up, ordered by batch id.
+
+        Yields:
+            tuple: (batch_id, records) of one failed batch.
+        """
+
+    def results(self, job_id):
+        """
+        Returns:
+            list: All result rows of the job, ordered by batch id.
+        """
+        return [row for rows in self.result_batches(job_id) for row in rows]
+
+
+class SQLiteWorkQueue(WorkerQueue, CoordinatorQueue):
+    """
+    Work queue stored in a single SQLite database file.
+
+    Every operation opens its own short transaction so the same file can be
+    shared by the coordinator and any number of local worker processes.
+    """
+
+    def __init__(self, db_path, max_attempts=QUEUE_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS batches (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    results TEXT
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_batches_status ON batches (status, id)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _write(self, callback):
+        # BEGIN IMMEDIATE takes the write lock up front so two workers can
+        # never lease the same batch.
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = callback(conn)
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def publish(self, job_id, batches):
+        def insert(conn):
+            ids = []
+            for records in batches:
+                cursor = conn.execute(
+                    "INSERT INTO batches (job_id, payload, status) VALUES (?, ?, ?)",
+                    (job_id, json.dumps(records), PENDING),
+                )
+                ids.append(cursor.lastrowid)
+            return ids
+
+        return self._write(insert)
+
+    def claim(self, worker_id, lease_seconds):
+        def lease(conn):
+            row = conn.execute(
+                "SELECT id, payload FROM batches WHERE status = ? ORDER BY id LIMIT 1",
+                (PENDING,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE batches SET status = ?, worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (LEASED, worker_id, time.time() + lease_seconds, row["id"]),
+            )
+            return row["id"], json.loads(row["payload"])
+
+        return self._write(lease)
+
+    def renew(self, batch_id, worker_id, lease_seconds):
+        def extend(conn):
+            cursor = conn.execute(
+                "UPDATE batches SET lease_expires = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (time.time() + lease_seconds, batch_id, worker_id, LEASED),
+            )
+            return cursor.rowcount == 1
+
+        return self._write(extend)
+
+    def complete(self, batch_id, worker_id, results):
+        def finish(conn):
+            cursor = conn.execute(
+                "UPDATE batches SET status = ?, results = ?, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (DONE, json.dumps(results), batch_id, worker_id, LEASED),
+            )
+            return cursor.rowcount == 1
+
+        return self._write(finish)
+
+    def release(self, batch_id, worker_id):
+        def give_back(conn):
+            cursor = conn.execute(
+                "UPDATE batches SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "worker = NULL, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (self.max_attempts, FAILED, PENDING, batch_id, worker_id, LEASED),
+            )
+            return cursor.rowcount == 1
+
+        return self._write(give_back)
+
+    def requeue_expired(self):
+        def requeue(conn):
+            now = time.time()
+            failed = conn.execute(
+                "UPDATE batches SET status = ?, lease_expires = NULL "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts),
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE batches SET status = ?, worker = NULL, lease_expires = NULL "
+                "WHERE status = ? AND lease_expires < ?",
+                (PENDING, LEASED, now),
+            ).rowcount
+            return requeued, failed
+
+        return self._write(requeue)
+
+    def progress(self, job_id):
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        conn = self._connect()
+        try:
+            for row in conn.execute(
+                "SELECT status, COUNT(*) AS total FROM batches WHERE job_id = ? GROUP BY status",
+                (job_id,),
+            ):
+                counts[row["status"]] = row["total"]
+        finally:
+            conn.close()
+        return counts
+
+    def result_batches(self, job_id):
+        conn = self._connect()
+        try:
+            for row in conn.execute(
+                "SELECT results FROM batches WHERE job_id = ? AND status = ? ORDER BY id",
+                (job_id, DONE),
+            ):
+                yield json.loads(row["results"])
+        finally:
+            conn.close()
+
+    def failed_batches(self, job_id):
+        conn = self._connect()
+        try:
+            for row in conn.execute(
+                "SELECT id, payload FROM batches WHERE job_id = ? AND status = ? ORDER BY id",
+                (job_id, FAILED),
+            ):
+                yield row["id"], json.loads(row["payload"])
+        finally:
+            conn.close()
+
+
+class HTTPWorkQueue(WorkerQueue):
+    """
+    Client for a queue served by ``serve_work_queue`` on the coordinator host.
+
+    Only the worker side is exposed over HTTP; the coordinator always talks to
+    its local backend directly.
+    """
+
+    def __init__(self, base_url, timeout=30, token=QUEUE_TOKEN):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.token = token
+
+    def _post(self, action, payload):
+        request = urllib.request.Request(
+            f"{self.base_url}/{action}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.token}",
+            },
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def claim(self, worker_id, lease_seconds):
+        result = self._post(
+            "claim", {"worker_id": worker_id, "lease_seconds": lease_seconds}
+        )
+        return tuple(result) if result else None
+
+    def renew(self, batch_id, worker_id, lease_seconds):
+        return self._post(
+            "renew",
+            {
+                "batch_id": batch_id,
+                "worker_id": worker_id,
+                "lease_seconds": lease_seconds,
+            },
+        )
+
+    def complete(self, batch_id, worker_id, results):
+        return self._post(
+            "complete",
+            {"batch_id": batch_id, "worker_id": worker_id, "results": results},
+        )
+
+    def release(self, batch_id, worker_id):
+        return self._post("release", {"batch_id": batch_id, "worker_id": worker_id})
+
+
+# Body fields of each HTTP action and their accepted types
+_ACTION_FIELDS = {
+    "claim": {"worker_id": str, "lease_seconds": (int, float)},
+    "renew": {"batch_id": int, "worker_id": str, "lease_seconds": (int, float)},
+    "complete": {"batch_id": int, "worker_id": str, "results": list},
+    "release": {"batch_id": int, "worker_id": str},
+}
+
+
+def _invalid_body(action, body):
+    # Returns why a request body is unusable, or None
+    if not isinstance(body, dict):
+        return "body must be a JSON object"
+    for field, types in _ACTION_FIELDS[action].items():
+        if field not in body:
+            return f"missing '{field}'"
+        if not isinstance(body[field], types) or isinstance(body[field], bool):
+            return f"'{field}' has the wrong type"
+    return None
+
+
+def serve_work_queue(queue, host, port, token):
+    """
+    Exposes the worker operations of a local queue over HTTP.
+
+    The server runs on a daemon thread so the coordinator loop keeps control.
+    Requests without the token get 401, malformed ones 400, and requests the
+    queue itself fails on (e.g. a locked database) 500.
+
+    Args:
+        queue (WorkerQueue): The local backend to expose.
+        host (str): Interface to bind, e.g. "127.0.0.1".
+        port (int): TCP port to listen on.
+        token (str): Shared secret workers send as a bearer token.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it.
+
+    Raises:
+        ValueError: If token is empty.
+    """
+    if not token:
+        raise ValueError("Serving the work queue needs a token")
+    expected = f"Bearer {token}".encode("utf-8")
+    actions = {
+        "claim": lambda body: queue.claim(body["worker_id"], body["lease_seconds"]),
+        "renew": lambda body: queue.renew(
+            body["batch_id"], body["worker_id"], body["lease_seconds"]
+        ),
+        "complete": lambda body: queue.complete(
+            body["batch_id"], body["worker_id"], body["results"]
+        ),
+        "release": lambda body: queue.release(body["batch_id"], body["worker_id"]),
+    }
+
+    class QueueRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            authorization = self.headers.get("Authorization", "").encode("utf-8")
+            if not hmac.compare_digest(authorization, expected):
+                self.send_error(401)
+                return
+            name = self.path.strip("/")
+            action = actions.get(name)
+            if action is None:
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length).decode("utf-8"))
+            except ValueError:
+                self.send_error(400, "Body is not valid JSON")
+                return
+            problem = _invalid_body(name, body)
+            if problem:
+                self.send_error(400, problem)
+                return
+            try:
+                result = action(body)
+            except (KeyError, TypeError, ValueError) as e:
+                # Fields the checks above let through but the backend rejects
+                self.send_error(400, f"Malformed {name} request: {e}")
+                return
+            except Exception as e:
+                print(f"Work queue {name} failed: {e}")
+                self.send_error(500, f"{name} failed: {e}")
+                return
+            payload = json.dumps(result).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), QueueRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Work queue served on http://{host}:{port}")
+    return server
+
+
+_BROKERS = {
+    # sqlite:///relative.db and sqlite:////absolute/path.db, as in SQLAlchemy
+    "sqlite": lambda url: SQLiteWorkQueue(url.path[1:]),
+    "http": lambda url: HTTPWorkQueue(url.geturl()),
+    "https": lambda url: HTTPWorkQueue(url.geturl()),
+}
+
+
+def register_broker(scheme, factory):
+    """
+    Registers an additional queue backend.
+
+    Args:
+        scheme (str): URL scheme handled by the backend, e.g. "redis".
+        factory (callable): Called with the parsed URL; must return a
+            WorkerQueue, which coordinators also need to be a CoordinatorQueue.
+    """
+    _BROKERS[scheme] = factory
+
+
+def open_work_queue(queue_url):
+    """
+    Opens the queue backend addressed by a URL.
+
+    Plain file paths and ``sqlite:///path`` open a SQLite queue; ``http://host:port``
+    connects to a coordinator started with ``--serve``.
+
+    Args:
+        queue_url (str): Location of the queue.
+
+    Returns:
+        WorkerQueue: The opened backend; local backends are CoordinatorQueues too.
+
+    Raises:
+        ValueError: If no backend is registered for the URL scheme.
+    """
+    url = urlparse(queue_url)
+    if len(url.scheme) <= 1:
+        # No scheme, or a Windows drive letter
+        return SQLiteWorkQueue(queue_url)
+    factory = _BROKERS.get(url.scheme)
+    if factory is None:
+        raise ValueError(f"No work queue backend registered for '{url.scheme}'")
+    return factory(url)